@@ -0,0 +1,180 @@
+"""
+Agrupación de inserciones (group commit)
+Las peticiones que insertan una fila la dejan en un búfer y esperan. Un
+hilo vacía el búfer cuando pasan `ventana_ms` desde la primera fila o se
+juntan `max_lote` filas, con una sola inserción de varias filas, y cada
+petición recibe su propia fila insertada.
+
+Con poca carga cada inserción espera como mucho `ventana_ms`; con mucha
+carga los lotes se llenan antes y el número de viajes a la base de datos
+baja de uno por fila a uno por lote.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class _Pendiente:
+    """Fila esperando su lote"""
+
+    __slots__ = ('fila', 'resultado', 'error', 'listo', 'encolado', 'abandonada')
+
+    def __init__(self, fila):
+        self.fila = fila
+        self.resultado = None
+        self.error = None
+        self.listo = threading.Event()
+        self.encolado = time.monotonic()
+        self.abandonada = False
+
+
+class AgrupadorInserciones:
+    """
+    Búfer de inserciones que se vacía en lotes
+
+    Args:
+        insertar_lote: función que recibe una lista de filas y devuelve las
+            filas insertadas en el mismo orden
+        ventana_ms: espera máxima desde la primera fila del lote
+        max_lote: filas por inserción
+        hilos: lotes que pueden estar insertándose a la vez
+        timeout: segundos que espera una petición antes de rendirse
+        al_abandonar: función que recibe cada fila insertada cuya petición
+            ya se había rendido (para avisar a los índices en memoria)
+    """
+
+    def __init__(self, insertar_lote, ventana_ms=5, max_lote=50, hilos=2, timeout=10,
+                 al_abandonar=None):
+        self.insertar_lote = insertar_lote
+        self.al_abandonar = al_abandonar
+        self.ventana = ventana_ms / 1000.0
+        self.max_lote = max_lote
+        self.hilos = hilos
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._pendientes = deque()
+        self._iniciado = False
+        self._lotes = 0
+        self._filas = 0
+        self._reintentos_individuales = 0
+        self._fallidas = 0
+        self._abandonadas = 0
+        self._esperas = deque(maxlen=1000)
+
+    def insertar(self, fila):
+        """
+        Insertar `fila` en el próximo lote y devolver la fila insertada
+
+        Raises:
+            Exception: el error de la inserción de esta fila
+            TimeoutError: si el lote no se completa en `timeout` segundos
+        """
+        pendiente = _Pendiente(fila)
+        with self._cond:
+            # Los hilos se crean en el primer uso (después del fork de los workers)
+            if not self._iniciado:
+                self._iniciar()
+            self._pendientes.append(pendiente)
+            self._cond.notify()
+
+        if not pendiente.listo.wait(self.timeout):
+            with self._cond:
+                if not pendiente.listo.is_set():
+                    self._abandonadas += 1
+                    if pendiente in self._pendientes:
+                        # Aún no ha salido hacia la base de datos: no se insertará
+                        self._pendientes.remove(pendiente)
+                    else:
+                        # Ya va en un lote: quien lo vacía avisa con al_abandonar
+                        pendiente.abandonada = True
+                    raise TimeoutError('La inserción agrupada no terminó a tiempo')
+        if pendiente.error is not None:
+            raise pendiente.error
+        return pendiente.resultado
+
+    def _iniciar(self):
+        for i in range(self.hilos):
+            threading.Thread(target=self._bucle, name=f'agrupador-{i}', daemon=True).start()
+        self._iniciado = True
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._pendientes:
+                    self._cond.wait()
+                # Esperar a que el lote se llene o venza la ventana de la primera fila
+                limite = self._pendientes[0].encolado + self.ventana
+                while len(self._pendientes) < self.max_lote:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                    if not self._pendientes:
+                        break
+                lote = [self._pendientes.popleft()
+                        for _ in range(min(self.max_lote, len(self._pendientes)))]
+            if lote:
+                self._vaciar(lote)
+
+    def _vaciar(self, lote):
+        inicio = time.monotonic()
+        try:
+            insertadas = self.insertar_lote([p.fila for p in lote])
+            if len(insertadas or []) != len(lote):
+                raise RuntimeError('La inserción devolvió un número de filas distinto')
+            for pendiente, fila in zip(lote, insertadas):
+                pendiente.resultado = fila
+        except Exception as e:
+            if len(lote) == 1:
+                lote[0].error = e
+            else:
+                # Una fila inválida hace fallar todo el lote: reintentar una a una
+                self._reintentar_individual(lote)
+
+        with self._cond:
+            self._lotes += 1
+            self._filas += len(lote)
+            self._fallidas += sum(1 for p in lote if p.error is not None)
+            for pendiente in lote:
+                self._esperas.append(inicio - pendiente.encolado)
+                pendiente.listo.set()
+            abandonadas = [p.resultado for p in lote if p.abandonada and p.resultado is not None]
+
+        # Filas insertadas cuya petición ya respondió con error
+        for fila in abandonadas:
+            if self.al_abandonar:
+                try:
+                    self.al_abandonar(fila)
+                except Exception as e:
+                    print(f"⚠️ Error avisando de una inserción abandonada: {str(e)}")
+
+    def _reintentar_individual(self, lote):
+        with self._cond:
+            self._reintentos_individuales += 1
+        for pendiente in lote:
+            try:
+                insertadas = self.insertar_lote([pendiente.fila])
+                if not insertadas:
+                    raise RuntimeError('La inserción no devolvió la fila')
+                pendiente.resultado = insertadas[0]
+            except Exception as e:
+                pendiente.error = e
+
+    def metricas(self):
+        """Tamaño medio de lote y espera añadida por la agrupación"""
+        with self._cond:
+            esperas = sorted(self._esperas)
+            return {
+                'ventana_ms': self.ventana * 1000,
+                'max_lote': self.max_lote,
+                'en_buffer': len(self._pendientes),
+                'lotes': self._lotes,
+                'filas': self._filas,
+                'filas_por_lote': self._filas / self._lotes if self._lotes else 0.0,
+                'reintentos_individuales': self._reintentos_individuales,
+                'fallidas': self._fallidas,
+                'abandonadas': self._abandonadas,
+                'espera_media_ms': sum(esperas) / len(esperas) * 1000 if esperas else 0.0,
+                'espera_p95_ms': esperas[int(len(esperas) * 0.95)] * 1000 if esperas else 0.0
+            }
@@ -0,0 +1,242 @@
+"""
+Modo ASGI (asyncio) de la API
+Mismas rutas REST y mismo esquema GraphQL que app.py, pero con el cliente
+asíncrono de Supabase: mientras una petición espera a la red el worker
+atiende otras. La lógica es la de servicio_reportes.py; aquí solo se lee
+la petición de Starlette y se ejecutan sus flujos con flujos.ejecutar_async.
+
+Las tareas de fondo (subida de fotos, reconciliación de estadísticas,
+refresco del índice espacial) siguen en sus propios hilos con el cliente
+síncrono; las partes bloqueantes que quedan en una petición se ejecutan
+con asyncio.to_thread.
+
+Arranque:
+    gunicorn app_async:app -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from ariadne import graphql
+from ariadne.explorer.playground import PLAYGROUND_HTML
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from supabase import acreate_client, AsyncClientOptions
+
+from supabase_config import (supabase as supabase_sync, SUPABASE_URL, SUPABASE_KEY,
+                             SUPABASE_STORAGE_BUCKET, BACKEND_LOCAL)
+from conexiones import crear_http_client_async, calentar_async
+from graphql_cache import CacheConsultasGraphQL
+from exportacion import generar_exportacion_async, FORMATOS
+from flujos import ejecutar_async
+from servicio_reportes import (ServicioReportes, LimitePorUsuario, usuario_del_cuerpo,
+                               crear_agrupador_inserciones,
+                               informacion_api, exportar_prometheus, opciones_graphql,
+                               EXPORTACION_TAM_PAGINA, TIPO_PROMETHEUS,
+                               RATE_LIMIT_REPORTES, RATE_LIMIT_LOTE, RATE_LIMIT_VENTANA)
+from instrumentacion import instrumentar_cliente, MedicionASGI
+
+DEBUG = os.getenv('ASGI_DEBUG', '0') == '1'
+
+# Cliente asíncrono de Supabase; se crea al arrancar el worker (lifespan)
+supabase = None
+
+async def conectar():
+    """Crear el cliente asíncrono (con su pool de conexiones) y calentarlo"""
+    global supabase
+    if supabase is None and BACKEND_LOCAL:
+        # Mismos datos que el cliente síncrono (fotos y estadísticas en segundo plano)
+        from backend_local import crear_cliente_local
+        supabase = instrumentar_cliente(
+            crear_cliente_local(asincrono=True, url=SUPABASE_URL or 'http://local')
+        )
+    elif supabase is None:
+        http_client = crear_http_client_async()
+        supabase = instrumentar_cliente(await acreate_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=AsyncClientOptions(httpx_client=http_client)
+        ))
+        await calentar_async(http_client, SUPABASE_URL, SUPABASE_KEY)
+    return supabase
+
+# Índices, cachés y operaciones de la API; las tareas de fondo y el agrupador de
+# inserciones (AGRUPAR_INSERCIONES_MS) usan el cliente síncrono
+servicio = ServicioReportes(supabase_sync, SUPABASE_STORAGE_BUCKET,
+                            crear_agrupador_inserciones(supabase_sync))
+
+def responder(respuesta):
+    """Convertir una Respuesta del servicio en una respuesta de Starlette"""
+    cuerpo, estado, cabeceras = respuesta
+    if cuerpo is None:
+        return Response(status_code=estado, headers=cabeceras)
+    return JSONResponse(cuerpo, estado, headers=cabeceras)
+
+def archivo_de(foto_file):
+    """(nombre, stream, content_type) de la foto subida, o None"""
+    if not foto_file or not getattr(foto_file, 'filename', None):
+        return None
+    return foto_file.filename, foto_file.file, foto_file.content_type
+
+async def leer_cuerpo(request):
+    """Cuerpo JSON o formulario de la petición (Starlette lo guarda tras la primera lectura)"""
+    content_type = request.headers.get('content-type', '')
+    try:
+        if 'application/json' in content_type:
+            return await request.json()
+        if 'form' in content_type:
+            return await request.form()
+    except Exception:
+        pass
+    return {}
+
+async def leer_reporte(request):
+    """Campos del reporte y foto opcional de POST /reportes"""
+    data = await leer_cuerpo(request)
+    if not hasattr(data, 'items'):
+        return data, None
+    data = dict(data)
+    return data, archivo_de(data.pop('foto', None))
+
+def rate_limit(max_requests=10, time_window=60, algoritmo=None):
+    """Decorador para limitar peticiones por usuario"""
+    limite = LimitePorUsuario(max_requests, time_window, algoritmo)
+
+    def decorator(f):
+        @wraps(f)
+        async def wrapped(request):
+            user_id = request.headers.get('X-User-ID') or usuario_del_cuerpo(await leer_cuerpo(request))
+            decision, error = limite.comprobar(user_id, f.__name__)
+            if error:
+                return responder(error)
+
+            response = await f(request)
+            response.headers.update(limite.cabeceras(decision))
+            return response
+
+        return wrapped
+    return decorator
+
+# ============================================
+# GRAPHQL (resolvers asíncronos)
+# ============================================
+
+def resolver(flujo):
+    """Resolver de ariadne que ejecuta el flujo con el cliente asíncrono"""
+    async def resolve(_, info, **kwargs):
+        return await ejecutar_async(supabase, flujo(info, **kwargs))
+    return resolve
+
+schema = servicio.crear_esquema(resolver)
+
+GRAPHQL_CACHE_DOCUMENTOS = int(os.getenv('GRAPHQL_CACHE_DOCUMENTOS', 500))
+cache_graphql = CacheConsultasGraphQL(GRAPHQL_CACHE_DOCUMENTOS) if GRAPHQL_CACHE_DOCUMENTOS else None
+
+# ============================================
+# REST ENDPOINTS
+# ============================================
+
+async def graphql_server(request):
+    if request.method == 'GET':
+        return HTMLResponse(PLAYGROUND_HTML)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        # JSON mal formado: ariadne lo rechaza con 400, como en app.py
+        data = None
+
+    data, opciones, error = opciones_graphql(cache_graphql, data)
+    if error:
+        return JSONResponse(error, 200)
+
+    success, result = await graphql(schema, data, context_value={'request': request},
+                                    debug=DEBUG, **opciones)
+    return JSONResponse(result, 200 if success else 400)
+
+async def home(request):
+    return JSONResponse(informacion_api('ASGI'))
+
+def metricas_componentes():
+    return servicio.metricas(cache_graphql=cache_graphql.metricas() if cache_graphql else None)
+
+async def metricas(request):
+    """Métricas internas de cachés e índices en memoria"""
+    return JSONResponse(metricas_componentes())
+
+async def metricas_prometheus(request):
+    """Histogramas de peticiones, Supabase y GraphQL, y métricas internas, para Prometheus"""
+    return Response(exportar_prometheus(metricas_componentes()), media_type=TIPO_PROMETHEUS)
+
+@rate_limit(max_requests=RATE_LIMIT_REPORTES, time_window=RATE_LIMIT_VENTANA)
+async def crear_reporte(request):
+    """Crear reporte vía REST"""
+    data, archivo = await leer_reporte(request)
+    return responder(await ejecutar_async(supabase, servicio.crear_reporte(data, archivo)))
+
+async def crear_reporte_test(request):
+    """Endpoint de prueba sin rate limiting (solo formulario, como en app.py)"""
+    data, archivo = await leer_reporte(request) \
+        if 'form' in request.headers.get('content-type', '') else ({}, None)
+    return responder(await ejecutar_async(supabase, servicio.crear_reporte_test(data, archivo)))
+
+@rate_limit(max_requests=RATE_LIMIT_LOTE, time_window=RATE_LIMIT_VENTANA)
+async def crear_reportes_lote_rest(request):
+    """Crear varios reportes en una petición (sincronización offline)"""
+    return responder(await ejecutar_async(supabase, servicio.crear_reportes_lote_rest(
+        await leer_cuerpo(request), request.headers.get('X-User-ID'))))
+
+async def obtener_reportes(request):
+    """Obtener reportes con filtros"""
+    return responder(await ejecutar_async(supabase, servicio.obtener_reportes(
+        request.query_params, request.headers.get('If-None-Match'))))
+
+async def obtener_reportes_cercanos(request):
+    """Obtener reportes cercanos a una ubicación"""
+    return responder(await ejecutar_async(supabase, servicio.obtener_reportes_cercanos(
+        request.query_params, request.headers.get('If-None-Match'))))
+
+async def exportar_reportes(request):
+    """Exportar todos los reportes que cumplen los filtros en streaming"""
+    error, exportacion = servicio.preparar_exportacion(
+        request.query_params, request.headers.get('Accept-Encoding', ''))
+    if error:
+        return responder(error)
+
+    cuerpo = generar_exportacion_async(
+        lambda despues_de, tam: ejecutar_async(supabase, servicio.consultar_pagina_exportacion(
+            despues_de, tam, **exportacion.filtros)),
+        formato=exportacion.formato,
+        gzip=exportacion.gzip,
+        tam_pagina=EXPORTACION_TAM_PAGINA
+    )
+    return StreamingResponse(cuerpo, headers=exportacion.cabeceras,
+                             media_type=FORMATOS[exportacion.formato])
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    await conectar()
+    yield
+
+app = Starlette(
+    debug=DEBUG,
+    routes=[
+        Route('/', home, methods=['GET']),
+        Route('/graphql', graphql_server, methods=['GET', 'POST']),
+        Route('/metricas', metricas, methods=['GET']),
+        Route('/metrics', metricas_prometheus, methods=['GET']),
+        Route('/reportes', crear_reporte, methods=['POST']),
+        Route('/reportes', obtener_reportes, methods=['GET']),
+        Route('/reportes/lote', crear_reportes_lote_rest, methods=['POST']),
+        Route('/reportes/cercanos', obtener_reportes_cercanos, methods=['GET']),
+        Route('/reportes/exportar', exportar_reportes, methods=['GET']),
+        Route('/reportes/test', crear_reporte_test, methods=['POST'])
+    ],
+    middleware=[Middleware(MedicionASGI),
+                Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=ciclo_de_vida
+)
@@ -0,0 +1,600 @@
+"""
+Backend local que sustituye a Supabase (SUPABASE_BACKEND=local)
+Implementa en memoria el subconjunto del cliente de Supabase que usa la
+API: tablas con select/eq/neq/gt/gte/lt/lte/in_/or_/order/limit/range,
+insert/update/upsert, las RPC `buscar_reportes_cercanos` y
+`estadisticas_reportes`, y Storage (upload/get_public_url/exists).
+
+Cada viaje (execute() o llamada a Storage) espera una latencia
+configurable con jitter, para medir los endpoints sin un proyecto real.
+Los datos viven en el proceso: con varios workers cada uno tiene su copia,
+así que para medir conviene un solo worker.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from geo import haversine_metros
+from indice_espacial import ESTADOS_ACTIVOS
+
+LATENCIA_MS = float(os.getenv('SUPABASE_LOCAL_LATENCIA_MS', 0))
+JITTER_MS = float(os.getenv('SUPABASE_LOCAL_JITTER_MS', 0))
+# Reportes aleatorios con los que arranca la base (0 = vacía)
+REPORTES_INICIALES = int(os.getenv('SUPABASE_LOCAL_REPORTES', 0))
+SEMILLA = int(os.getenv('SUPABASE_LOCAL_SEMILLA', 0))
+
+# Valores por defecto de las columnas (lo que haría Postgres)
+DEFECTOS = {
+    'reportes': {
+        'descripcion': '',
+        'foto_url': None,
+        'foto_estado': None,
+        'foto_miniatura_url': None,
+        'estado': 'pendiente',
+        'prioridad': 'media',
+        'version': 1,
+        'votos_positivos': 0,
+        'votos_negativos': 0,
+        'updated_at': None
+    },
+    'usuarios': {}
+}
+
+# Tablas con el trigger que incrementa version y actualiza updated_at
+TABLAS_VERSIONADAS = ('reportes',)
+
+
+def ahora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ErrorBackendLocal(Exception):
+    """Error equivalente a una respuesta de error de PostgREST/Storage"""
+
+
+class Latencia:
+    """Espera por viaje: `ms` ± `jitter_ms` (uniforme)"""
+
+    def __init__(self, ms=0.0, jitter_ms=0.0, semilla=None):
+        self.ms = ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def muestra(self):
+        """Segundos a esperar en el próximo viaje"""
+        if not self.ms and not self.jitter_ms:
+            return 0.0
+        with self._lock:
+            ruido = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.ms + ruido) / 1000.0
+
+
+class BaseLocal:
+    """Tablas en memoria (listas de dicts) con ids autoincrementales"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.tablas = {}
+        self._secuencias = {}
+        self.objetos = {}
+        self.viajes = 0
+
+    def filas(self, tabla):
+        return self.tablas.setdefault(tabla, [])
+
+    def insertar(self, tabla, fila):
+        """Completar defectos, id y created_at como haría Postgres"""
+        nueva = dict(DEFECTOS.get(tabla, {}))
+        nueva.update(fila)
+        if nueva.get('id') is None:
+            self._secuencias[tabla] = self._secuencias.get(tabla, 0) + 1
+            nueva['id'] = self._secuencias[tabla]
+        else:
+            self._secuencias[tabla] = max(self._secuencias.get(tabla, 0), int(nueva['id']))
+        nueva.setdefault('created_at', ahora_iso())
+        self.filas(tabla).append(nueva)
+        return nueva
+
+
+# ============================================
+# FILTROS
+# ============================================
+
+def _coaccionar(valor_fila, valor):
+    """Convertir el valor del filtro (texto en la URL) al tipo de la columna"""
+    if valor is None or valor_fila is None or isinstance(valor, type(valor_fila)):
+        return valor
+    try:
+        if isinstance(valor_fila, bool):
+            return str(valor).lower() == 'true'
+        if isinstance(valor_fila, int):
+            return int(valor)
+        if isinstance(valor_fila, float):
+            return float(valor)
+    except (TypeError, ValueError):
+        return valor
+    return str(valor)
+
+
+def _comparar(operador, valor_fila, valor):
+    if operador == 'is':
+        return valor_fila is None if str(valor).lower() == 'null' else valor_fila == valor
+    if operador == 'in':
+        return valor_fila in [_coaccionar(valor_fila, v) for v in valor]
+    if valor_fila is None:
+        return False
+    valor = _coaccionar(valor_fila, valor)
+    try:
+        if operador == 'eq':
+            return valor_fila == valor
+        if operador == 'neq':
+            return valor_fila != valor
+        if operador == 'gt':
+            return valor_fila > valor
+        if operador == 'gte':
+            return valor_fila >= valor
+        if operador == 'lt':
+            return valor_fila < valor
+        if operador == 'lte':
+            return valor_fila <= valor
+    except TypeError:
+        return False
+    raise ErrorBackendLocal(f'Operador no soportado: {operador}')
+
+
+def _partir_nivel_superior(texto):
+    """Separar por comas que no están dentro de paréntesis ni de comillas"""
+    partes, actual, nivel, en_comillas, escapado = [], [], 0, False, False
+    for caracter in texto:
+        if escapado:
+            actual.append(caracter)
+            escapado = False
+            continue
+        if caracter == '\\':
+            actual.append(caracter)
+            escapado = True
+            continue
+        if caracter == '"':
+            en_comillas = not en_comillas
+        elif not en_comillas and caracter == '(':
+            nivel += 1
+        elif not en_comillas and caracter == ')':
+            nivel -= 1
+        elif not en_comillas and caracter == ',' and nivel == 0:
+            partes.append(''.join(actual))
+            actual = []
+            continue
+        actual.append(caracter)
+    partes.append(''.join(actual))
+    return [parte.strip() for parte in partes if parte.strip()]
+
+
+def _valor_literal(texto):
+    if len(texto) >= 2 and texto[0] == texto[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', texto[1:-1])
+    return texto
+
+
+def compilar_logico(expresion, operador='or'):
+    """
+    Filtro de una expresión lógica de PostgREST, p. ej.
+    `created_at.lt."x",and(created_at.eq."x",id.lt."5")`
+    """
+    condiciones = []
+    for parte in _partir_nivel_superior(expresion):
+        anidada = re.match(r'^(and|or)\((.*)\)$', parte)
+        if anidada:
+            condiciones.append(compilar_logico(anidada.group(2), anidada.group(1)))
+            continue
+        columna, op, valor = parte.split('.', 2)
+        if op == 'in':
+            valores = [_valor_literal(v) for v in _partir_nivel_superior(valor.strip('()'))]
+            condiciones.append(lambda fila, c=columna, v=valores: _comparar('in', fila.get(c), v))
+        else:
+            condiciones.append(
+                lambda fila, c=columna, o=op, v=_valor_literal(valor): _comparar(o, fila.get(c), v)
+            )
+
+    if operador == 'and':
+        return lambda fila: all(condicion(fila) for condicion in condiciones)
+    return lambda fila: any(condicion(fila) for condicion in condiciones)
+
+
+def _clave_orden(columna):
+    # NULLS LAST en ascendente (y, al invertir, NULLS FIRST en descendente) como Postgres
+    return lambda fila: (fila.get(columna) is None, fila.get(columna))
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+class ConsultaLocal:
+    """
+    Constructor de consultas compatible con el de postgrest-py
+
+    Con `asincrono=True` execute() devuelve una corrutina (cliente async).
+    """
+
+    def __init__(self, cliente, tabla=None, rpc=None, params=None):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.rpc_nombre = rpc
+        self.params = params or {}
+        self.operacion = 'rpc' if rpc else 'select'
+        self.columnas = '*'
+        self.datos = None
+        self.opciones = {}
+        self.filtros = []
+        self.orden = []
+        self.desde = 0
+        self.cantidad = None
+
+    # Operaciones
+    def select(self, columnas='*', **kwargs):
+        self.columnas = columnas
+        return self
+
+    def insert(self, datos, **kwargs):
+        self.operacion, self.datos, self.opciones = 'insert', datos, kwargs
+        return self
+
+    def update(self, datos, **kwargs):
+        self.operacion, self.datos, self.opciones = 'update', datos, kwargs
+        return self
+
+    def upsert(self, datos, **kwargs):
+        self.operacion, self.datos, self.opciones = 'upsert', datos, kwargs
+        return self
+
+    def delete(self, **kwargs):
+        self.operacion = 'delete'
+        return self
+
+    # Filtros
+    def _filtro(self, operador, columna, valor):
+        self.filtros.append(lambda fila: _comparar(operador, fila.get(columna), valor))
+        return self
+
+    def eq(self, columna, valor):
+        return self._filtro('eq', columna, valor)
+
+    def neq(self, columna, valor):
+        return self._filtro('neq', columna, valor)
+
+    def gt(self, columna, valor):
+        return self._filtro('gt', columna, valor)
+
+    def gte(self, columna, valor):
+        return self._filtro('gte', columna, valor)
+
+    def lt(self, columna, valor):
+        return self._filtro('lt', columna, valor)
+
+    def lte(self, columna, valor):
+        return self._filtro('lte', columna, valor)
+
+    def in_(self, columna, valores):
+        return self._filtro('in', columna, list(valores))
+
+    def is_(self, columna, valor):
+        return self._filtro('is', columna, valor)
+
+    def or_(self, expresion, **kwargs):
+        self.filtros.append(compilar_logico(expresion))
+        return self
+
+    # Orden y paginación
+    def order(self, columna, desc=False, **kwargs):
+        self.orden.append((columna, desc))
+        return self
+
+    def limit(self, cantidad, **kwargs):
+        self.cantidad = cantidad
+        return self
+
+    def range(self, inicio, fin, **kwargs):
+        self.desde = inicio
+        self.cantidad = fin - inicio + 1
+        return self
+
+    # Ejecución
+    def execute(self):
+        if self.cliente.asincrono:
+            return self._execute_async()
+        time.sleep(self.cliente.latencia.muestra())
+        return self._ejecutar()
+
+    async def _execute_async(self):
+        await asyncio.sleep(self.cliente.latencia.muestra())
+        return self._ejecutar()
+
+    def _ejecutar(self):
+        base = self.cliente.base
+        with base._lock:
+            base.viajes += 1
+            if self.operacion == 'rpc':
+                datos = self.cliente.ejecutar_rpc(self.rpc_nombre, self.params)
+            else:
+                datos = getattr(self, f'_{self.operacion}')(base)
+            return RespuestaLocal(datos)
+
+    def _coinciden(self, base):
+        return [fila for fila in base.filas(self.tabla) if all(f(fila) for f in self.filtros)]
+
+    def _proyectar(self, filas):
+        if self.columnas.strip() == '*':
+            return [dict(fila) for fila in filas]
+        columnas = [c.strip() for c in self.columnas.split(',') if c.strip()]
+        return [{c: fila.get(c) for c in columnas} for fila in filas]
+
+    def _select(self, base):
+        filas = self._coinciden(base)
+        for columna, desc in reversed(self.orden):
+            filas.sort(key=_clave_orden(columna), reverse=desc)
+        fin = None if self.cantidad is None else self.desde + self.cantidad
+        return self._proyectar(filas[self.desde:fin])
+
+    def _insert(self, base):
+        filas = self.datos if isinstance(self.datos, list) else [self.datos]
+        return [dict(base.insertar(self.tabla, fila)) for fila in filas]
+
+    def _update(self, base):
+        actualizadas = []
+        for fila in self._coinciden(base):
+            fila.update(self.datos)
+            if self.tabla in TABLAS_VERSIONADAS:
+                fila['version'] = fila.get('version', 0) + 1
+                fila['updated_at'] = ahora_iso()
+            actualizadas.append(dict(fila))
+        return actualizadas
+
+    def _upsert(self, base):
+        filas = self.datos if isinstance(self.datos, list) else [self.datos]
+        conflicto = [c.strip() for c in (self.opciones.get('on_conflict') or 'id').split(',')]
+        ignorar = self.opciones.get('ignore_duplicates', False)
+        resultado = []
+        for fila in filas:
+            existente = next((
+                e for e in base.filas(self.tabla)
+                if all(e.get(c) == fila.get(c) for c in conflicto)
+            ), None)
+            if existente is None:
+                resultado.append(dict(base.insertar(self.tabla, fila)))
+            elif not ignorar:
+                existente.update(fila)
+                resultado.append(dict(existente))
+        return resultado
+
+    def _delete(self, base):
+        borradas = self._coinciden(base)
+        ids = {id(fila) for fila in borradas}
+        base.tablas[self.tabla] = [f for f in base.filas(self.tabla) if id(f) not in ids]
+        return [dict(fila) for fila in borradas]
+
+
+class RespuestaLocal:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+# ============================================
+# STORAGE
+# ============================================
+
+class BucketLocal:
+    def __init__(self, cliente, bucket):
+        self.cliente = cliente
+        self.bucket = bucket
+
+    def _viaje(self):
+        time.sleep(self.cliente.latencia.muestra())
+
+    def _subir(self, path, file, file_options):
+        opciones = file_options or {}
+        clave = (self.bucket, path)
+        with self.cliente.base._lock:
+            self.cliente.base.viajes += 1
+            if clave in self.cliente.base.objetos and str(opciones.get('upsert')).lower() != 'true':
+                raise ErrorBackendLocal('The resource already exists')
+            self.cliente.base.objetos[clave] = {
+                'contenido': bytes(file),
+                'content_type': opciones.get('content-type')
+            }
+        return {'path': path, 'Key': f'{self.bucket}/{path}'}
+
+    def _existe(self, path):
+        with self.cliente.base._lock:
+            self.cliente.base.viajes += 1
+            return (self.bucket, path) in self.cliente.base.objetos
+
+    def upload(self, path, file, file_options=None):
+        self._viaje()
+        return self._subir(path, file, file_options)
+
+    def exists(self, path):
+        self._viaje()
+        return self._existe(path)
+
+    def get_public_url(self, path, options=None):
+        return f'{self.cliente.url}/storage/v1/object/public/{self.bucket}/{path}'
+
+
+class BucketLocalAsync(BucketLocal):
+    async def _viaje_async(self):
+        await asyncio.sleep(self.cliente.latencia.muestra())
+
+    async def upload(self, path, file, file_options=None):
+        await self._viaje_async()
+        return self._subir(path, file, file_options)
+
+    async def exists(self, path):
+        await self._viaje_async()
+        return self._existe(path)
+
+    async def get_public_url(self, path, options=None):
+        return BucketLocal.get_public_url(self, path, options)
+
+
+class StorageLocal:
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def from_(self, bucket):
+        if self.cliente.asincrono:
+            return BucketLocalAsync(self.cliente, bucket)
+        return BucketLocal(self.cliente, bucket)
+
+
+# ============================================
+# CLIENTE
+# ============================================
+
+class ClienteLocal:
+    """
+    Sustituto de `supabase.Client` sobre una BaseLocal
+
+    Args:
+        base: datos compartidos (varios clientes pueden usar la misma)
+        latencia: Latencia por viaje
+        url: base para las URLs públicas de Storage
+        asincrono: execute() y Storage devuelven corrutinas (como AsyncClient)
+    """
+
+    def __init__(self, base=None, latencia=None, url='http://local', asincrono=False):
+        self.base = base or BaseLocal()
+        self.latencia = latencia or Latencia()
+        self.url = url.rstrip('/')
+        self.asincrono = asincrono
+        self.storage = StorageLocal(self)
+
+    def table(self, nombre):
+        return ConsultaLocal(self, tabla=nombre)
+
+    def from_(self, nombre):
+        return self.table(nombre)
+
+    def rpc(self, nombre, params=None, **kwargs):
+        return ConsultaLocal(self, rpc=nombre, params=params)
+
+    def ejecutar_rpc(self, nombre, params):
+        """RPCs de la base de datos real (ver sql/)"""
+        if nombre == 'buscar_reportes_cercanos':
+            return self._buscar_reportes_cercanos(
+                float(params['p_lat']), float(params['p_lng']), float(params.get('p_radio_metros', 5000))
+            )
+        if nombre == 'estadisticas_reportes':
+            return self._estadisticas_reportes(int(params.get('p_top_usuarios', 10)))
+        raise ErrorBackendLocal(f'RPC no implementada en el backend local: {nombre}')
+
+    def _buscar_reportes_cercanos(self, lat, lng, radio):
+        cercanos = []
+        for fila in self.base.filas('reportes'):
+            if fila.get('estado') not in ESTADOS_ACTIVOS or fila.get('lat') is None:
+                continue
+            distancia = haversine_metros(lat, lng, fila['lat'], fila['lng'])
+            if distancia <= radio:
+                cercanos.append({
+                    'id': fila['id'],
+                    'categoria': fila.get('categoria'),
+                    'lat': fila['lat'],
+                    'lng': fila['lng'],
+                    'descripcion': fila.get('descripcion'),
+                    'estado': fila.get('estado'),
+                    'distancia_metros': distancia,
+                    'created_at': fila.get('created_at')
+                })
+        cercanos.sort(key=lambda r: r['distancia_metros'])
+        return cercanos
+
+    def _estadisticas_reportes(self, top_usuarios):
+        filas = self.base.filas('reportes')
+
+        def contar(campo, defecto=None):
+            conteo = {}
+            for fila in filas:
+                clave = fila.get(campo) or defecto
+                conteo[clave] = conteo.get(clave, 0) + 1
+            return conteo
+
+        por_usuario = sorted(contar('usuario_id', 'anonimo').items(), key=lambda p: -p[1])
+        return {
+            'total': len(filas),
+            'max_id': max((fila['id'] for fila in filas), default=None),
+            'por_estado': [{'estado': e, 'cantidad': c} for e, c in contar('estado').items()],
+            'por_categoria': [{'categoria': k, 'cantidad': c}
+                              for k, c in contar('categoria', 'otro').items()],
+            'por_usuario': [{'usuario_id': u, 'cantidad': c} for u, c in por_usuario[:top_usuarios]]
+        }
+
+
+# ============================================
+# DATOS DE PRUEBA
+# ============================================
+
+CATEGORIAS = ('bache', 'alumbrado', 'basura', 'semaforo', 'alcantarilla', 'otro')
+ESTADOS = ('pendiente', 'pendiente', 'en_proceso', 'resuelto', 'rechazado')
+
+
+def sembrar_reportes(base, cantidad, usuarios=None, centro=(-0.1807, -78.4678), radio_grados=0.1,
+                     dias=30, semilla=0):
+    """Insertar `cantidad` reportes aleatorios (reproducibles con `semilla`)"""
+    aleatorio = random.Random(semilla)
+    usuarios = usuarios or max(1, cantidad // 10)
+    ahora = time.time()
+    with base._lock:
+        for i in range(cantidad):
+            usuario_id = f'usuario-{aleatorio.randrange(usuarios)}'
+            lat = centro[0] + aleatorio.uniform(-radio_grados, radio_grados)
+            lng = centro[1] + aleatorio.uniform(-radio_grados, radio_grados)
+            creado = ahora - aleatorio.uniform(0, dias * 86400)
+            base.insertar('reportes', {
+                'usuario_id': usuario_id,
+                'categoria': aleatorio.choice(CATEGORIAS),
+                'lat': lat,
+                'lng': lng,
+                'ubicacion': f'SRID=4326;POINT({lng} {lat})',
+                'descripcion': f'Reporte de prueba {i}',
+                'estado': aleatorio.choice(ESTADOS),
+                'created_at': datetime.fromtimestamp(creado, timezone.utc).isoformat()
+            })
+        existentes = {u.get('usuario_id') for u in base.filas('usuarios')}
+        for n in range(usuarios):
+            if f'usuario-{n}' not in existentes:
+                base.insertar('usuarios', {'usuario_id': f'usuario-{n}'})
+
+
+# ============================================
+# CLIENTES COMPARTIDOS
+# ============================================
+
+_base_compartida = None
+_lock_base = threading.Lock()
+
+
+def obtener_base():
+    """Base del proceso, sembrada con SUPABASE_LOCAL_REPORTES la primera vez"""
+    global _base_compartida
+    with _lock_base:
+        if _base_compartida is None:
+            _base_compartida = BaseLocal()
+            if REPORTES_INICIALES:
+                sembrar_reportes(_base_compartida, REPORTES_INICIALES, semilla=SEMILLA)
+        return _base_compartida
+
+
+def crear_cliente_local(asincrono=False, url='http://local'):
+    """Cliente local con la latencia de las variables de entorno"""
+    return ClienteLocal(
+        base=obtener_base(),
+        latencia=Latencia(LATENCIA_MS, JITTER_MS, semilla=SEMILLA),
+        url=url,
+        asincrono=asincrono
+    )
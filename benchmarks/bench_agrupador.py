@@ -0,0 +1,107 @@
+"""
+Benchmark de la agrupación de inserciones
+
+Simula una base de datos con latencia por viaje, coste por fila y un
+número limitado de conexiones, y compara inserciones individuales contra
+AgrupadorInserciones con distintas ventanas y tamaños de lote:
+filas por segundo y latencia por petición (p50/p95/p99).
+
+Uso:
+    python benchmarks/bench_agrupador.py [--clientes 200] [--filas 2000] [--rtt-ms 20]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agrupador_inserciones import AgrupadorInserciones
+
+
+class BaseSimulada:
+    """Inserción con latencia fija por viaje + coste por fila y pool de conexiones"""
+
+    def __init__(self, rtt_ms, fila_ms, conexiones):
+        self.rtt = rtt_ms / 1000.0
+        self.por_fila = fila_ms / 1000.0
+        self._conexiones = threading.BoundedSemaphore(conexiones)
+        self._lock = threading.Lock()
+        self._siguiente_id = 0
+        self.viajes = 0
+
+    def insertar(self, filas):
+        with self._conexiones:
+            time.sleep(self.rtt + self.por_fila * len(filas))
+        with self._lock:
+            self.viajes += 1
+            insertadas = []
+            for fila in filas:
+                self._siguiente_id += 1
+                insertadas.append(dict(fila, id=self._siguiente_id))
+            return insertadas
+
+
+def percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def ejecutar(nombre, insertar_una, base, clientes, filas):
+    latencias = []
+    lock = threading.Lock()
+
+    def peticion(i):
+        inicio = time.perf_counter()
+        fila = insertar_una({'usuario_id': f'u{i % 50}', 'categoria': 'bache', 'n': i})
+        duracion = time.perf_counter() - inicio
+        assert fila['n'] == i, 'cada petición debe recibir su propia fila'
+        with lock:
+            latencias.append(duracion)
+
+    base.viajes = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        list(pool.map(peticion, range(filas)))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    print(f'{nombre:>26} {filas / total:>10.0f} {base.viajes:>8} '
+          f'{percentil(latencias, 0.50) * 1000:>8.1f} {percentil(latencias, 0.95) * 1000:>8.1f} '
+          f'{percentil(latencias, 0.99) * 1000:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clientes', type=int, default=200, help='peticiones concurrentes')
+    parser.add_argument('--filas', type=int, default=2000)
+    parser.add_argument('--rtt-ms', type=float, default=20.0)
+    parser.add_argument('--fila-ms', type=float, default=0.05)
+    parser.add_argument('--conexiones', type=int, default=10)
+    args = parser.parse_args()
+
+    base = BaseSimulada(args.rtt_ms, args.fila_ms, args.conexiones)
+
+    print(f'rtt={args.rtt_ms}ms coste/fila={args.fila_ms}ms conexiones={args.conexiones} '
+          f'clientes={args.clientes}')
+    print(f"{'modo':>26} {'filas/s':>10} {'viajes':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    ejecutar('individual', lambda fila: base.insertar([fila])[0], base, args.clientes, args.filas)
+
+    for ventana_ms, max_lote in ((1, 20), (5, 50), (10, 100), (25, 200)):
+        agrupador = AgrupadorInserciones(base.insertar, ventana_ms=ventana_ms, max_lote=max_lote,
+                                         hilos=args.conexiones)
+        ejecutar(f'agrupado {ventana_ms}ms/{max_lote}', agrupador.insertar, base,
+                 args.clientes, args.filas)
+
+    # Con poca carga la agrupación solo añade la ventana a cada inserción
+    print(f'\ncarga baja (4 clientes, {args.filas // 10} filas)')
+    ejecutar('individual', lambda fila: base.insertar([fila])[0], base, 4, args.filas // 10)
+    agrupador = AgrupadorInserciones(base.insertar, ventana_ms=5, max_lote=50, hilos=2)
+    ejecutar('agrupado 5ms/50', agrupador.insertar, base, 4, args.filas // 10)
+
+
+if __name__ == '__main__':
+    main()
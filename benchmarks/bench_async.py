@@ -0,0 +1,176 @@
+"""
+Prueba de carga: Flask (hilos) frente a ASGI (asyncio) con latencia inyectada
+
+Sustituye el cliente de Supabase de app.py y app_async.py por uno falso
+que tarda --latencia-ms en cada llamada, y mide peticiones por segundo y
+latencia p95 a distintos niveles de concurrencia:
+
+    - Flask: un pool de --hilos hilos (como un worker gthread de gunicorn)
+    - ASGI: un solo bucle de eventos, todas las peticiones a la vez
+
+La consulta GraphQL pide tres campos raíz independientes: en ASGI se
+resuelven en paralelo (una latencia), en Flask uno tras otro (tres).
+El p95 de Flask se mide desde que un hilo toma la petición, así que no
+incluye la espera en cola: su límite se ve en req/s.
+
+Uso:
+    python benchmarks/bench_async.py [--latencia-ms 30] [--hilos 8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Importar las apps requiere configuración de Supabase; no se hace ninguna petición real
+os.environ.setdefault('SUPABASE_URL', 'http://localhost:54321')
+os.environ.setdefault('SUPABASE_KEY', 'benchmark')
+# Sin caché de listados: cada petición llega al "backend"
+os.environ['CACHE_REPORTES_TTL'] = '0'
+os.environ['ESTADISTICAS_MODO'] = 'agregado'
+
+import httpx
+
+FILAS = [
+    {'id': i, 'categoria': 'bache', 'lat': 0.0, 'lng': 0.0, 'descripcion': '', 'estado': 'pendiente',
+     'prioridad': 'media', 'usuario_id': 'u', 'created_at': f'2024-01-01T00:00:{i:02d}+00:00',
+     'updated_at': None, 'version': 1, 'votos_positivos': 0, 'votos_negativos': 0,
+     'distancia_metros': 10.0}
+    for i in range(20)
+]
+
+ESTADISTICAS = {'total': 20, 'por_estado': [], 'por_categoria': [], 'por_usuario': []}
+
+CONSULTA_GRAPHQL = '''{
+    a: reportes(limit: 10) { id estado }
+    b: reportesCercanos(lat: 0, lng: 0) { id distancia_metros }
+    c: estadisticas { total }
+}'''
+
+
+class Respuesta:
+    def __init__(self, data):
+        self.data = data
+
+
+class ConsultaFalsa:
+    """Constructor de consultas que ignora los filtros y tarda `latencia` en execute()"""
+
+    def __init__(self, latencia, data, asincrono):
+        self.latencia = latencia
+        self.data = data
+        self.asincrono = asincrono
+
+    def __getattr__(self, nombre):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        if self.asincrono:
+            return self._execute_async()
+        time.sleep(self.latencia)
+        return Respuesta(self.data)
+
+    async def _execute_async(self):
+        await asyncio.sleep(self.latencia)
+        return Respuesta(self.data)
+
+
+class ClienteFalso:
+    def __init__(self, latencia, asincrono):
+        self.latencia = latencia
+        self.asincrono = asincrono
+
+    def table(self, nombre):
+        return ConsultaFalsa(self.latencia, FILAS, self.asincrono)
+
+    def rpc(self, nombre, params=None):
+        data = ESTADISTICAS if nombre == 'estadisticas_reportes' else FILAS
+        return ConsultaFalsa(self.latencia, data, self.asincrono)
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def carga_flask(app_flask, peticion, concurrencia, total, hilos):
+    cliente = app_flask.test_client()
+    latencias = []
+
+    def una(_):
+        inicio = time.perf_counter()
+        respuesta = peticion(cliente)
+        assert respuesta.status_code == 200, respuesta.status_code
+        latencias.append(time.perf_counter() - inicio)
+
+    # La concurrencia real la limita el número de hilos del worker
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(hilos, concurrencia)) as pool:
+        list(pool.map(una, range(total)))
+    return total / (time.perf_counter() - inicio), latencias
+
+
+async def carga_asgi(app_asgi, peticion, concurrencia, total):
+    latencias = []
+    semaforo = asyncio.Semaphore(concurrencia)
+    transporte = httpx.ASGITransport(app=app_asgi)
+
+    async with httpx.AsyncClient(transport=transporte, base_url='http://bench') as cliente:
+        async def una():
+            async with semaforo:
+                inicio = time.perf_counter()
+                respuesta = await peticion(cliente)
+                assert respuesta.status_code == 200, respuesta.status_code
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una() for _ in range(total)))
+        return total / (time.perf_counter() - inicio), latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latencia-ms', type=float, default=30.0)
+    parser.add_argument('--hilos', type=int, default=8, help='hilos del worker Flask')
+    parser.add_argument('--concurrencias', default='1,10,50,200')
+    args = parser.parse_args()
+
+    import app as app_sync
+    import app_async
+
+    latencia = args.latencia_ms / 1000.0
+    app_sync.supabase = ClienteFalso(latencia, asincrono=False)
+    app_async.supabase = ClienteFalso(latencia, asincrono=True)
+
+    escenarios = {
+        'GET /reportes': (
+            lambda c: c.get('/reportes?limit=20'),
+            lambda c: c.get('/reportes?limit=20')
+        ),
+        'GraphQL 3 campos': (
+            lambda c: c.post('/graphql', json={'query': CONSULTA_GRAPHQL}),
+            lambda c: c.post('/graphql', json={'query': CONSULTA_GRAPHQL})
+        )
+    }
+
+    print(f'latencia={args.latencia_ms}ms hilos flask={args.hilos}')
+    print(f"{'escenario':>18} {'conc.':>6} {'flask req/s':>12} {'p95 ms':>8} "
+          f"{'asgi req/s':>12} {'p95 ms':>8}")
+    for nombre, (peticion_flask, peticion_asgi) in escenarios.items():
+        for concurrencia in (int(c) for c in args.concurrencias.split(',')):
+            total = max(50, concurrencia * 4)
+            rps_flask, lat_flask = carga_flask(app_sync.app, peticion_flask, concurrencia,
+                                               total, args.hilos)
+            rps_asgi, lat_asgi = asyncio.run(carga_asgi(app_async.app, peticion_asgi,
+                                                        concurrencia, total))
+            print(f'{nombre:>18} {concurrencia:>6} {rps_flask:>12.0f} '
+                  f'{percentil(lat_flask, 0.95) * 1000:>8.1f} {rps_asgi:>12.0f} '
+                  f'{percentil(lat_asgi, 0.95) * 1000:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
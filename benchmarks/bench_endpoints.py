@@ -0,0 +1,456 @@
+"""
+Prueba de carga de los endpoints con mezclas de tráfico realistas
+
+Lanza --concurrencia clientes que repiten peticiones elegidas al azar
+(con pesos) de una mezcla durante --duracion segundos, y mide por endpoint
+peticiones por segundo y latencia p50/p95/p99:
+
+    - mapa:   la app móvil refrescando el mapa (cercanos y listado con ETag)
+    - rafaga: ráfagas de reportes nuevos (POST /reportes y /reportes/lote)
+    - panel:  el panel de administración (estadísticas, filtros, paginación)
+    - todo:   las tres a la vez
+
+Por defecto la app Flask se ejecuta en el proceso, sobre el backend local
+en memoria (backend_local.py) con --latencia-ms ± --jitter-ms por viaje a
+"Supabase". Con --url la carga va por socket a un servidor ya arrancado
+(gunicorn o uvicorn; para medir sin red, arrancarlo con SUPABASE_BACKEND=local).
+
+Los resultados se guardan en JSON con --salida, y --comparar marca las
+regresiones respecto a una ejecución anterior (sale con código 1):
+
+Uso:
+    python benchmarks/bench_endpoints.py --mezcla todo --salida base.json
+    python benchmarks/bench_endpoints.py --mezcla todo --comparar base.json
+    python benchmarks/bench_endpoints.py --url http://127.0.0.1:5000 --mezcla mapa
+    python benchmarks/bench_endpoints.py --cargar nuevo.json --comparar base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Centro de los reportes sembrados por backend_local.sembrar_reportes
+CENTRO = (-0.1807, -78.4678)
+USUARIOS = 2000
+
+CONSULTA_ESTADISTICAS = '''{
+    estadisticas { total pendientes en_proceso resueltos rechazados
+                   por_categoria { categoria cantidad } por_usuario { usuario_id cantidad } }
+}'''
+
+CONSULTA_PAGINADA = '''query Pagina($after: String, $estado: String) {
+    reportesPaginados(first: 20, after: $after, estado: $estado) {
+        edges { cursor node { id categoria estado created_at } }
+        pageInfo { hasNextPage endCursor }
+    }
+}'''
+
+CONSULTA_CERCANOS = '''query Cercanos($lat: Float!, $lng: Float!) {
+    reportesCercanos(lat: $lat, lng: $lng, radio: 3000) {
+        id categoria lat lng estado distancia_metros
+    }
+}'''
+
+
+# ============================================
+# MEZCLAS
+# ============================================
+
+class Sesion:
+    """Estado de un cliente simulado (ETags vistos, cursor del panel)"""
+
+    def __init__(self, semilla):
+        self.random = random.Random(semilla)
+        self.etags = {}
+        self.cursor = None
+
+    def punto(self, radio_grados=0.1):
+        return (CENTRO[0] + self.random.uniform(-radio_grados, radio_grados),
+                CENTRO[1] + self.random.uniform(-radio_grados, radio_grados))
+
+    def usuario(self):
+        return f'usuario-{self.random.randrange(USUARIOS)}'
+
+    def reporte(self):
+        lat, lng = self.punto()
+        return {
+            'usuario_id': self.usuario(),
+            'categoria': self.random.choice(('bache', 'alumbrado', 'basura', 'semaforo')),
+            'lat': lat,
+            'lng': lng,
+            'descripcion': 'Reporte de carga'
+        }
+
+
+def con_etag(sesion, cliente, ruta):
+    """GET que reenvía el último ETag visto, como hace la app al refrescar"""
+    headers = {'If-None-Match': sesion.etags[ruta]} if ruta in sesion.etags else {}
+    respuesta = cliente.get(ruta, headers=headers)
+    if respuesta.headers.get('ETag'):
+        sesion.etags[ruta] = respuesta.headers['ETag']
+    return respuesta
+
+
+def leer_json(respuesta):
+    """Cuerpo JSON de una respuesta del cliente de pruebas de Flask o de httpx"""
+    leer = getattr(respuesta, 'get_json', None) or respuesta.json
+    return leer()
+
+
+def mapa_cercanos(sesion, cliente):
+    # Pocas posiciones distintas: varios usuarios miran la misma zona
+    lat, lng = (round(c, 2) for c in sesion.punto(0.05))
+    return con_etag(sesion, cliente, f'/reportes/cercanos?lat={lat}&lng={lng}&radio=3000')
+
+
+def mapa_listado(sesion, cliente):
+    return con_etag(sesion, cliente, '/reportes?limit=50')
+
+
+def mapa_graphql(sesion, cliente):
+    lat, lng = sesion.punto(0.05)
+    return cliente.post('/graphql', json={'query': CONSULTA_CERCANOS,
+                                          'variables': {'lat': lat, 'lng': lng}})
+
+
+def rafaga_reporte(sesion, cliente):
+    return cliente.post('/reportes', json=sesion.reporte())
+
+
+def rafaga_lote(sesion, cliente):
+    usuario_id = sesion.usuario()
+    reportes = [dict(sesion.reporte(), usuario_id=usuario_id) for _ in range(10)]
+    return cliente.post('/reportes/lote', json={'usuario_id': usuario_id, 'reportes': reportes})
+
+
+def rafaga_graphql(sesion, cliente):
+    mutacion = 'mutation Crear($input: ReporteInput!) { crearReporte(input: $input) { success code } }'
+    return cliente.post('/graphql', json={'query': mutacion, 'variables': {'input': sesion.reporte()}})
+
+
+def panel_estadisticas(sesion, cliente):
+    return cliente.post('/graphql', json={'query': CONSULTA_ESTADISTICAS})
+
+
+def panel_filtro(sesion, cliente):
+    estado = sesion.random.choice(('pendiente', 'en_proceso', 'resuelto'))
+    return cliente.get(f'/reportes?estado={estado}&limit=100')
+
+
+def panel_paginas(sesion, cliente):
+    """Recorre el listado página a página y vuelve a empezar al llegar al final"""
+    respuesta = cliente.post('/graphql', json={'query': CONSULTA_PAGINADA,
+                                               'variables': {'after': sesion.cursor}})
+    try:
+        info = leer_json(respuesta)['data']['reportesPaginados']['pageInfo']
+        sesion.cursor = info['endCursor'] if info['hasNextPage'] else None
+    except (TypeError, KeyError, ValueError):
+        sesion.cursor = None
+    return respuesta
+
+
+# nombre: [(peso, endpoint, función)]
+MEZCLAS = {
+    'mapa': [
+        (6, 'GET /reportes/cercanos', mapa_cercanos),
+        (3, 'GET /reportes', mapa_listado),
+        (1, 'GraphQL reportesCercanos', mapa_graphql)
+    ],
+    'rafaga': [
+        (6, 'POST /reportes', rafaga_reporte),
+        (1, 'POST /reportes/lote', rafaga_lote),
+        (3, 'GraphQL crearReporte', rafaga_graphql)
+    ],
+    'panel': [
+        (3, 'GraphQL estadisticas', panel_estadisticas),
+        (4, 'GET /reportes?estado', panel_filtro),
+        (3, 'GraphQL reportesPaginados', panel_paginas)
+    ]
+}
+MEZCLAS['todo'] = [
+    (peso * proporcion, endpoint, funcion)
+    for nombre, proporcion in (('mapa', 6), ('rafaga', 1), ('panel', 3))
+    for peso, endpoint, funcion in MEZCLAS[nombre]
+]
+
+
+# ============================================
+# CARGA
+# ============================================
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+class Registro:
+    """Latencias y códigos de estado por endpoint (compartido entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.estados = {}
+        self.excepciones = {}
+
+    def anotar(self, endpoint, segundos, estado):
+        with self._lock:
+            self.latencias.setdefault(endpoint, []).append(segundos)
+            por_estado = self.estados.setdefault(endpoint, {})
+            por_estado[estado] = por_estado.get(estado, 0) + 1
+
+    def anotar_excepcion(self, endpoint, error):
+        with self._lock:
+            self.excepciones.setdefault(endpoint, []).append(repr(error))
+
+
+def ejecutar_carga(crear_cliente, mezcla, concurrencia, duracion, calentamiento, semilla):
+    """
+    Bucle cerrado: cada hilo envía una petición tras otra durante `duracion`
+    segundos; las primeras `calentamiento` de cada hilo no se miden.
+    """
+    pesos = [peso for peso, _, _ in mezcla]
+    registro = Registro()
+    fin = time.perf_counter() + duracion
+
+    def cliente_simulado(n):
+        sesion = Sesion(semilla * 1000 + n)
+        cliente = crear_cliente()
+        enviadas = 0
+        while time.perf_counter() < fin:
+            _, endpoint, funcion = sesion.random.choices(mezcla, weights=pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                respuesta = funcion(sesion, cliente)
+            except Exception as e:
+                registro.anotar_excepcion(endpoint, e)
+                continue
+            segundos = time.perf_counter() - inicio
+            enviadas += 1
+            if enviadas > calentamiento:
+                registro.anotar(endpoint, segundos, respuesta.status_code)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        list(pool.map(cliente_simulado, range(concurrencia)))
+    return registro, time.perf_counter() - inicio
+
+
+def resumir(latencias, estados, excepciones, segundos):
+    errores = sum(c for estado, c in estados.items() if estado >= 500) + len(excepciones)
+    return {
+        'peticiones': len(latencias),
+        'errores': errores,
+        'req_s': len(latencias) / segundos if segundos else 0.0,
+        'p50_ms': percentil(latencias, 0.50) * 1000 if latencias else None,
+        'p95_ms': percentil(latencias, 0.95) * 1000 if latencias else None,
+        'p99_ms': percentil(latencias, 0.99) * 1000 if latencias else None,
+        'media_ms': sum(latencias) / len(latencias) * 1000 if latencias else None,
+        'estados': {str(estado): c for estado, c in sorted(estados.items())}
+    }
+
+
+def resultados(registro, segundos):
+    endpoints = {
+        endpoint: resumir(registro.latencias.get(endpoint, []), registro.estados.get(endpoint, {}),
+                          registro.excepciones.get(endpoint, []), segundos)
+        for endpoint in sorted(set(registro.latencias) | set(registro.excepciones))
+    }
+    todas = [s for latencias in registro.latencias.values() for s in latencias]
+    estados = {}
+    for por_estado in registro.estados.values():
+        for estado, c in por_estado.items():
+            estados[estado] = estados.get(estado, 0) + c
+    excepciones = [e for lista in registro.excepciones.values() for e in lista]
+    return {
+        'total': resumir(todas, estados, excepciones, segundos),
+        'endpoints': endpoints,
+        'excepciones': excepciones[:10]
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ============================================
+# COMPARACIÓN
+# ============================================
+
+# (métrica, más alto es peor)
+METRICAS_COMPARADAS = (('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('req_s', False))
+
+
+# Parámetros que deben coincidir para que la comparación tenga sentido
+PARAMETROS_COMPARABLES = ('modo', 'mezcla', 'concurrencia', 'latencia_ms', 'jitter_ms',
+                          'reportes_iniciales')
+
+
+def diferencias_parametros(base, actual):
+    return [
+        (parametro, base['meta'].get(parametro), actual['meta'].get(parametro))
+        for parametro in PARAMETROS_COMPARABLES
+        if base['meta'].get(parametro) != actual['meta'].get(parametro)
+    ]
+
+
+def comparar(base, actual, tolerancia, minimo_ms=2.0):
+    """
+    Regresiones de `actual` respecto a `base`: latencias que suben o
+    throughput que baja más de `tolerancia` (fracción), y errores nuevos.
+    Las latencias que suben menos de `minimo_ms` se consideran ruido.
+
+    Returns:
+        list: (endpoint, métrica, valor base, valor actual, cambio)
+    """
+    regresiones = []
+    endpoints = dict(actual['endpoints'], TOTAL=actual['total'])
+    endpoints_base = dict(base['endpoints'], TOTAL=base['total'])
+    for endpoint, metricas in endpoints.items():
+        anteriores = endpoints_base.get(endpoint)
+        if not anteriores:
+            continue
+        for metrica, mas_es_peor in METRICAS_COMPARADAS:
+            antes, ahora = anteriores.get(metrica), metricas.get(metrica)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes
+            if mas_es_peor and ahora - antes < minimo_ms:
+                continue
+            if (cambio if mas_es_peor else -cambio) > tolerancia:
+                regresiones.append((endpoint, metrica, antes, ahora, cambio))
+        if metricas['errores'] > anteriores.get('errores', 0):
+            regresiones.append((endpoint, 'errores', anteriores.get('errores', 0),
+                                metricas['errores'], None))
+    return regresiones
+
+
+# ============================================
+# SALIDA
+# ============================================
+
+def imprimir(datos):
+    meta = datos['meta']
+    latencia = ('la del servidor' if meta['latencia_ms'] is None
+                else f"{meta['latencia_ms']}±{meta['jitter_ms']}ms")
+    print(f"mezcla={meta['mezcla']} modo={meta['modo']} concurrencia={meta['concurrencia']} "
+          f"duración={meta['duracion_s']:.1f}s latencia={latencia} commit={meta['commit']}")
+    print(f"{'endpoint':>28} {'peticiones':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errores':>8}  estados")
+    for endpoint, m in list(datos['endpoints'].items()) + [('TOTAL', datos['total'])]:
+        if not m['peticiones']:
+            print(f"{endpoint:>28} {0:>10} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {m['errores']:>8}")
+            continue
+        estados = ' '.join(f'{e}:{c}' for e, c in m['estados'].items())
+        print(f"{endpoint:>28} {m['peticiones']:>10} {m['req_s']:>8.1f} {m['p50_ms']:>8.1f} "
+              f"{m['p95_ms']:>8.1f} {m['p99_ms']:>8.1f} {m['errores']:>8}  {estados}")
+    for excepcion in datos.get('excepciones', []):
+        print(f'  ⚠️ {excepcion}')
+
+
+def imprimir_comparacion(regresiones, tolerancia):
+    if not regresiones:
+        print(f'✅ Sin regresiones (tolerancia {tolerancia:.0%})')
+        return
+    print(f'❌ {len(regresiones)} regresiones (tolerancia {tolerancia:.0%}):')
+    for endpoint, metrica, antes, ahora, cambio in regresiones:
+        detalle = f'{cambio:+.1%}' if cambio is not None else ''
+        print(f'  {endpoint:>28} {metrica:>8}: {antes:.1f} → {ahora:.1f} {detalle}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mezcla', choices=sorted(MEZCLAS), default='todo')
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=10.0, help='segundos de carga')
+    parser.add_argument('--calentamiento', type=int, default=5,
+                        help='peticiones por cliente que no se miden')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--url', help='servidor ya arrancado (por defecto, la app en el proceso)')
+    parser.add_argument('--latencia-ms', type=float, default=20.0,
+                        help='latencia por viaje del backend local (solo en el proceso)')
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--reportes', type=int, default=2000, help='reportes iniciales sembrados')
+    parser.add_argument('--salida', help='guardar los resultados en este JSON')
+    parser.add_argument('--cargar', help='no ejecutar: leer los resultados de este JSON')
+    parser.add_argument('--comparar', help='JSON de referencia para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.15,
+                        help='empeoramiento permitido antes de marcar regresión (0.15 = 15%%)')
+    parser.add_argument('--minimo-ms', type=float, default=2.0,
+                        help='subida de latencia por debajo de la cual no hay regresión')
+    args = parser.parse_args()
+
+    if args.cargar:
+        with open(args.cargar) as f:
+            datos = json.load(f)
+    else:
+        if args.url:
+            import httpx
+
+            def crear_cliente():
+                return httpx.Client(base_url=args.url, timeout=30)
+        else:
+            # La app se importa después de configurar el backend local
+            os.environ['SUPABASE_BACKEND'] = 'local'
+            os.environ['SUPABASE_LOCAL_LATENCIA_MS'] = str(args.latencia_ms)
+            os.environ['SUPABASE_LOCAL_JITTER_MS'] = str(args.jitter_ms)
+            os.environ['SUPABASE_LOCAL_REPORTES'] = str(args.reportes)
+            os.environ['SUPABASE_LOCAL_SEMILLA'] = str(args.semilla)
+            import app as app_module
+            app_module.supabase.obtener()
+
+            def crear_cliente():
+                return app_module.app.test_client()
+
+        registro, segundos = ejecutar_carga(crear_cliente, MEZCLAS[args.mezcla], args.concurrencia,
+                                            args.duracion, args.calentamiento, args.semilla)
+        datos = {
+            'meta': {
+                'fecha': datetime.now(timezone.utc).isoformat(),
+                'commit': commit_actual(),
+                'python': platform.python_version(),
+                'modo': args.url or 'proceso',
+                'mezcla': args.mezcla,
+                'concurrencia': args.concurrencia,
+                'duracion_s': segundos,
+                'latencia_ms': None if args.url else args.latencia_ms,
+                'jitter_ms': None if args.url else args.jitter_ms,
+                'reportes_iniciales': None if args.url else args.reportes,
+                'semilla': args.semilla
+            },
+            **resultados(registro, segundos)
+        }
+
+    imprimir(datos)
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        print(f'💾 Resultados guardados en {args.salida}')
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        for parametro, antes, ahora in diferencias_parametros(base, datos):
+            print(f'⚠️ {parametro} distinto de la referencia: {antes} → {ahora}')
+        regresiones = comparar(base, datos, args.tolerancia, args.minimo_ms)
+        imprimir_comparacion(regresiones, args.tolerancia)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark de estadísticas: escaneo completo vs agregación en la base de datos
+
+Usa SQLite en memoria como sustituto local de Postgres. Compara:
+  - escaneo: SELECT * de toda la tabla y conteo en Python (implementación original)
+  - agregado: GROUP BY equivalentes a la RPC `estadisticas_reportes`
+
+Antes de medir comprueba que ambos caminos devuelven lo mismo. Estas
+consultas son una copia en SQLite: la función SQL real y los contadores
+incrementales se comprueban con benchmarks/comprobar_estadisticas.py.
+
+Uso:
+    python benchmarks/bench_estadisticas.py [--filas 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from estadisticas import formatear_agregados, TOP_USUARIOS
+
+ESTADOS = ['pendiente', 'en_proceso', 'resuelto', 'rechazado']
+CATEGORIAS = ['bache', 'alumbrado', 'basura', 'inundacion', 'semaforo', 'otro']
+
+
+def crear_tabla(filas):
+    """Crear la tabla `reportes` con datos sintéticos"""
+    conexion = sqlite3.connect(':memory:')
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("""
+        create table reportes (
+            id integer primary key,
+            usuario_id text,
+            categoria text,
+            lat real,
+            lng real,
+            ubicacion text,
+            descripcion text,
+            foto_url text,
+            estado text,
+            prioridad text,
+            created_at text
+        )
+    """)
+    aleatorio = random.Random(42)
+    usuarios = max(10, filas // 50)
+    conexion.executemany(
+        'insert into reportes values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (
+                i,
+                f'usuario-{int(aleatorio.paretovariate(1.2)) % usuarios}',
+                aleatorio.choice(CATEGORIAS),
+                lat,
+                lng,
+                f'SRID=4326;POINT({lng} {lat})',
+                'Descripción de prueba del incidente reportado por el ciudadano',
+                f'https://example.supabase.co/storage/v1/object/public/reportes-fotos/{i}.jpg',
+                aleatorio.choice(ESTADOS),
+                'media',
+                '2024-01-01T00:00:00'
+            )
+            for i, lat, lng in (
+                (i, aleatorio.uniform(-4, 1), aleatorio.uniform(-81, -75))
+                for i in range(filas)
+            )
+        )
+    )
+    conexion.execute('create index idx_estado on reportes (estado)')
+    conexion.execute('create index idx_categoria on reportes (categoria)')
+    conexion.execute('create index idx_usuario on reportes (usuario_id)')
+    return conexion
+
+
+def estadisticas_escaneo(conexion):
+    """Implementación original: traer todas las filas y contar en Python"""
+    reportes = [dict(fila) for fila in conexion.execute('select * from reportes')]
+
+    categorias = {}
+    usuarios = {}
+    conteo_estados = {}
+    for r in reportes:
+        conteo_estados[r.get('estado')] = conteo_estados.get(r.get('estado'), 0) + 1
+        cat = r.get('categoria', 'otro')
+        categorias[cat] = categorias.get(cat, 0) + 1
+        uid = r.get('usuario_id', 'anonimo')
+        usuarios[uid] = usuarios.get(uid, 0) + 1
+
+    por_usuario = [{'usuario_id': uid, 'cantidad': cant} for uid, cant in usuarios.items()]
+    por_usuario.sort(key=lambda x: x['cantidad'], reverse=True)
+
+    return formatear_agregados(
+        len(reportes),
+        [{'estado': e, 'cantidad': c} for e, c in conteo_estados.items()],
+        [{'categoria': cat, 'cantidad': cant} for cat, cant in categorias.items()],
+        por_usuario
+    )
+
+
+def estadisticas_agregadas(conexion):
+    """Mismas consultas que la RPC `estadisticas_reportes`"""
+    total = conexion.execute('select count(*) from reportes').fetchone()[0]
+    por_estado = [
+        {'estado': fila[0], 'cantidad': fila[1]}
+        for fila in conexion.execute(
+            'select estado, count(*) from reportes group by estado'
+        )
+    ]
+    por_categoria = [
+        {'categoria': fila[0], 'cantidad': fila[1]}
+        for fila in conexion.execute(
+            "select coalesce(categoria, 'otro'), count(*) from reportes group by 1"
+        )
+    ]
+    por_usuario = [
+        {'usuario_id': fila[0], 'cantidad': fila[1]}
+        for fila in conexion.execute(
+            "select coalesce(usuario_id, 'anonimo'), count(*) as cantidad "
+            "from reportes group by 1 order by cantidad desc limit ?",
+            (TOP_USUARIOS,)
+        )
+    ]
+    return formatear_agregados(total, por_estado, por_categoria, por_usuario)
+
+
+def comprobar_equivalencia(conexion):
+    """Ambos caminos deben devolver los mismos números"""
+    a = estadisticas_escaneo(conexion)
+    b = estadisticas_agregadas(conexion)
+
+    for campo in ('total', 'pendientes', 'en_proceso', 'resueltos', 'rechazados'):
+        assert a[campo] == b[campo], f'{campo}: {a[campo]} != {b[campo]}'
+
+    ordenar = lambda filas: sorted((f['categoria'], f['cantidad']) for f in filas)
+    assert ordenar(a['por_categoria']) == ordenar(b['por_categoria'])
+
+    # Con empates el orden puede variar; las cantidades del top deben coincidir
+    assert [f['cantidad'] for f in a['por_usuario']] == \
+        [f['cantidad'] for f in b['por_usuario']]
+
+
+def medir(funcion, conexion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(conexion)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} {'escaneo (ms)':>14} {'agregado (ms)':>14} {'mejora':>8}")
+    for filas in args.filas:
+        conexion = crear_tabla(filas)
+        comprobar_equivalencia(conexion)
+
+        t_escaneo = medir(estadisticas_escaneo, conexion, args.repeticiones)
+        t_agregado = medir(estadisticas_agregadas, conexion, args.repeticiones)
+        print(
+            f'{filas:>10} {t_escaneo * 1000:>14.1f} {t_agregado * 1000:>14.1f} '
+            f'{t_escaneo / t_agregado:>7.1f}x'
+        )
+        conexion.close()
+
+
+if __name__ == '__main__':
+    main()
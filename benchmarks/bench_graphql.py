@@ -0,0 +1,121 @@
+"""
+Benchmark de POST /graphql con y sin caché de documentos
+
+Envía las consultas típicas de la app móvil al `schema` real a través del
+cliente de pruebas de Flask y mide peticiones por segundo:
+  - sin caché: parseo y validación en cada petición
+  - con caché: documento y validación memorizados
+  - persistidas: el cliente envía solo el hash (APQ)
+
+Los resolvers usan un cliente de Supabase vacío para medir solo el coste
+de GraphQL, no el de la red.
+
+Uso:
+    python benchmarks/bench_graphql.py [--peticiones 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault('SUPABASE_URL', 'http://localhost:54321')
+os.environ.setdefault('SUPABASE_KEY', 'benchmark')
+
+import app as app_module
+from graphql_cache import CacheConsultasGraphQL, hash_consulta
+
+CONSULTAS = [
+    """
+    query Reportes($limit: Int, $categoria: String) {
+        reportes(limit: $limit, categoria: $categoria) {
+            id categoria lat lng descripcion estado prioridad
+            usuario_id foto_url created_at updated_at version
+            votos_positivos votos_negativos
+        }
+    }
+    """,
+    """
+    query Cercanos($lat: Float!, $lng: Float!, $radio: Int) {
+        reportesCercanos(lat: $lat, lng: $lng, radio: $radio) {
+            id categoria lat lng descripcion estado distancia_metros created_at
+        }
+    }
+    """,
+    """
+    query MisReportes($usuario_id: String!) {
+        misReportes(usuario_id: $usuario_id) {
+            id categoria estado created_at foto_url
+        }
+    }
+    """,
+]
+
+VARIABLES = [
+    {'limit': 50, 'categoria': 'bache'},
+    {'lat': -2.19, 'lng': -79.88, 'radio': 5000},
+    {'usuario_id': 'usuario-1'},
+]
+
+
+class RespuestaVacia:
+    data = []
+
+
+class ClienteVacio:
+    """Cliente que acepta cualquier cadena de llamadas y devuelve data=[]"""
+
+    def __getattr__(self, nombre):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return RespuestaVacia()
+
+
+def medir(cliente_http, cuerpos, peticiones):
+    for cuerpo in cuerpos * 10:
+        cliente_http.post('/graphql', json=cuerpo)
+
+    inicio = time.perf_counter()
+    for i in range(peticiones):
+        respuesta = cliente_http.post('/graphql', json=cuerpos[i % len(cuerpos)])
+        assert respuesta.status_code == 200, respuesta.json
+    return peticiones / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--peticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    app_module.supabase = ClienteVacio()
+    cliente_http = app_module.app.test_client()
+
+    completas = [{'query': q, 'variables': v} for q, v in zip(CONSULTAS, VARIABLES)]
+    persistidas = [
+        {
+            'variables': v,
+            'extensions': {'persistedQuery': {'version': 1, 'sha256Hash': hash_consulta(q)}}
+        }
+        for q, v in zip(CONSULTAS, VARIABLES)
+    ]
+
+    app_module.cache_graphql = None
+    sin_cache = medir(cliente_http, completas, args.peticiones)
+
+    app_module.cache_graphql = CacheConsultasGraphQL()
+    con_cache = medir(cliente_http, completas, args.peticiones)
+    apq = medir(cliente_http, persistidas, args.peticiones)
+
+    bytes_completas = sum(len(q) for q in CONSULTAS) / len(CONSULTAS)
+    print(f"{'modo':>14} {'peticiones/s':>14} {'mejora':>8}")
+    print(f"{'sin caché':>14} {sin_cache:>14,.0f} {'':>8}")
+    print(f"{'con caché':>14} {con_cache:>14,.0f} {con_cache / sin_cache:>7.2f}x")
+    print(f"{'persistidas':>14} {apq:>14,.0f} {apq / sin_cache:>7.2f}x")
+    print(f'\nTexto medio por consulta: {bytes_completas:.0f} bytes; hash persistido: 64 bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark de normalización de imágenes
+
+Mide bytes ahorrados y tiempo de CPU por imagen de normalizar_imagen sobre
+foto.jpg y sobre una imagen sintética del tamaño de una cámara de móvil.
+
+Uso:
+    python benchmarks/bench_imagenes.py [--repeticiones 5] [imagen ...]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, RAIZ)
+
+from procesamiento_imagenes import disponible, normalizar_imagen
+
+
+def imagen_camara(ancho=4032, alto=3024):
+    """JPEG sintético con ruido, parecido en tamaño a una foto de móvil"""
+    from PIL import Image
+
+    imagen = Image.effect_noise((ancho, alto), 64).convert('RGB')
+    salida = io.BytesIO()
+    imagen.save(salida, format='JPEG', quality=95)
+    return salida.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('imagenes', nargs='*', default=[os.path.join(RAIZ, 'foto.jpg')])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    if not disponible():
+        sys.exit('Pillow no está instalado')
+
+    muestras = [(os.path.basename(ruta), open(ruta, 'rb').read()) for ruta in args.imagenes]
+    muestras.append(('sintetica-4032x3024', imagen_camara()))
+
+    print(f"{'imagen':>22} {'original':>10} {'principal':>10} {'miniatura':>10} "
+          f"{'ahorro':>8} {'CPU (ms)':>10}")
+    for nombre, contenido in muestras:
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.process_time()
+            principal, miniatura = normalizar_imagen(contenido)
+            tiempos.append(time.process_time() - inicio)
+
+        ahorro = 1 - len(principal) / len(contenido)
+        print(f'{nombre:>22} {len(contenido):>10,} {len(principal):>10,} {len(miniatura):>10,} '
+              f'{ahorro:>7.0%} {min(tiempos) * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de contención del almacén de rate limiting compartido
+
+Lanza N procesos (8 por defecto, como workers de gunicorn) que consumen del
+mismo segmento compartido y mide el rendimiento agregado. Comprueba además
+que el límite es global: entre todos los procesos solo se admiten
+max_requests peticiones por clave dentro de la ventana.
+
+Uso:
+    python benchmarks/bench_rate_limit_compartido.py [--procesos 8] [--peticiones 20000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from limitador_compartido import LimitadorCompartido, Segmento, NUM_GRUPOS
+
+
+def trabajador(ruta, algoritmo, claves, peticiones, max_requests, inicio, cola):
+    limitador = LimitadorCompartido(algoritmo, max_requests, 3600, segmento=Segmento(ruta, NUM_GRUPOS))
+    while time.time() < inicio:
+        pass
+
+    permitidas = 0
+    t0 = time.perf_counter()
+    for i in range(peticiones):
+        if limitador.consumir(f'usuario-{i % claves}:crear_reporte').permitido:
+            permitidas += 1
+    cola.put((time.perf_counter() - t0, permitidas))
+
+
+def ejecutar(algoritmo, procesos, claves, peticiones, max_requests):
+    ruta = os.path.join(tempfile.mkdtemp(), 'rate-limit')
+    Segmento(ruta, NUM_GRUPOS)
+    cola = multiprocessing.Queue()
+    inicio = time.time() + 0.5
+
+    hijos = [
+        multiprocessing.Process(
+            target=trabajador,
+            args=(ruta, algoritmo, claves, peticiones, max_requests, inicio, cola)
+        )
+        for _ in range(procesos)
+    ]
+    for hijo in hijos:
+        hijo.start()
+    resultados = [cola.get() for _ in hijos]
+    for hijo in hijos:
+        hijo.join()
+    os.unlink(ruta)
+
+    duracion = max(r[0] for r in resultados)
+    permitidas = sum(r[1] for r in resultados)
+    return procesos * peticiones / duracion, permitidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--peticiones', type=int, default=20_000)
+    parser.add_argument('--max-requests', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'algoritmo':>22} {'claves':>8} {'peticiones/s':>14} {'admitidas':>10} {'esperadas':>10}")
+    for algoritmo in ('contador_deslizante', 'cubo_fichas'):
+        # Una clave: máxima contención; 10k claves: contención repartida
+        for claves in (1, 10_000):
+            rendimiento, permitidas = ejecutar(
+                algoritmo, args.procesos, claves, args.peticiones, args.max_requests
+            )
+            esperadas = min(claves, args.procesos * args.peticiones) * args.max_requests
+            esperadas = min(esperadas, args.procesos * args.peticiones)
+            print(f'{algoritmo:>22} {claves:>8} {rendimiento:>14,.0f} {permitidas:>10} {esperadas:>10}')
+
+
+if __name__ == '__main__':
+    main()
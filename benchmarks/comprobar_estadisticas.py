@@ -0,0 +1,172 @@
+"""
+Comprobación de estadísticas: agregado y contadores incrementales contra un escaneo
+
+Calcula las estadísticas recorriendo todas las filas de `reportes` con el
+cliente (la implementación original) y las compara con:
+
+  - obtener_estadisticas_agregadas(): la RPC `estadisticas_reportes` que
+    usan ESTADISTICAS_MODO=agregado y la reconciliación
+  - EstadisticasIncrementales (solo con el backend local, porque escribe):
+    tras la carga en frío, tras escrituras de este worker, tras cambiar el
+    estado de reportes que no escribió y tras escrituras de otro worker
+    seguidas de una reconciliación
+
+Por defecto usa el backend local en memoria. Con SUPABASE_BACKEND=supabase
+(y SUPABASE_URL/SUPABASE_KEY) se ejecuta la función SQL desplegada
+(sql/estadisticas_reportes.sql) contra Postgres, sin escribir nada.
+Sale con código 1 si algún camino no coincide con el escaneo.
+
+Uso:
+    python benchmarks/comprobar_estadisticas.py [--reportes 2000]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault('SUPABASE_BACKEND', 'local')
+
+
+def estadisticas_escaneo(cliente):
+    """Implementación original: traer todas las filas y contar en Python"""
+    from estadisticas import formatear_agregados
+    from paginacion import leer_paginado
+
+    conteo_estados, categorias, usuarios = {}, {}, {}
+    total = 0
+    for r in leer_paginado(lambda: cliente.table('reportes')
+                           .select('id, estado, categoria, usuario_id').order('id')):
+        total += 1
+        conteo_estados[r.get('estado')] = conteo_estados.get(r.get('estado'), 0) + 1
+        cat = r.get('categoria') or 'otro'
+        categorias[cat] = categorias.get(cat, 0) + 1
+        uid = r.get('usuario_id') or 'anonimo'
+        usuarios[uid] = usuarios.get(uid, 0) + 1
+
+    por_usuario = [{'usuario_id': uid, 'cantidad': cant} for uid, cant in usuarios.items()]
+    por_usuario.sort(key=lambda x: x['cantidad'], reverse=True)
+
+    return formatear_agregados(
+        total,
+        [{'estado': e, 'cantidad': c} for e, c in conteo_estados.items()],
+        [{'categoria': cat, 'cantidad': cant} for cat, cant in categorias.items()],
+        por_usuario
+    )
+
+
+def diferencias(esperado, obtenido):
+    """Lista de diferencias entre dos resultados con el formato de `Estadisticas`"""
+    errores = []
+    for campo in ('total', 'pendientes', 'en_proceso', 'resueltos', 'rechazados'):
+        if esperado[campo] != obtenido[campo]:
+            errores.append(f'{campo}: {obtenido[campo]} (escaneo: {esperado[campo]})')
+
+    ordenar = lambda filas: sorted((str(f['categoria']), f['cantidad']) for f in filas)
+    if ordenar(esperado['por_categoria']) != ordenar(obtenido['por_categoria']):
+        errores.append(f"por_categoria: {ordenar(obtenido['por_categoria'])} "
+                       f"(escaneo: {ordenar(esperado['por_categoria'])})")
+
+    # Con empates el orden puede variar; las cantidades del top deben coincidir
+    cantidades = lambda filas: [f['cantidad'] for f in filas]
+    if cantidades(esperado['por_usuario']) != cantidades(obtenido['por_usuario']):
+        errores.append(f"por_usuario: {cantidades(obtenido['por_usuario'])} "
+                       f"(escaneo: {cantidades(esperado['por_usuario'])})")
+    return errores
+
+
+def escrituras_locales(cliente, estadisticas, prefijo, registrar=True, cantidad=25):
+    """Insertar y actualizar reportes; con `registrar`, avisando a `estadisticas`"""
+    for i in range(cantidad):
+        fila = {
+            'usuario_id': f'{prefijo}-{i % 3}' if i % 5 else None,
+            'categoria': ('bache', 'alumbrado', None)[i % 3],
+            'lat': -0.2,
+            'lng': -78.5,
+            'estado': 'pendiente'
+        }
+        reporte = cliente.table('reportes').insert(fila).execute().data[0]
+        if registrar:
+            estadisticas.registrar_creacion(reporte)
+        if i % 4 == 0:
+            actualizado = cliente.table('reportes')\
+                .update({'estado': ('en_proceso', 'resuelto', 'rechazado')[i % 3]})\
+                .eq('id', reporte['id'])\
+                .execute().data[0]
+            if registrar:
+                estadisticas.registrar_actualizacion(actualizado, cambia_estado=True)
+
+
+def actualizar_existentes(cliente, estadisticas, cantidad=10):
+    """Cambiar el estado de reportes sembrados, que `estadisticas` no escribió"""
+    filas = cliente.table('reportes').select('id, estado').order('id').limit(cantidad).execute().data
+    for i, fila in enumerate(filas):
+        nuevo = [e for e in ('pendiente', 'en_proceso', 'resuelto') if e != fila['estado']][i % 2]
+        actualizado = cliente.table('reportes')\
+            .update({'estado': nuevo})\
+            .eq('id', fila['id'])\
+            .execute().data[0]
+        estadisticas.registrar_actualizacion(actualizado, cambia_estado=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reportes', type=int, default=2000,
+                        help='reportes sembrados en el backend local')
+    args = parser.parse_args()
+
+    if os.environ['SUPABASE_BACKEND'] == 'local':
+        os.environ.setdefault('SUPABASE_LOCAL_REPORTES', str(args.reportes))
+
+    from supabase_config import supabase, BACKEND_LOCAL
+    from estadisticas import obtener_estadisticas_agregadas, EstadisticasIncrementales
+
+    cliente = supabase.obtener()
+    casos = [('agregado (RPC estadisticas_reportes)', lambda: obtener_estadisticas_agregadas(cliente))]
+
+    if BACKEND_LOCAL:
+        estadisticas = EstadisticasIncrementales(cliente, intervalo_reconciliacion=3600)
+
+        def tras_escrituras():
+            escrituras_locales(cliente, estadisticas, 'comprobacion')
+            return estadisticas.obtener()
+
+        def tras_actualizar_existentes():
+            actualizar_existentes(cliente, estadisticas)
+            # Su estado anterior no se conoce: los contadores deben quedar desfasados
+            # (obtener() reconciliaría en segundo plano; aquí se espera el resultado)
+            if estadisticas._desfasado:
+                estadisticas.reconciliar()
+            return estadisticas.obtener()
+
+        def tras_otro_worker():
+            escrituras_locales(cliente, estadisticas, 'otro-worker', registrar=False)
+            estadisticas.reconciliar()
+            return estadisticas.obtener()
+
+        casos += [
+            ('incremental en frío', estadisticas.obtener),
+            ('incremental tras escrituras', tras_escrituras),
+            ('incremental tras actualizar existentes', tras_actualizar_existentes),
+            ('incremental tras reconciliar', tras_otro_worker),
+            ('agregado tras escrituras', lambda: obtener_estadisticas_agregadas(cliente)),
+        ]
+
+    fallos = 0
+    print(f"backend={'local' if BACKEND_LOCAL else 'supabase'}")
+    for nombre, calcular in casos:
+        obtenido = calcular()
+        errores = diferencias(estadisticas_escaneo(cliente), obtenido)
+        print(f"{nombre:>38} total={obtenido['total']:<8} {'❌' if errores else '✅'}")
+        for error in errores:
+            print(f'{"":>40}{error}')
+        fallos += bool(errores)
+
+    if fallos:
+        print(f'❌ {fallos} caminos no coinciden con el escaneo completo')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Comprobación de llamadas a Supabase por endpoint (presupuestos y N+1)
+
+Ejecuta una petición representativa de cada endpoint contra el backend
+local en memoria y cuenta los viajes a Supabase con contar_llamadas().
+Falla (código 1) si algún caso supera su presupuesto o repite la misma
+forma de consulta, para detectar en CI cambios que añaden viajes.
+
+Los presupuestos son el número actual de llamadas: si un cambio los
+reduce, bajarlos aquí; si los sube a propósito, justificarlo al subirlos.
+
+Uso:
+    python benchmarks/presupuesto_llamadas.py [--detalle]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ['SUPABASE_BACKEND'] = 'local'
+os.environ['SUPABASE_LOCAL_REPORTES'] = '50'
+os.environ['INSTRUMENTACION'] = '1'
+# Cada caso debe llegar al backend, no a las cachés
+os.environ['CACHE_REPORTES_TTL'] = '0'
+
+REPORTE = {'usuario_id': 'presupuesto', 'categoria': 'bache', 'lat': -0.25, 'lng': -78.52}
+
+# (nombre, máximo de llamadas, petición)
+CASOS = [
+    ('POST /reportes', 3, lambda c: c.post('/reportes', json=REPORTE)),
+    ('POST /reportes duplicado', 0, lambda c: c.post('/reportes', json=REPORTE)),
+    ('POST /reportes/lote', 3, lambda c: c.post('/reportes/lote', json={
+        'usuario_id': 'lote',
+        'reportes': [dict(REPORTE, usuario_id='lote', lat=-0.25 + i / 100) for i in range(10)]
+    })),
+    ('GET /reportes', 1, lambda c: c.get('/reportes?limit=20')),
+    ('GET /reportes dos páginas', 2, lambda c: c.get(
+        '/reportes?limit=5&cursor=' + c.get('/reportes?limit=5').get_json()['next_cursor'])),
+    ('GET /reportes/cercanos', 1, lambda c: c.get('/reportes/cercanos?lat=-0.18&lng=-78.47')),
+    ('GraphQL reporte x5', 1, lambda c: c.post('/graphql', json={'query': '''{
+        a: reporte(id: 1) { id } b: reporte(id: 2) { id } c: reporte(id: 3) { id }
+        d: reporte(id: 4) { id } e: reporte(id: 5) { id estado }
+    }'''})),
+    ('GraphQL reportesPaginados', 1, lambda c: c.post('/graphql', json={
+        'query': '{ reportesPaginados(first: 10) { edges { node { id } } pageInfo { endCursor } } }'
+    })),
+    ('GraphQL misReportes', 1, lambda c: c.post('/graphql', json={
+        'query': '{ misReportes(usuario_id: "usuario-1") { id estado } }'
+    })),
+    ('GraphQL crearReporte', 3, lambda c: c.post('/graphql', json={
+        'query': 'mutation($i: ReporteInput!) { crearReporte(input: $i) { success } }',
+        'variables': {'i': dict(REPORTE, usuario_id='graphql')}
+    })),
+    ('GraphQL actualizarEstado', 1, lambda c: c.post('/graphql', json={
+        'query': 'mutation { actualizarEstado(id: 1, estado: "en_proceso", usuario_id: "x") { success } }'
+    })),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--detalle', action='store_true', help='mostrar la forma de cada llamada')
+    args = parser.parse_args()
+
+    import app as app_module
+    from instrumentacion import contar_llamadas, comprobar_llamadas
+
+    cliente = app_module.app.test_client()
+    fallos = 0
+    print(f"{'caso':>28} {'estado':>6} {'llamadas':>9} {'máximo':>7}")
+    for nombre, maximo, peticion in CASOS:
+        with contar_llamadas() as traza:
+            respuesta = peticion(cliente)
+        try:
+            comprobar_llamadas(traza, maximo=maximo)
+            resultado = '✅'
+        except AssertionError as e:
+            resultado = f'❌ {str(e).splitlines()[0]}'
+            fallos += 1
+        print(f'{nombre:>28} {respuesta.status_code:>6} {traza.llamadas():>9} {maximo:>7}  {resultado}')
+        if args.detalle:
+            for span in traza.spans:
+                print(f'{"":>30}{span[5]}')
+
+    if fallos:
+        print(f'❌ {fallos} casos por encima de su presupuesto o con consultas repetidas')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Caché de lectura para listados de reportes
+Guarda el resultado de cada combinación de filtros (categoria, estado,
+usuario_id, limit, columnas) con TTL corto y expulsión LRU, y descarta solo
+las entradas cuyo filtro coincide con un reporte recién escrito.
+
+Las escrituras de otros workers no invalidan esta caché: el TTL acota
+cuánto tiempo puede servirse un listado desactualizado.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Filtros que se comparan contra las columnas del reporte escrito
+CAMPOS_FILTRO = ('categoria', 'estado', 'usuario_id')
+
+
+class CacheConsultas:
+    """Read-through: obtener() devuelve lo cacheado o llama a `cargar` y lo guarda"""
+
+    def __init__(self, ttl=5, max_entradas=1000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        # Cambia en cada invalidación; una carga que coincidió con una escritura no se guarda
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self.expiradas = 0
+        self._edad_servida_total = 0.0
+        self._edad_servida_max = 0.0
+
+    def obtener(self, filtros, cargar):
+        """
+        Resultado para `filtros`, cargándolo si no está o caducó
+
+        Args:
+            filtros: dict con categoria/estado/usuario_id (None = sin filtro) y
+                cualquier otro parámetro que cambie el resultado (limit, columnas)
+            cargar: función sin argumentos que consulta Supabase
+        """
+        clave, ahora, generacion, datos = self._buscar(filtros)
+        if generacion is None:
+            return datos
+        datos = cargar()
+        self._guardar(clave, filtros, datos, ahora, generacion)
+        return datos
+
+    def obtener_flujo(self, filtros, cargar):
+        """Como obtener(), con `cargar` un flujo (ver flujos.py); se usa con `yield from`"""
+        clave, ahora, generacion, datos = self._buscar(filtros)
+        if generacion is None:
+            return datos
+        datos = yield from cargar
+        self._guardar(clave, filtros, datos, ahora, generacion)
+        return datos
+
+    def _buscar(self, filtros):
+        """(clave, ahora, generacion, datos); generacion es None si hubo acierto"""
+        clave = tuple(sorted(filtros.items()))
+        ahora = time.time()
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                edad = ahora - entrada['creado']
+                if edad <= self.ttl:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    self._edad_servida_total += edad
+                    self._edad_servida_max = max(self._edad_servida_max, edad)
+                    return clave, ahora, None, entrada['datos']
+                del self._entradas[clave]
+                self.expiradas += 1
+            self.fallos += 1
+            return clave, ahora, self._generacion, None
+
+    def _guardar(self, clave, filtros, datos, ahora, generacion):
+        with self._lock:
+            # Una carga que coincidió con una escritura no se guarda
+            if generacion == self._generacion:
+                self._entradas[clave] = {
+                    'datos': datos,
+                    'creado': ahora,
+                    'filtros': filtros
+                }
+                self._entradas.move_to_end(clave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+
+    def invalidar(self, reporte, ignorar=()):
+        """
+        Descartar las entradas cuyo filtro incluye a `reporte`
+
+        Args:
+            reporte: fila escrita
+            ignorar: filtros que no se comparan (p. ej. 'estado' al cambiar
+                de estado, porque el estado anterior también queda afectado)
+        """
+        with self._lock:
+            self._generacion += 1
+            coinciden = [
+                clave for clave, entrada in self._entradas.items()
+                if self._coincide(entrada['filtros'], reporte, ignorar)
+            ]
+            for clave in coinciden:
+                del self._entradas[clave]
+            self.invalidaciones += len(coinciden)
+
+    @staticmethod
+    def _coincide(filtros, reporte, ignorar):
+        for campo in CAMPOS_FILTRO:
+            valor = filtros.get(campo)
+            if valor is None or campo in ignorar:
+                continue
+            if reporte.get(campo) != valor:
+                return False
+        return True
+
+    def metricas(self):
+        """Ratio de aciertos y antigüedad de lo servido desde la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ttl_s': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'ratio_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'invalidaciones': self.invalidaciones,
+                'expiradas': self.expiradas,
+                'edad_media_servida_s': self._edad_servida_total / self.aciertos if self.aciertos else 0.0,
+                'edad_max_servida_s': self._edad_servida_max
+            }
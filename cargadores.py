@@ -0,0 +1,114 @@
+"""
+Carga por lotes (estilo DataLoader) para los resolvers GraphQL
+Cada petición tiene sus propios cargadores en el contexto de GraphQL. Un
+resolver pide una clave con `yield cargador.cargar(clave)` y las claves
+pedidas a la vez se cargan con una sola consulta (ver flujos.Carga):
+
+    - en ASGI, las de todos los resolvers que se ejecutan en el mismo tick:
+      campos raíz con alias (reporte(id: 1), reporte(id: 2)) o el mismo
+      campo anidado en cada fila de una lista (p. ej. un Reporte.usuario)
+    - en Flask los resolvers se ejecutan uno tras otro: la primera carga
+      lleva además las claves encoladas antes con encolar(), p. ej. los
+      argumentos de los campos hermanos (argumentos_hermanos()) o las
+      claves de las filas que devuelve el resolver de una lista
+"""
+
+from graphql import value_from_ast_untyped
+
+from flujos import Carga
+from proyeccion import campos_de_seleccion
+
+
+class Cargador:
+    """
+    Memoriza resultados por clave y carga las pendientes en un solo lote
+
+    Args:
+        cargar_lote: flujo f(claves, campos) que devuelve un dict
+            clave -> valor (las claves ausentes se resuelven a None);
+            `campos` es la unión de los campos pedidos para el lote
+    """
+
+    def __init__(self, cargar_lote):
+        self.cargar_lote = cargar_lote
+        # Futuro del lote abierto en ASGI (None si no hay ninguno programado)
+        self.despacho = None
+        self.lotes = 0
+        self._resultados = {}
+        self._pendientes = {}
+        self._campos = set()
+
+    def cargar(self, clave, campos=()):
+        """Pedido para ceder desde un flujo: valor de `clave` con al menos `campos`"""
+        return Carga(self, clave, frozenset(campos))
+
+    def encolar(self, claves, campos=()):
+        """Anotar claves que se van a pedir para que viajen en el próximo lote"""
+        for clave in claves:
+            if not self.cargado(clave, campos):
+                self._pendientes[clave] = True
+                self._campos.update(campos)
+
+    def cargado(self, clave, campos=()):
+        """True si `clave` ya se cargó con todos los `campos`"""
+        if clave not in self._resultados:
+            return False
+        valor, cargados = self._resultados[clave]
+        return valor is None or cargados.issuperset(campos)
+
+    def valor(self, clave):
+        return self._resultados[clave][0]
+
+    def tomar_lote(self):
+        """Cerrar el lote abierto: (claves, campos) a cargar"""
+        claves, campos = list(self._pendientes), frozenset(self._campos)
+        self._pendientes, self._campos = {}, set()
+        self.lotes += 1
+        return claves, campos
+
+    def guardar(self, claves, campos, encontrados):
+        for clave in claves:
+            self._resultados[clave] = (encontrados.get(clave), campos)
+
+
+def obtener_cargador(info, nombre, cargar_lote, al_crear=None):
+    """
+    Cargador `nombre` de la petición de `info` (se crea la primera vez)
+
+    Args:
+        al_crear: función opcional que recibe el cargador recién creado,
+            p. ej. para encolar las claves que se sabe que se van a pedir
+    """
+    cargadores = info.context.setdefault('cargadores', {})
+    if nombre not in cargadores:
+        cargadores[nombre] = Cargador(cargar_lote)
+        if al_crear:
+            al_crear(cargadores[nombre])
+    return cargadores[nombre]
+
+
+def campos_hermanos(info):
+    """
+    FieldNodes de la operación raíz con el mismo nombre que el campo actual
+
+    Solo aplica a campos de la operación raíz; en campos anidados devuelve
+    los nodos del propio campo.
+    """
+    if info.path.prev is not None:
+        return list(info.field_nodes)
+    return [
+        campo for campo in campos_de_seleccion(info.operation.selection_set, info.fragments)
+        if campo.name.value == info.field_name
+    ]
+
+
+def argumentos_hermanos(info, argumento):
+    """Valores de `argumento` en todos los campos devueltos por campos_hermanos()"""
+    valores = []
+    for campo in campos_hermanos(info):
+        for nodo in campo.arguments or ():
+            if nodo.name.value == argumento:
+                valor = value_from_ast_untyped(nodo.value, info.variable_values)
+                if valor is not None:
+                    valores.append(valor)
+    return valores
@@ -0,0 +1,183 @@
+"""
+Conexiones HTTP hacia Supabase
+Un cliente httpx por proceso con pool configurable, keep-alive y HTTP/2,
+compartido por PostgREST y Storage. Con gunicorn cada worker crea el suyo
+después del fork (las conexiones abiertas no se pueden heredar) y puede
+abrirlas por adelantado con calentar() para que el primer usuario no pague
+el handshake TLS.
+
+Las estadísticas de reutilización salen de los eventos de traza de
+httpcore: cada petición cuenta, y cada conexión TCP/TLS nueva también.
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+HTTP2 = os.getenv('SUPABASE_HTTP2', '1') == '1'
+# httpx necesita el paquete h2 para http2=True
+if HTTP2 and importlib.util.find_spec('h2') is None:
+    print("⚠️ Paquete h2 no instalado: conexiones a Supabase con HTTP/1.1")
+    HTTP2 = False
+POOL_MAX = int(os.getenv('SUPABASE_POOL_MAX', 20))
+POOL_KEEPALIVE = int(os.getenv('SUPABASE_POOL_KEEPALIVE', 10))
+KEEPALIVE_SEGUNDOS = float(os.getenv('SUPABASE_KEEPALIVE_SEGUNDOS', 60))
+TIMEOUT_SEGUNDOS = float(os.getenv('SUPABASE_TIMEOUT', 30))
+TIMEOUT_CONEXION_SEGUNDOS = float(os.getenv('SUPABASE_TIMEOUT_CONEXION', 5))
+# Conexiones que se abren al arrancar el worker (0 desactiva el calentamiento)
+CALENTAR_CONEXIONES = int(os.getenv('SUPABASE_CALENTAR', 2))
+
+
+class EstadisticasConexiones:
+    """Peticiones, conexiones nuevas y tiempo de handshake de un proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.peticiones = 0
+        self.peticiones_http2 = 0
+        self.conexiones_nuevas = 0
+        self.handshakes_tls = 0
+        self.segundos_conectando = 0.0
+        self.errores_conexion = 0
+        self._inicios = {}
+
+    def reiniciar(self):
+        """Empezar de cero (tras un fork los contadores del padre no aplican)"""
+        with self._lock:
+            self._reiniciar()
+
+    def traza(self, evento, info):
+        """Callback `trace` de httpcore (síncrono)"""
+        hilo = threading.get_ident()
+        with self._lock:
+            if evento == 'connection.connect_tcp.started':
+                self.conexiones_nuevas += 1
+                self._inicios[hilo] = time.perf_counter()
+            elif evento == 'connection.start_tls.complete':
+                self.handshakes_tls += 1
+            elif evento in ('connection.connect_tcp.failed', 'connection.start_tls.failed'):
+                self.errores_conexion += 1
+                self._inicios.pop(hilo, None)
+            elif evento in ('http11.send_request_headers.started', 'http2.send_request_headers.started'):
+                self.peticiones += 1
+                if evento.startswith('http2'):
+                    self.peticiones_http2 += 1
+                # TCP + TLS (+ preámbulo HTTP/2) terminan antes de la primera petición
+                inicio = self._inicios.pop(hilo, None)
+                if inicio is not None:
+                    self.segundos_conectando += time.perf_counter() - inicio
+
+    async def traza_async(self, evento, info):
+        """Callback `trace` de httpcore para clientes asíncronos"""
+        self.traza(evento, info)
+
+    def metricas(self):
+        """Ratio de reutilización: peticiones que no abrieron conexión"""
+        with self._lock:
+            reutilizadas = max(0, self.peticiones - self.conexiones_nuevas)
+            return {
+                'http2': HTTP2,
+                'pool_max': POOL_MAX,
+                'pool_keepalive': POOL_KEEPALIVE,
+                'peticiones': self.peticiones,
+                'peticiones_http2': self.peticiones_http2,
+                'conexiones_nuevas': self.conexiones_nuevas,
+                'handshakes_tls': self.handshakes_tls,
+                'errores_conexion': self.errores_conexion,
+                'ratio_reutilizacion': reutilizadas / self.peticiones if self.peticiones else 0.0,
+                'ms_medios_conectando': (self.segundos_conectando / self.conexiones_nuevas * 1000
+                                         if self.conexiones_nuevas else 0.0)
+            }
+
+
+estadisticas_conexiones = EstadisticasConexiones()
+
+
+def _configuracion():
+    return {
+        'http2': HTTP2,
+        'limits': httpx.Limits(
+            max_connections=POOL_MAX,
+            max_keepalive_connections=POOL_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_SEGUNDOS
+        ),
+        'timeout': httpx.Timeout(TIMEOUT_SEGUNDOS, connect=TIMEOUT_CONEXION_SEGUNDOS),
+        'follow_redirects': True
+    }
+
+
+def crear_http_client():
+    """httpx.Client con el pool configurado y la traza de conexiones"""
+    def anotar_traza(request):
+        request.extensions['trace'] = estadisticas_conexiones.traza
+
+    return httpx.Client(event_hooks={'request': [anotar_traza]}, **_configuracion())
+
+
+def crear_http_client_async():
+    """httpx.AsyncClient equivalente para app_async.py"""
+    async def anotar_traza(request):
+        request.extensions['trace'] = estadisticas_conexiones.traza_async
+
+    return httpx.AsyncClient(event_hooks={'request': [anotar_traza]}, **_configuracion())
+
+
+def url_calentamiento(supabase_url):
+    """Endpoint barato de PostgREST para abrir conexiones"""
+    return f"{supabase_url.rstrip('/')}/rest/v1/"
+
+
+def calentar(http_client, supabase_url, supabase_key, conexiones=CALENTAR_CONEXIONES):
+    """
+    Abrir `conexiones` conexiones en paralelo antes de recibir tráfico
+
+    Con HTTP/2 una sola conexión atiende todas las peticiones, así que basta
+    con una. Los errores se registran y no impiden arrancar.
+    """
+    if conexiones <= 0:
+        return
+    conexiones = 1 if HTTP2 else conexiones
+    url = url_calentamiento(supabase_url)
+    headers = {'apikey': supabase_key, 'Authorization': f'Bearer {supabase_key}'}
+
+    def abrir(_):
+        try:
+            http_client.head(url, headers=headers)
+            return True
+        except Exception as e:
+            print(f"⚠️ Calentamiento de conexión fallido: {str(e)}")
+            return False
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=conexiones) as pool:
+        abiertas = sum(pool.map(abrir, range(conexiones)))
+    print(f"🔥 {abiertas}/{conexiones} conexiones a Supabase listas "
+          f"en {(time.perf_counter() - inicio) * 1000:.0f} ms (pid {os.getpid()})")
+
+
+async def calentar_async(http_client, supabase_url, supabase_key, conexiones=CALENTAR_CONEXIONES):
+    """Como calentar(), con el cliente asíncrono"""
+    if conexiones <= 0:
+        return
+    conexiones = 1 if HTTP2 else conexiones
+    url = url_calentamiento(supabase_url)
+    headers = {'apikey': supabase_key, 'Authorization': f'Bearer {supabase_key}'}
+
+    async def abrir():
+        try:
+            await http_client.head(url, headers=headers)
+            return True
+        except Exception as e:
+            print(f"⚠️ Calentamiento de conexión fallido: {str(e)}")
+            return False
+
+    abiertas = sum(await asyncio.gather(*(abrir() for _ in range(conexiones))))
+    print(f"🔥 {abiertas}/{conexiones} conexiones a Supabase listas (pid {os.getpid()})")
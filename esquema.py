@@ -0,0 +1,111 @@
+"""
+Esquema GraphQL compartido por app.py (Flask) y app_async.py (ASGI)
+"""
+
+type_defs = """
+    type Query {
+        reportes(limit: Int, categoria: String, estado: String, usuario_id: String): [Reporte!]!
+        reporte(id: ID!): Reporte
+        estadisticas: Estadisticas!
+        misReportes(usuario_id: String!): [Reporte!]!
+        reportesPaginados(first: Int, after: String, categoria: String, estado: String, usuario_id: String): ReporteConnection!
+        misReportesPaginados(usuario_id: String!, first: Int, after: String): ReporteConnection!
+        reportesCercanos(lat: Float!, lng: Float!, radio: Int): [ReporteCercano!]!
+    }
+    
+    type Mutation {
+        crearReporte(input: ReporteInput!): ReporteResponse!
+        crearReportes(input: [ReporteInput!]!): ReportesLoteResponse!
+        actualizarEstado(id: ID!, estado: String!, usuario_id: String!): ReporteResponse!
+    }
+    
+    type Reporte {
+        id: ID!
+        categoria: String!
+        lat: Float!
+        lng: Float!
+        descripcion: String
+        estado: String!
+        prioridad: String!
+        usuario_id: String!
+        foto_url: String
+        foto_estado: String
+        foto_miniatura_url: String
+        created_at: String!
+        updated_at: String
+        version: Int!
+        votos_positivos: Int!
+        votos_negativos: Int!
+    }
+    
+    type ReporteEdge {
+        cursor: String!
+        node: Reporte!
+    }
+    
+    type PageInfo {
+        hasNextPage: Boolean!
+        endCursor: String
+    }
+    
+    type ReporteConnection {
+        edges: [ReporteEdge!]!
+        pageInfo: PageInfo!
+    }
+    
+    type ReporteCercano {
+        id: ID!
+        categoria: String!
+        lat: Float!
+        lng: Float!
+        descripcion: String
+        estado: String!
+        distancia_metros: Float!
+        created_at: String!
+    }
+    
+    input ReporteInput {
+        categoria: String!
+        lat: Float!
+        lng: Float!
+        descripcion: String
+        fotoUrl: String
+        usuario_id: String!
+        prioridad: String
+    }
+    
+    type ReporteResponse {
+        success: Boolean!
+        message: String!
+        reporte: Reporte
+        code: String
+    }
+    
+    type ReportesLoteResponse {
+        success: Boolean!
+        creados: Int!
+        rechazados: Int!
+        resultados: [ReporteResponse!]!
+        code: String
+    }
+    
+    type Estadisticas {
+        total: Int!
+        pendientes: Int!
+        en_proceso: Int!
+        resueltos: Int!
+        rechazados: Int!
+        por_categoria: [CategoriaStats!]!
+        por_usuario: [UsuarioStats!]!
+    }
+    
+    type CategoriaStats {
+        categoria: String!
+        cantidad: Int!
+    }
+    
+    type UsuarioStats {
+        usuario_id: String!
+        cantidad: Int!
+    }
+"""
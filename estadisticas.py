@@ -0,0 +1,277 @@
+"""
+Estadísticas incrementales de reportes
+Mantiene contadores en memoria (por estado, categoría y usuario) que se
+actualizan en cada escritura y se reconcilian periódicamente con la función
+SQL `estadisticas_reportes`, de modo que ni la consulta `estadisticas` ni la
+reconciliación transfieren la tabla.
+
+Como alternativa, obtener_estadisticas_agregadas() delega la agregación a la
+función SQL `estadisticas_reportes` (ver sql/estadisticas_reportes.sql).
+"""
+
+import threading
+import time
+
+ESTADOS = ('pendiente', 'en_proceso', 'resuelto', 'rechazado')
+TOP_USUARIOS = 10
+# Usuarios que se piden al reconciliar: margen para que el top siga siendo
+# correcto mientras crecen los contadores entre reconciliaciones
+TOP_USUARIOS_RECONCILIACION = TOP_USUARIOS * 5
+
+
+def formatear_agregados(total, por_estado, por_categoria, por_usuario):
+    """
+    Convertir filas agregadas al formato del tipo GraphQL `Estadisticas`
+
+    Args:
+        total: número total de reportes
+        por_estado: lista de {'estado', 'cantidad'}
+        por_categoria: lista de {'categoria', 'cantidad'}
+        por_usuario: lista de {'usuario_id', 'cantidad'} ordenada de mayor a menor
+    """
+    conteo_estados = {fila['estado']: fila['cantidad'] for fila in por_estado}
+    return {
+        'total': total,
+        'pendientes': conteo_estados.get('pendiente', 0),
+        'en_proceso': conteo_estados.get('en_proceso', 0),
+        'resueltos': conteo_estados.get('resuelto', 0),
+        'rechazados': conteo_estados.get('rechazado', 0),
+        'por_categoria': list(por_categoria),
+        'por_usuario': list(por_usuario)[:TOP_USUARIOS]
+    }
+
+
+def consulta_estadisticas_agregadas(cliente):
+    """Llamada a la RPC `estadisticas_reportes`, sin ejecutar (cliente síncrono o asíncrono)"""
+    return cliente.rpc('estadisticas_reportes', {
+        'p_top_usuarios': TOP_USUARIOS
+    })
+
+
+def leer_estadisticas_agregadas(datos):
+    """Respuesta de `estadisticas_reportes` en el formato del tipo `Estadisticas`"""
+    datos = datos or {}
+    return formatear_agregados(
+        datos.get('total', 0),
+        datos.get('por_estado') or [],
+        datos.get('por_categoria') or [],
+        datos.get('por_usuario') or []
+    )
+
+
+def obtener_estadisticas_agregadas(cliente):
+    """Calcular las estadísticas en Postgres con la RPC `estadisticas_reportes`"""
+    return leer_estadisticas_agregadas(consulta_estadisticas_agregadas(cliente).execute().data)
+
+
+class EstadisticasIncrementales:
+    """
+    Contadores de reportes mantenidos en memoria
+
+    Cada worker de gunicorn tiene su propia copia: ve sus escrituras al
+    instante y las de los demás workers tras la siguiente reconciliación.
+    """
+
+    def __init__(self, cliente, intervalo_reconciliacion=300):
+        self.cliente = cliente
+        self.intervalo_reconciliacion = intervalo_reconciliacion
+        self._lock = threading.Lock()
+        # Serializa la primera carga: quien llega mientras tanto espera el resultado
+        self._lock_carga = threading.Lock()
+        self._cargado = False
+        self._reconciliando = False
+        self._ultima_reconciliacion = 0
+        self._pendientes = []
+        self._reiniciar_contadores()
+
+    def _reiniciar_contadores(self):
+        self._total = 0
+        self._por_estado = {estado: 0 for estado in ESTADOS}
+        self._por_categoria = {}
+        # Conteo exacto por usuario: los del top pedido al reconciliar y los nuevos
+        self._por_usuario = {}
+        # Usuarios que quedaron fuera de ese top: solo se sabe cuánto han sumado
+        # desde entonces y que antes tenían como mucho _tope_desconocidos
+        self._incrementos_usuario = {}
+        self._tope_desconocidos = 0
+        # Estado de los reportes escritos por este worker desde la última reconciliación
+        self._estado_por_id = {}
+        self._top = []
+        # Hay un cambio que los contadores no reflejan: reconciliar en la próxima lectura
+        self._desfasado = False
+
+    # ----------------------------------------
+    # Escrituras
+    # ----------------------------------------
+
+    def registrar_creacion(self, reporte):
+        """Contabilizar un reporte recién insertado"""
+        with self._lock:
+            if self._reconciliando:
+                self._pendientes.append(('crear', reporte, None))
+            self._aplicar_creacion(reporte)
+
+    def registrar_actualizacion(self, reporte, cambia_estado=False):
+        """
+        Contabilizar el nuevo estado de un reporte actualizado
+
+        Args:
+            reporte: fila actualizada
+            cambia_estado: la actualización pudo cambiar el estado. Solo se
+                conoce el estado anterior de los reportes escritos por este
+                worker desde la última reconciliación; para los demás los
+                contadores quedan desfasados y la próxima lectura reconcilia
+        """
+        with self._lock:
+            if self._reconciliando:
+                self._pendientes.append(('actualizar', reporte, cambia_estado))
+            if not self._aplicar_actualizacion(reporte) and cambia_estado:
+                self._desfasado = True
+
+    def _aplicar_creacion(self, reporte):
+        reporte_id = reporte.get('id')
+        if reporte_id in self._estado_por_id:
+            return
+
+        estado = reporte.get('estado')
+        # Como coalesce() en la función SQL: una columna nula cuenta como 'otro'/'anonimo'
+        categoria = reporte.get('categoria') or 'otro'
+        usuario_id = reporte.get('usuario_id') or 'anonimo'
+
+        self._estado_por_id[reporte_id] = estado
+        self._total += 1
+        self._por_estado[estado] = self._por_estado.get(estado, 0) + 1
+        self._por_categoria[categoria] = self._por_categoria.get(categoria, 0) + 1
+        self._contar_usuario(usuario_id)
+
+    def _contar_usuario(self, usuario_id):
+        if usuario_id in self._por_usuario or not self._tope_desconocidos:
+            self._por_usuario[usuario_id] = self._por_usuario.get(usuario_id, 0) + 1
+            self._actualizar_top(usuario_id)
+            return
+
+        # Conteo desconocido: si pudiera haber entrado en el top, reconciliar
+        incremento = self._incrementos_usuario.get(usuario_id, 0) + 1
+        self._incrementos_usuario[usuario_id] = incremento
+        if self._top and self._tope_desconocidos + incremento > self._por_usuario[self._top[-1]]:
+            self._desfasado = True
+
+    def _aplicar_actualizacion(self, reporte):
+        reporte_id = reporte.get('id')
+        anterior = self._estado_por_id.get(reporte_id)
+        if anterior is None:
+            return False
+
+        nuevo = reporte.get('estado')
+        if anterior != nuevo:
+            self._por_estado[anterior] = self._por_estado.get(anterior, 0) - 1
+            self._por_estado[nuevo] = self._por_estado.get(nuevo, 0) + 1
+        self._estado_por_id[reporte_id] = nuevo
+        return True
+
+    def _actualizar_top(self, usuario_id):
+        """Mantener el top de usuarios en O(TOP_USUARIOS); los contadores solo crecen"""
+        cantidad = self._por_usuario[usuario_id]
+        if usuario_id not in self._top:
+            if len(self._top) >= TOP_USUARIOS:
+                ultimo = self._top[-1]
+                if cantidad <= self._por_usuario[ultimo]:
+                    return
+                self._top.pop()
+            self._top.append(usuario_id)
+        self._top.sort(key=lambda uid: self._por_usuario[uid], reverse=True)
+
+    # ----------------------------------------
+    # Reconciliación
+    # ----------------------------------------
+
+    def reconciliar(self):
+        """Reconstruir los contadores desde la RPC `estadisticas_reportes` (solo agregados)"""
+        with self._lock:
+            if self._reconciliando:
+                return
+            self._reconciliando = True
+            self._pendientes = []
+
+        try:
+            datos = self.cliente.rpc('estadisticas_reportes', {
+                'p_top_usuarios': TOP_USUARIOS_RECONCILIACION
+            }).execute().data or {}
+        except Exception:
+            with self._lock:
+                self._reconciliando = False
+                self._pendientes = []
+            raise
+
+        with self._lock:
+            self._reiniciar_contadores()
+            self._total = datos.get('total', 0)
+            for fila in datos.get('por_estado') or []:
+                self._por_estado[fila['estado']] = fila['cantidad']
+            for fila in datos.get('por_categoria') or []:
+                self._por_categoria[fila['categoria']] = fila['cantidad']
+            usuarios = datos.get('por_usuario') or []
+            for fila in usuarios:
+                self._por_usuario[fila['usuario_id']] = fila['cantidad']
+            self._top = [fila['usuario_id'] for fila in usuarios][:TOP_USUARIOS]
+            if len(usuarios) >= TOP_USUARIOS_RECONCILIACION:
+                # Top recortado: los demás usuarios tienen como mucho el último conteo
+                self._tope_desconocidos = min(fila['cantidad'] for fila in usuarios)
+
+            # Reaplicar escrituras ocurridas durante la consulta que no entraron en
+            # ella (id mayor que el último contado); sin max_id se reaplican todas.
+            # Requiere que reportes.id sea un entero asignado por una secuencia
+            max_id = datos.get('max_id')
+            for tipo, reporte, cambia_estado in self._pendientes:
+                if tipo == 'crear':
+                    if max_id is None or (reporte.get('id') or 0) > max_id:
+                        self._aplicar_creacion(reporte)
+                elif reporte.get('id') in self._estado_por_id:
+                    # Creado después de la consulta: su estado se conoce
+                    self._aplicar_actualizacion(reporte)
+                elif cambia_estado:
+                    # No se sabe si la consulta ya vio el cambio: reconciliar de nuevo
+                    self._desfasado = True
+
+            self._pendientes = []
+            self._reconciliando = False
+            self._cargado = True
+            self._ultima_reconciliacion = time.time()
+
+    def _reconciliar_en_segundo_plano(self):
+        try:
+            self.reconciliar()
+        except Exception as e:
+            print(f"⚠️ Error reconciliando estadísticas: {str(e)}")
+
+    # ----------------------------------------
+    # Lectura
+    # ----------------------------------------
+
+    def obtener(self):
+        """Devolver las estadísticas con la forma del tipo GraphQL `Estadisticas`"""
+        if not self._cargado:
+            with self._lock_carga:
+                if not self._cargado:
+                    self.reconciliar()
+        elif (self._desfasado
+              or time.time() - self._ultima_reconciliacion > self.intervalo_reconciliacion) \
+                and not self._reconciliando:
+            threading.Thread(target=self._reconciliar_en_segundo_plano, daemon=True).start()
+
+        with self._lock:
+            return {
+                'total': self._total,
+                'pendientes': self._por_estado.get('pendiente', 0),
+                'en_proceso': self._por_estado.get('en_proceso', 0),
+                'resueltos': self._por_estado.get('resuelto', 0),
+                'rechazados': self._por_estado.get('rechazado', 0),
+                'por_categoria': [
+                    {'categoria': cat, 'cantidad': cant}
+                    for cat, cant in self._por_categoria.items()
+                ],
+                'por_usuario': [
+                    {'usuario_id': uid, 'cantidad': self._por_usuario[uid]}
+                    for uid in self._top
+                ]
+            }
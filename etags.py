@@ -0,0 +1,42 @@
+"""
+ETags y GET condicional para listados
+El ETag se calcula sobre unas pocas columnas de cada fila (id y versión),
+no sobre el JSON serializado, así que se puede obtener de una consulta
+ligera antes de pedir las filas completas.
+"""
+
+import hashlib
+
+# Columnas que cambian cuando cambia cualquier dato de un reporte
+# (el trigger de la tabla incrementa version y actualiza updated_at)
+CAMPOS_VERSION_REPORTE = ('id', 'version', 'updated_at', 'created_at')
+
+# ReporteCercano no trae versión: se usan los campos visibles que pueden cambiar
+CAMPOS_REPORTE_CERCANO = ('id', 'estado', 'categoria', 'descripcion', 'created_at')
+
+
+def calcular_etag(filas, campos):
+    """ETag fuerte a partir del número de filas y de `campos` de cada una"""
+    hasher = hashlib.sha1(str(len(filas)).encode('utf-8'))
+    for fila in filas:
+        hasher.update('\x1f'.join(str(fila.get(campo)) for campo in campos).encode('utf-8'))
+        hasher.update(b'\x1e')
+    return f'"{hasher.hexdigest()}"'
+
+
+def etag_coincide(if_none_match, etag):
+    """True si la cabecera If-None-Match contiene `etag` (o es *)"""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato.startswith('W/'):
+            candidato = candidato[2:]
+        if candidato == '*' or candidato == etag:
+            return True
+    return False
+
+
+def respuesta_no_modificada(etag):
+    """Respuesta 304 sin cuerpo: (cuerpo, estado, cabeceras) como servicio_reportes.Respuesta"""
+    return None, 304, {'ETag': etag, 'Cache-Control': 'no-cache'}
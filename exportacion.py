@@ -0,0 +1,147 @@
+"""
+Exportación masiva de reportes en streaming (NDJSON o CSV)
+Recorre la tabla por páginas con cursor (created_at, id) y va emitiendo
+trozos de texto, así la memoria del worker no depende del tamaño de la
+exportación: como mucho una página de filas y un búfer de salida.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from proyeccion import COLUMNAS_REPORTE
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8'
+}
+
+# Tamaño aproximado de cada trozo enviado al cliente
+TAM_TROZO = 64 * 1024
+
+
+def recorrer_paginas(consultar_pagina, tam_pagina=1000):
+    """
+    Filas de todas las páginas, en orden (created_at desc, id desc)
+
+    Args:
+        consultar_pagina: función (despues_de, tam_pagina) -> lista de filas;
+            despues_de es None o la posición (created_at, id) de la última fila
+        tam_pagina: filas por consulta
+    """
+    despues_de = None
+    while True:
+        filas = consultar_pagina(despues_de, tam_pagina)
+        yield from filas
+        if len(filas) < tam_pagina:
+            return
+        ultima = filas[-1]
+        despues_de = (ultima['created_at'], ultima['id'])
+
+
+def lineas_ndjson(filas):
+    """Una línea JSON por fila"""
+    for fila in filas:
+        yield json.dumps(fila, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+
+
+def lineas_csv(filas, columnas=COLUMNAS_REPORTE, cabecera=True):
+    """Cabecera (opcional) y una línea CSV por fila"""
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+
+    if cabecera:
+        escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow([fila.get(columna) for columna in columnas])
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    yield salida.getvalue()
+
+
+def agrupar(lineas, tam_trozo=TAM_TROZO):
+    """Juntar líneas en trozos de ~tam_trozo bytes para no escribir fila a fila"""
+    bufer = []
+    tam = 0
+    for linea in lineas:
+        datos = linea.encode('utf-8')
+        bufer.append(datos)
+        tam += len(datos)
+        if tam >= tam_trozo:
+            yield b''.join(bufer)
+            bufer = []
+            tam = 0
+    if bufer:
+        yield b''.join(bufer)
+
+
+def comprimir_gzip(trozos, nivel=6):
+    """Comprimir en streaming con formato gzip"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for trozo in trozos:
+        comprimido = compresor.compress(trozo)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def generar_exportacion(consultar_pagina, formato='ndjson', gzip=False, tam_pagina=1000,
+                        columnas=COLUMNAS_REPORTE):
+    """
+    Generador de bytes con la exportación completa
+
+    Un error a mitad de exportación no puede cambiar ya el código HTTP: se
+    registra y se vuelve a lanzar para que el servidor corte la respuesta
+    chunked. Así el cliente ve una transferencia incompleta (y, con gzip, un
+    archivo sin cola) en lugar de una exportación truncada que parece entera.
+    """
+    def lineas():
+        filas = recorrer_paginas(consultar_pagina, tam_pagina)
+        try:
+            if formato == 'csv':
+                yield from lineas_csv(filas, columnas)
+            else:
+                yield from lineas_ndjson(filas)
+        except Exception as e:
+            print(f"❌ Exportación interrumpida: {str(e)}")
+            raise
+
+    trozos = agrupar(lineas())
+    if gzip:
+        trozos = comprimir_gzip(trozos)
+    return trozos
+
+
+async def generar_exportacion_async(consultar_pagina, formato='ndjson', gzip=False,
+                                    tam_pagina=1000, columnas=COLUMNAS_REPORTE):
+    """Como generar_exportacion(), con `consultar_pagina` una corrutina (app_async.py)"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    despues_de = None
+    cabecera = True
+
+    try:
+        while True:
+            filas = await consultar_pagina(despues_de, tam_pagina)
+            if formato == 'csv':
+                lineas = lineas_csv(filas, columnas, cabecera)
+            else:
+                lineas = lineas_ndjson(filas)
+            cabecera = False
+
+            for trozo in agrupar(lineas):
+                datos = compresor.compress(trozo) if compresor else trozo
+                if datos:
+                    yield datos
+
+            if len(filas) < tam_pagina:
+                break
+            ultima = filas[-1]
+            despues_de = (ultima['created_at'], ultima['id'])
+    except Exception as e:
+        print(f"❌ Exportación interrumpida: {str(e)}")
+        raise
+
+    if compresor:
+        yield compresor.flush()
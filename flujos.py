@@ -0,0 +1,128 @@
+"""
+Ejecución de la lógica compartida con el cliente síncrono o el asíncrono
+La lógica de servicio_reportes.py se escribe como generadores que no hacen
+E/S: ceden (yield) lo que necesitan de fuera y reciben el resultado.
+
+    - una función cliente -> consulta de Supabase (sin ejecutar): se
+      construye con el cliente de la app, se ejecuta y se recibe la respuesta
+    - Bloqueante(funcion, *args): trabajo que bloquea (leer una foto, subirla,
+      esperar al lock de las estadísticas); en ASGI va a un hilo
+    - Carga(cargador, clave, campos): valor de un cargador por lotes de la
+      petición (ver cargadores.Cargador); en ASGI las claves pedidas en el
+      mismo tick del bucle de eventos se cargan juntas
+    - otro flujo: se ejecuta y se recibe su valor de retorno (útil en tuplas)
+    - una tupla de lo anterior: en ASGI se lanza a la vez con asyncio.gather,
+      en Flask una tras otra; se recibe una lista con los resultados
+
+Los errores se lanzan dentro del generador, así que sus try/except se
+comportan igual en las dos apps. Un flujo usa otro con `yield from`.
+
+    def contar(usuario_id):
+        response = yield lambda cliente: cliente.table('reportes').select('id').eq('usuario_id', usuario_id)
+        return len(response.data)
+
+    ejecutar(supabase, contar('u1'))                    # app.py
+    await ejecutar_async(supabase, contar('u1'))        # app_async.py
+"""
+
+import asyncio
+import inspect
+
+
+class Bloqueante:
+    """Llamada bloqueante cedida por un flujo"""
+
+    def __init__(self, funcion, *args):
+        self.funcion = funcion
+        self.args = args
+
+
+class Carga:
+    """Clave pedida a un cargador por lotes (se crea con Cargador.cargar)"""
+
+    def __init__(self, cargador, clave, campos):
+        self.cargador = cargador
+        self.clave = clave
+        self.campos = campos
+
+
+def ejecutar(cliente, flujo):
+    """Ejecutar `flujo` con el cliente síncrono; devuelve su valor de retorno"""
+    enviar, valor = flujo.send, None
+    while True:
+        try:
+            pedido = enviar(valor)
+        except StopIteration as fin:
+            return fin.value
+        try:
+            enviar, valor = flujo.send, _resolver(cliente, pedido)
+        except Exception as e:
+            enviar, valor = flujo.throw, e
+
+
+def _resolver(cliente, pedido):
+    if isinstance(pedido, tuple):
+        return [_resolver(cliente, p) for p in pedido]
+    if isinstance(pedido, Bloqueante):
+        return pedido.funcion(*pedido.args)
+    if inspect.isgenerator(pedido):
+        return ejecutar(cliente, pedido)
+    if isinstance(pedido, Carga):
+        cargador = pedido.cargador
+        if not cargador.cargado(pedido.clave, pedido.campos):
+            # Los resolvers se ejecutan uno tras otro: el lote se cierra aquí con
+            # esta clave y las que se encolaron antes
+            cargador.encolar([pedido.clave], pedido.campos)
+            claves, campos = cargador.tomar_lote()
+            cargador.guardar(claves, campos, ejecutar(cliente, cargador.cargar_lote(claves, campos)))
+        return cargador.valor(pedido.clave)
+    return pedido(cliente).execute()
+
+
+async def ejecutar_async(cliente, flujo):
+    """Como ejecutar(), con el cliente asíncrono y sin bloquear el bucle de eventos"""
+    enviar, valor = flujo.send, None
+    while True:
+        try:
+            pedido = enviar(valor)
+        except StopIteration as fin:
+            return fin.value
+        try:
+            enviar, valor = flujo.send, await _resolver_async(cliente, pedido)
+        except Exception as e:
+            enviar, valor = flujo.throw, e
+
+
+async def _resolver_async(cliente, pedido):
+    if isinstance(pedido, tuple):
+        return list(await asyncio.gather(*(_resolver_async(cliente, p) for p in pedido)))
+    if isinstance(pedido, Bloqueante):
+        return await asyncio.to_thread(pedido.funcion, *pedido.args)
+    if inspect.isgenerator(pedido):
+        return await ejecutar_async(cliente, pedido)
+    if isinstance(pedido, Carga):
+        cargador = pedido.cargador
+        if not cargador.cargado(pedido.clave, pedido.campos):
+            cargador.encolar([pedido.clave], pedido.campos)
+            if cargador.despacho is None:
+                # Despachar cuando los demás resolvers listos en este tick hayan
+                # encolado sus claves
+                bucle = asyncio.get_running_loop()
+                cargador.despacho = bucle.create_future()
+                bucle.call_soon(asyncio.ensure_future, _despachar_async(cliente, cargador))
+            await asyncio.shield(cargador.despacho)
+        return cargador.valor(pedido.clave)
+    return await pedido(cliente).execute()
+
+
+async def _despachar_async(cliente, cargador):
+    """Cargar el lote abierto de `cargador`; las claves que lleguen después van al siguiente"""
+    despacho, cargador.despacho = cargador.despacho, None
+    claves, campos = cargador.tomar_lote()
+    try:
+        cargador.guardar(claves, campos,
+                         await ejecutar_async(cliente, cargador.cargar_lote(claves, campos)))
+    except Exception as e:
+        despacho.set_exception(e)
+    else:
+        despacho.set_result(None)
@@ -0,0 +1,59 @@
+"""
+Utilidades geográficas
+Distancia haversine y rejilla de celdas en grados para índices en memoria
+"""
+
+import math
+
+RADIO_TIERRA_METROS = 6371008.8
+METROS_POR_GRADO_LAT = 111320.0
+
+
+def haversine_metros(lat1, lng1, lat2, lng2):
+    """Distancia en metros sobre la esfera entre dos puntos"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+
+    a = math.sin(dphi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RADIO_TIERRA_METROS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def celda(lat, lng, tam_celda):
+    """Celda de la rejilla que contiene el punto"""
+    return (math.floor(lat / tam_celda), math.floor(lng / tam_celda))
+
+
+def margen_grados(lat, radio_metros):
+    """
+    Semiancho en grados (lat, lng) de la caja que contiene el círculo
+
+    El margen en longitud se ensancha con la latitud porque los meridianos
+    se juntan al alejarse del ecuador.
+    """
+    dlat = radio_metros / METROS_POR_GRADO_LAT
+    coseno = max(math.cos(math.radians(min(89.9, abs(lat) + dlat))), 1e-6)
+    dlng = min(180.0, radio_metros / (METROS_POR_GRADO_LAT * coseno))
+    return dlat, dlng
+
+
+def celdas_en_radio(lat, lng, radio_metros, tam_celda):
+    """Celdas que cubren el círculo de radio_metros alrededor del punto"""
+    dlat, dlng = margen_grados(lat, radio_metros)
+    fila_min, col_min = celda(lat - dlat, lng - dlng, tam_celda)
+    fila_max, col_max = celda(lat + dlat, lng + dlng, tam_celda)
+    return [
+        (fila, col)
+        for fila in range(fila_min, fila_max + 1)
+        for col in range(col_min, col_max + 1)
+    ]
+
+
+def numero_celdas_en_radio(lat, lng, radio_metros, tam_celda):
+    """Cuántas celdas recorrería celdas_en_radio, sin generarlas"""
+    dlat, dlng = margen_grados(lat, radio_metros)
+    filas = math.floor((lat + dlat) / tam_celda) - math.floor((lat - dlat) / tam_celda) + 1
+    columnas = math.floor((lng + dlng) / tam_celda) - math.floor((lng - dlng) / tam_celda) + 1
+    return filas * columnas
@@ -0,0 +1,151 @@
+"""
+Caché de documentos GraphQL y consultas persistidas automáticas (APQ)
+Guarda el documento ya parseado y el resultado de su validación por el
+SHA-256 del texto de la consulta, y permite que los clientes envíen solo
+ese hash (protocolo `extensions.persistedQuery` de Apollo).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from graphql import parse, validate
+
+ERROR_NO_ENCONTRADA = {
+    'errors': [{
+        'message': 'PersistedQueryNotFound',
+        'extensions': {'code': 'PERSISTED_QUERY_NOT_FOUND'}
+    }]
+}
+
+
+def hash_consulta(texto):
+    """SHA-256 hexadecimal del texto de la consulta"""
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheConsultasGraphQL:
+    """
+    LRU acotado de consultas: texto, documento parseado y errores de validación
+
+    La validación se memoriza por documento, así que solo se reutiliza
+    cuando el documento salió de esta caché (mismo objeto).
+    """
+
+    def __init__(self, max_documentos=500):
+        self.max_documentos = max_documentos
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._hash_por_documento = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.validaciones_reutilizadas = 0
+        self.persistidas_registradas = 0
+        self.persistidas_no_encontradas = 0
+
+    def resolver_persistida(self, data):
+        """
+        Completar `query` a partir de extensions.persistedQuery
+
+        Returns:
+            tuple: (data, error) — error es la respuesta a devolver si el
+            hash no está registrado o no coincide con el texto
+        """
+        if not isinstance(data, dict):
+            return data, None
+
+        persistida = (data.get('extensions') or {}).get('persistedQuery')
+        if not isinstance(persistida, dict) or 'sha256Hash' not in persistida:
+            return data, None
+
+        sha256 = persistida['sha256Hash']
+        texto = data.get('query')
+
+        if texto:
+            if hash_consulta(texto) != sha256:
+                return data, {'errors': [{
+                    'message': 'provided sha does not match query',
+                    'extensions': {'code': 'PERSISTED_QUERY_HASH_MISMATCH'}
+                }]}
+            with self._lock:
+                if sha256 not in self._entradas:
+                    self.persistidas_registradas += 1
+            self._obtener_entrada(sha256, texto)
+            return data, None
+
+        with self._lock:
+            entrada = self._entradas.get(sha256)
+            if entrada is None:
+                self.persistidas_no_encontradas += 1
+                return data, ERROR_NO_ENCONTRADA
+            self._entradas.move_to_end(sha256)
+            texto = entrada['texto']
+
+        return dict(data, query=texto), None
+
+    def parsear(self, context_value, data):
+        """`query_parser` de ariadne: devuelve el documento cacheado"""
+        texto = data['query']
+        return self._obtener_entrada(hash_consulta(texto), texto)['documento']
+
+    def validar(self, schema, document_ast, rules=None, max_errors=None, type_info=None):
+        """`query_validator` de ariadne: reutiliza la validación del mismo documento"""
+        with self._lock:
+            sha256 = self._hash_por_documento.get(id(document_ast))
+            entrada = self._entradas.get(sha256) if sha256 else None
+            if entrada is not None and entrada['documento'] is document_ast \
+                    and entrada['errores'] is not None:
+                self.validaciones_reutilizadas += 1
+                return entrada['errores']
+
+        # Solo los argumentos recibidos: type_info está deprecado en graphql-core 3.3
+        kwargs = {'rules': rules}
+        if max_errors is not None:
+            kwargs['max_errors'] = max_errors
+        if type_info is not None:
+            kwargs['type_info'] = type_info
+        errores = validate(schema, document_ast, **kwargs)
+
+        with self._lock:
+            if entrada is not None and entrada['documento'] is document_ast:
+                entrada['errores'] = errores
+        return errores
+
+    def _obtener_entrada(self, sha256, texto):
+        with self._lock:
+            entrada = self._entradas.get(sha256)
+            if entrada is not None:
+                self._entradas.move_to_end(sha256)
+                self.aciertos += 1
+                return entrada
+            self.fallos += 1
+
+        # Parsear fuera del lock; los errores de sintaxis no se cachean
+        documento = parse(texto)
+        entrada = {'texto': texto, 'documento': documento, 'errores': None}
+
+        with self._lock:
+            existente = self._entradas.get(sha256)
+            if existente is not None:
+                return existente
+            self._entradas[sha256] = entrada
+            self._hash_por_documento[id(documento)] = sha256
+            while len(self._entradas) > self.max_documentos:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._hash_por_documento.pop(id(expulsada['documento']), None)
+        return entrada
+
+    def metricas(self):
+        """Aciertos, fallos y consultas persistidas"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'documentos': len(self._entradas),
+                'max_documentos': self.max_documentos,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'ratio_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'validaciones_reutilizadas': self.validaciones_reutilizadas,
+                'persistidas_registradas': self.persistidas_registradas,
+                'persistidas_no_encontradas': self.persistidas_no_encontradas
+            }
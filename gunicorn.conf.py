@@ -0,0 +1,10 @@
+"""
+Configuración de gunicorn
+Cada worker crea su cliente de Supabase después del fork y abre sus
+conexiones antes de aceptar peticiones (SUPABASE_CALENTAR=0 lo desactiva).
+"""
+
+
+def post_fork(server, worker):
+    from supabase_config import calentar_conexiones
+    calentar_conexiones()
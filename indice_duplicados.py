@@ -0,0 +1,152 @@
+"""
+Índice de envíos recientes para detectar reportes duplicados
+Agrupa los reportes por (usuario_id, categoria) y por celda de la rejilla,
+compara distancias reales en metros y olvida cada envío al cumplirse
+la ventana de tiempo.
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from geo import METROS_POR_GRADO_LAT, haversine_metros, celda, celdas_en_radio
+
+
+class IndiceDuplicados:
+    """
+    Envíos de los últimos `time_window` segundos en este proceso
+
+    Las entradas caducan en orden de llegada, así que la limpieza es una
+    cola que se consume por la izquierda (O(1) amortizado por envío).
+    """
+
+    def __init__(self, time_window=300, radio_metros=111):
+        self.time_window = time_window
+        self.radio_metros = radio_metros
+        # Celdas del tamaño del radio: una búsqueda toca unas pocas celdas vecinas
+        self.tam_celda = radio_metros / METROS_POR_GRADO_LAT
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._expiracion = deque()
+        # Desde cuándo el índice tiene todos los envíos, y en qué proceso: con
+        # gunicorn --preload el índice se crea en el master y cada worker lo
+        # hereda vacío, así que la cobertura empieza a contar en el worker
+        self._desde = time.time()
+        self._pid = os.getpid()
+
+    def registrar(self, reporte, ahora=None):
+        """Añadir un reporte recién creado al índice"""
+        lat = reporte.get('lat')
+        lng = reporte.get('lng')
+        if lat is None or lng is None:
+            return
+
+        self._comprobar_proceso()
+        ahora = ahora or time.time()
+        clave = (reporte.get('usuario_id'), reporte.get('categoria'))
+        clave_celda = celda(lat, lng, self.tam_celda)
+        entrada = (ahora, lat, lng, reporte)
+
+        with self._lock:
+            self._expirar(ahora)
+            self._entradas.setdefault(clave, {}).setdefault(clave_celda, []).append(entrada)
+            self._expiracion.append((clave, clave_celda, entrada))
+
+    def buscar(self, usuario_id, categoria, lat, lng, ventana=None, ahora=None):
+        """
+        Buscar un envío del mismo usuario y categoría dentro del radio
+
+        Returns:
+            dict | None: el reporte previo si hay duplicado
+        """
+        self._comprobar_proceso()
+        ahora = ahora or time.time()
+        ventana = min(ventana or self.time_window, self.time_window)
+
+        with self._lock:
+            self._expirar(ahora)
+            celdas = self._entradas.get((usuario_id, categoria))
+            if not celdas:
+                return None
+
+            for clave_celda in celdas_en_radio(lat, lng, self.radio_metros, self.tam_celda):
+                for creado, lat_previa, lng_previa, reporte in celdas.get(clave_celda, ()):
+                    if ahora - creado > ventana:
+                        continue
+                    if haversine_metros(lat, lng, lat_previa, lng_previa) <= self.radio_metros:
+                        return reporte
+        return None
+
+    def cargar(self, reportes, desde):
+        """
+        Registrar envíos leídos de la base de datos (p. ej. al arrancar el worker)
+
+        Args:
+            reportes: filas con created_at, todas las creadas desde `desde`
+            desde: instante (epoch) a partir del cual `reportes` está completo
+        """
+        self._comprobar_proceso()
+        nuevas = []
+        for reporte in reportes:
+            lat, lng = reporte.get('lat'), reporte.get('lng')
+            if lat is None or lng is None:
+                continue
+            try:
+                creado = datetime.fromisoformat(reporte['created_at']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            clave = (reporte.get('usuario_id'), reporte.get('categoria'))
+            nuevas.append((clave, celda(lat, lng, self.tam_celda), (creado, lat, lng, reporte)))
+        nuevas.sort(key=lambda item: item[2][0])
+
+        with self._lock:
+            # Los registrados desde el arranque del worker también vienen en `reportes`
+            ids = {item[2][3].get('id') for item in self._expiracion}
+            nuevas = [item for item in nuevas if item[2][3].get('id') not in ids]
+            for clave, clave_celda, entrada in nuevas:
+                self._entradas.setdefault(clave, {}).setdefault(clave_celda, []).append(entrada)
+            # Intercalar por fecha de creación: la cola debe seguir en orden de caducidad
+            self._expiracion = deque(heapq.merge(self._expiracion, nuevas,
+                                                 key=lambda item: item[2][0]))
+            self._expirar(time.time())
+            self._desde = min(self._desde, desde)
+
+    def cubre_ventana(self):
+        """True si este proceso tiene los envíos de al menos una ventana completa"""
+        self._comprobar_proceso()
+        return time.time() - self._desde >= self.time_window
+
+    def _comprobar_proceso(self):
+        """Tras un fork el índice empieza de cero en el proceso hijo"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._entradas = {}
+                self._expiracion = deque()
+                self._desde = time.time()
+                self._pid = os.getpid()
+
+    def tamano(self):
+        """Número de envíos vigentes"""
+        with self._lock:
+            self._expirar(time.time())
+            return len(self._expiracion)
+
+    def _expirar(self, ahora):
+        limite = ahora - self.time_window
+        while self._expiracion and self._expiracion[0][2][0] < limite:
+            clave, clave_celda, entrada = self._expiracion.popleft()
+            celdas = self._entradas.get(clave)
+            if celdas is None:
+                continue
+            bucket = celdas.get(clave_celda)
+            if bucket:
+                bucket.remove(entrada)
+                if not bucket:
+                    del celdas[clave_celda]
+            if not celdas:
+                del self._entradas[clave]
@@ -0,0 +1,170 @@
+"""
+Índice espacial en memoria de reportes activos
+Rejilla de celdas en grados que responde búsquedas por radio con distancias
+haversine exactas y la misma forma que la RPC `buscar_reportes_cercanos`.
+Se alimenta en cada escritura y se refresca periódicamente desde Supabase.
+"""
+
+import threading
+import time
+
+from geo import haversine_metros, celda, celdas_en_radio, numero_celdas_en_radio
+from paginacion import leer_paginado
+
+# Estados que devuelve buscar_reportes_cercanos; deben coincidir con la RPC
+ESTADOS_ACTIVOS = ('pendiente', 'en_proceso')
+
+COLUMNAS = ('id', 'categoria', 'lat', 'lng', 'descripcion', 'estado', 'created_at')
+
+
+class IndiceEspacial:
+    """
+    Reportes activos agrupados por celda de la rejilla
+
+    Mientras no se haya completado la primera carga el índice está "frío"
+    y buscar() devuelve None para que el llamador use la RPC.
+    """
+
+    def __init__(self, cliente, intervalo_refresco=300, tam_celda=0.01,
+                 estados_activos=ESTADOS_ACTIVOS):
+        self.cliente = cliente
+        self.intervalo_refresco = intervalo_refresco
+        self.tam_celda = tam_celda
+        self.estados_activos = tuple(estados_activos)
+        self._lock = threading.Lock()
+        self._cargado = False
+        self._refrescando = False
+        self._ultimo_refresco = 0
+        self._pendientes = []
+        self._celdas = {}
+        self._celda_por_id = {}
+
+    # ----------------------------------------
+    # Escrituras
+    # ----------------------------------------
+
+    def registrar(self, reporte):
+        """Insertar, mover o quitar un reporte según su estado actual"""
+        with self._lock:
+            if self._refrescando:
+                self._pendientes.append(reporte)
+            self._aplicar(reporte)
+
+    def _aplicar(self, reporte):
+        reporte_id = reporte.get('id')
+        self._quitar(reporte_id)
+
+        if reporte.get('estado') not in self.estados_activos:
+            return
+        if reporte.get('lat') is None or reporte.get('lng') is None:
+            # Actualización parcial de un reporte desconocido: esperar al refresco
+            return
+
+        entrada = {columna: reporte.get(columna) for columna in COLUMNAS}
+        clave = celda(entrada['lat'], entrada['lng'], self.tam_celda)
+        self._celdas.setdefault(clave, {})[reporte_id] = entrada
+        self._celda_por_id[reporte_id] = clave
+
+    def _quitar(self, reporte_id):
+        clave = self._celda_por_id.pop(reporte_id, None)
+        if clave is None:
+            return
+        bucket = self._celdas.get(clave)
+        if bucket is not None:
+            bucket.pop(reporte_id, None)
+            if not bucket:
+                del self._celdas[clave]
+
+    # ----------------------------------------
+    # Refresco
+    # ----------------------------------------
+
+    def refrescar(self):
+        """Recargar todos los reportes activos desde Supabase"""
+        with self._lock:
+            if self._refrescando:
+                return
+            self._refrescando = True
+            self._pendientes = []
+
+        try:
+            filas = list(leer_paginado(
+                lambda: self.cliente.table('reportes')
+                    .select(', '.join(COLUMNAS))
+                    .in_('estado', list(self.estados_activos))
+                    .order('id')
+            ))
+        except Exception:
+            with self._lock:
+                self._refrescando = False
+                self._pendientes = []
+            raise
+
+        with self._lock:
+            self._celdas = {}
+            self._celda_por_id = {}
+            for fila in filas:
+                self._aplicar(fila)
+
+            # Reaplicar escrituras ocurridas mientras se leía la tabla
+            for reporte in self._pendientes:
+                self._aplicar(reporte)
+
+            self._pendientes = []
+            self._refrescando = False
+            self._cargado = True
+            self._ultimo_refresco = time.time()
+
+    def _refrescar_en_segundo_plano(self):
+        try:
+            self.refrescar()
+        except Exception as e:
+            print(f"⚠️ Error refrescando índice espacial: {str(e)}")
+
+    def _programar_refresco(self):
+        if not self._refrescando:
+            threading.Thread(target=self._refrescar_en_segundo_plano, daemon=True).start()
+
+    # ----------------------------------------
+    # Lectura
+    # ----------------------------------------
+
+    def buscar(self, lat, lng, radio_metros):
+        """
+        Reportes activos a menos de radio_metros, ordenados por distancia
+
+        Returns:
+            list | None: filas con la forma de `ReporteCercano`, o None si
+            el índice aún no está cargado
+        """
+        if not self._cargado:
+            self._programar_refresco()
+            return None
+        if time.time() - self._ultimo_refresco > self.intervalo_refresco:
+            self._programar_refresco()
+
+        resultados = []
+        with self._lock:
+            # Con radios enormes es más barato recorrer las celdas ocupadas
+            if numero_celdas_en_radio(lat, lng, radio_metros, self.tam_celda) > len(self._celdas):
+                buckets = list(self._celdas.values())
+            else:
+                buckets = [
+                    self._celdas[clave]
+                    for clave in celdas_en_radio(lat, lng, radio_metros, self.tam_celda)
+                    if clave in self._celdas
+                ]
+
+            for bucket in buckets:
+                for entrada in bucket.values():
+                    distancia = haversine_metros(lat, lng, entrada['lat'], entrada['lng'])
+                    if distancia <= radio_metros:
+                        resultados.append(dict(entrada, distancia_metros=distancia))
+
+        resultados.sort(key=lambda r: r['distancia_metros'])
+        return resultados
+
+    def tamano(self):
+        """Número de reportes indexados"""
+        with self._lock:
+            return len(self._celda_por_id)
@@ -0,0 +1,556 @@
+"""
+Instrumentación de peticiones y llamadas a Supabase
+Histogramas de latencia por ruta, por llamada a Supabase (tabla y
+operación, RPC o Storage) y por resolver raíz de GraphQL, exportados en
+formato de texto de Prometheus por /metrics.
+
+Cada petición lleva una traza (contextvar, válida en hilos de Flask y en
+tareas de asyncio) con las llamadas a Supabase que hizo; se resume en el
+log si la petición es lenta y, con INSTRUMENTACION_CABECERAS=1, en la
+cabecera Server-Timing. Las llamadas
+de hilos en segundo plano (fotos, agrupador, reconciliación) cuentan en
+los histogramas pero no en la traza de ninguna petición.
+
+Con la traza se vigila también el número de viajes: se avisa (log,
+contador y, con INSTRUMENTACION_CABECERAS=1, las cabeceras
+X-Upstream-Llamadas y X-Upstream-Alertas) cuando una petición supera su presupuesto (PRESUPUESTO_LLAMADAS)
+o repite N_MAS_1_UMBRAL veces la misma forma de consulta (patrón N+1).
+contar_llamadas() y comprobar_llamadas() permiten fijar esos números en
+pruebas.
+
+Con gunicorn cada worker tiene sus propios contadores (Prometheus los
+suma por instancia).
+"""
+
+import bisect
+import contextvars
+import inspect
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+INSTRUMENTACION = os.getenv('INSTRUMENTACION', '1') == '1'
+# Peticiones más lentas que esto se registran con sus llamadas (0 desactiva el log)
+PETICION_LENTA_MS = float(os.getenv('INSTRUMENTACION_LENTA_MS', 1000))
+# Una línea de log por petición con sus llamadas a Supabase
+LOG_LLAMADAS = os.getenv('INSTRUMENTACION_LOG_LLAMADAS', '0') == '1'
+# Server-Timing y X-Upstream-* en las respuestas: desactivadas por defecto porque
+# exponen a cualquier cliente las tablas consultadas y los tiempos internos
+CABECERAS_DIAGNOSTICO = os.getenv('INSTRUMENTACION_CABECERAS', '0') == '1'
+
+
+def _leer_presupuestos(texto):
+    """'5,POST /reportes=4,/graphql=8' -> (5, {'POST /reportes': 4, '/graphql': 8})"""
+    por_defecto, por_ruta = 0, {}
+    for parte in (p.strip() for p in texto.split(',')):
+        if not parte:
+            continue
+        if '=' in parte:
+            ruta, maximo = parte.rsplit('=', 1)
+            por_ruta[ruta.strip()] = int(maximo)
+        else:
+            por_defecto = int(parte)
+    return por_defecto, por_ruta
+
+
+# Máximo de llamadas a Supabase por petición, general y por ruta (0 = sin límite)
+PRESUPUESTO_LLAMADAS, PRESUPUESTOS_POR_RUTA = _leer_presupuestos(os.getenv('PRESUPUESTO_LLAMADAS', ''))
+# Repeticiones de la misma forma de consulta que se consideran N+1 (0 desactiva)
+UMBRAL_REPETIDAS = int(os.getenv('N_MAS_1_UMBRAL', 3))
+
+LIMITES_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_UPSTREAM = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+LIMITES_LLAMADAS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+
+# Métodos de los constructores de PostgREST que fijan la operación
+OPERACIONES_TABLA = ('select', 'insert', 'update', 'upsert', 'delete')
+# Filtros cuya columna forma parte de la forma de la consulta (los valores no)
+FILTROS_FORMA = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in_', 'is_', 'like', 'ilike',
+                 'contains', 'order')
+# Métodos de Storage que hacen un viaje (get_public_url solo compone la URL)
+OPERACIONES_STORAGE = ('upload', 'update', 'exists', 'download', 'remove', 'list', 'move',
+                       'copy', 'info', 'create_signed_url', 'create_signed_urls')
+
+
+# ============================================
+# MÉTRICAS
+# ============================================
+
+class Histograma:
+    """Cubos acumulables al estilo de Prometheus (sin bloqueo propio)"""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubos = [0] * len(limites)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.limites, valor)
+        if indice < len(self.cubos):
+            self.cubos[indice] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class RegistroMetricas:
+    """Familias de histogramas y contadores con etiquetas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._familias = {}
+
+    def histograma(self, nombre, ayuda, etiquetas, limites):
+        self._familias[nombre] = ('histogram', ayuda, etiquetas, limites, {})
+
+    def contador(self, nombre, ayuda, etiquetas):
+        self._familias[nombre] = ('counter', ayuda, etiquetas, None, {})
+
+    def observar(self, nombre, valor, *etiquetas):
+        _, _, _, limites, series = self._familias[nombre]
+        with self._lock:
+            serie = series.get(etiquetas)
+            if serie is None:
+                serie = series[etiquetas] = Histograma(limites)
+            serie.observar(valor)
+
+    def incrementar(self, nombre, *etiquetas, valor=1):
+        series = self._familias[nombre][4]
+        with self._lock:
+            series[etiquetas] = series.get(etiquetas, 0) + valor
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus"""
+        lineas = []
+        with self._lock:
+            for nombre, (tipo, ayuda, claves, limites, series) in self._familias.items():
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} {tipo}')
+                for etiquetas, serie in series.items():
+                    pares = [f'{c}="{_escapar(v)}"' for c, v in zip(claves, etiquetas)]
+                    if tipo == 'counter':
+                        lineas.append(f'{nombre}{_etiquetas(pares)} {serie}')
+                        continue
+                    acumulado = 0
+                    for limite, cuenta in zip(limites, serie.cubos):
+                        acumulado += cuenta
+                        cubo = _etiquetas(pares + ['le="%s"' % limite])
+                        lineas.append(f'{nombre}_bucket{cubo} {acumulado}')
+                    cubo = _etiquetas(pares + ['le="+Inf"'])
+                    lineas.append(f'{nombre}_bucket{cubo} {serie.total}')
+                    lineas.append(f'{nombre}_sum{_etiquetas(pares)} {serie.suma}')
+                    lineas.append(f'{nombre}_count{_etiquetas(pares)} {serie.total}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(pares):
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def exportar_valores(prefijo, valores):
+    """Valores numéricos de un dict de metricas() como gauges de Prometheus"""
+    lineas = []
+    for clave, valor in (valores or {}).items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        lineas.append(f'# TYPE {prefijo}_{clave} gauge')
+        lineas.append(f'{prefijo}_{clave} {valor}')
+    return '\n'.join(lineas) + '\n' if lineas else ''
+
+
+metricas = RegistroMetricas()
+metricas.histograma('mingafix_peticiones_segundos', 'Duración de las peticiones HTTP',
+                    ('metodo', 'ruta', 'estado'), LIMITES_PETICION)
+metricas.histograma('mingafix_upstream_segundos', 'Duración de las llamadas a Supabase',
+                    ('tipo', 'destino', 'operacion'), LIMITES_UPSTREAM)
+metricas.contador('mingafix_upstream_errores_total', 'Llamadas a Supabase que lanzaron excepción',
+                  ('tipo', 'destino', 'operacion'))
+metricas.histograma('mingafix_graphql_resolver_segundos', 'Duración de los resolvers raíz de GraphQL',
+                    ('campo',), LIMITES_PETICION)
+metricas.contador('mingafix_graphql_resolver_errores_total', 'Resolvers raíz de GraphQL que fallaron',
+                  ('campo',))
+metricas.histograma('mingafix_peticion_llamadas_upstream', 'Llamadas a Supabase por petición',
+                    ('metodo', 'ruta'), LIMITES_LLAMADAS)
+metricas.contador('mingafix_presupuesto_excedido_total', 'Peticiones por encima del presupuesto de llamadas',
+                  ('metodo', 'ruta'))
+metricas.contador('mingafix_consultas_repetidas_total', 'Peticiones que repiten una forma de consulta (N+1)',
+                  ('metodo', 'ruta', 'forma'))
+
+
+# ============================================
+# TRAZA POR PETICIÓN
+# ============================================
+
+class TrazaPeticion:
+    """
+    Llamadas a Supabase hechas durante una petición
+
+    Cada span es (tipo, destino, operación, segundos, error, forma). Si se
+    abre dentro de otra traza (p. ej. contar_llamadas() alrededor de una
+    petición de prueba) las llamadas se anotan también en la de fuera.
+    """
+
+    def __init__(self, padre=None):
+        self.inicio = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.padre = padre
+
+    def anotar(self, tipo, destino, operacion, segundos, error=False, forma=None):
+        with self._lock:
+            self.spans.append((tipo, destino, operacion, segundos, error, forma))
+        if self.padre is not None:
+            self.padre.anotar(tipo, destino, operacion, segundos, error, forma)
+
+    def llamadas(self):
+        return len(self.spans)
+
+    def repetidas(self, umbral=UMBRAL_REPETIDAS):
+        """Formas de consulta que se repiten `umbral` veces o más: [(forma, veces)]"""
+        if umbral <= 0:
+            return []
+        with self._lock:
+            conteo = Counter(span[5] for span in self.spans)
+        return [(forma, veces) for forma, veces in conteo.most_common() if veces >= umbral]
+
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    def resumen(self):
+        """{tipo: (llamadas, segundos)}"""
+        resumen = {}
+        with self._lock:
+            for tipo, _, _, segundos, _, _ in self.spans:
+                llamadas, total = resumen.get(tipo, (0, 0.0))
+                resumen[tipo] = (llamadas + 1, total + segundos)
+        return resumen
+
+    def server_timing(self, segundos_totales):
+        """Valor de la cabecera Server-Timing (tiempo en Supabase por tipo y total)"""
+        partes = [f'{tipo};dur={total * 1000:.1f};desc="{llamadas} llamadas"'
+                  for tipo, (llamadas, total) in self.resumen().items()]
+        partes.append(f'total;dur={segundos_totales * 1000:.1f}')
+        return ', '.join(partes)
+
+
+_traza_actual = contextvars.ContextVar('traza_peticion', default=None)
+
+
+def iniciar_traza():
+    """Empezar la traza de la petición actual; devuelve (traza, token para cerrarla)"""
+    traza = TrazaPeticion(padre=_traza_actual.get())
+    return traza, _traza_actual.set(traza)
+
+
+def cerrar_traza(token):
+    _traza_actual.reset(token)
+
+
+def traza_actual():
+    return _traza_actual.get()
+
+
+def registrar_span(tipo, destino, operacion, segundos, error=False, forma=None):
+    metricas.observar('mingafix_upstream_segundos', segundos, tipo, destino, operacion)
+    if error:
+        metricas.incrementar('mingafix_upstream_errores_total', tipo, destino, operacion)
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza.anotar(tipo, destino, operacion, segundos, error, forma or f'{tipo}:{destino}.{operacion}')
+
+
+def presupuesto_de(metodo, ruta):
+    return PRESUPUESTOS_POR_RUTA.get(f'{metodo} {ruta}', PRESUPUESTOS_POR_RUTA.get(ruta, PRESUPUESTO_LLAMADAS))
+
+
+def alertas_llamadas(metodo, ruta, traza):
+    """Presupuesto excedido y consultas repetidas de la traza (también en métricas y log)"""
+    alertas = []
+    llamadas = traza.llamadas()
+    presupuesto = presupuesto_de(metodo, ruta)
+    if presupuesto and llamadas > presupuesto:
+        metricas.incrementar('mingafix_presupuesto_excedido_total', metodo, ruta)
+        print(f"⚠️ {metodo} {ruta}: {llamadas} llamadas a Supabase (presupuesto {presupuesto})")
+        alertas.append(f'presupuesto={llamadas}/{presupuesto}')
+    for forma, veces in traza.repetidas():
+        metricas.incrementar('mingafix_consultas_repetidas_total', metodo, ruta, forma)
+        print(f"⚠️ {metodo} {ruta}: consulta repetida {veces} veces (N+1): {forma}")
+        alertas.append(f'repetida={forma}x{veces}')
+    return alertas
+
+
+def registrar_peticion(metodo, ruta, estado, traza):
+    """
+    Observar la duración y las llamadas de la petición
+
+    Returns:
+        list: cabeceras (nombre, valor) para la respuesta, vacía sin
+            INSTRUMENTACION_CABECERAS=1
+    """
+    segundos = traza.segundos()
+    llamadas = traza.llamadas()
+    metricas.observar('mingafix_peticiones_segundos', segundos, metodo, ruta, str(estado))
+    metricas.observar('mingafix_peticion_llamadas_upstream', llamadas, metodo, ruta)
+    if PETICION_LENTA_MS and segundos * 1000 >= PETICION_LENTA_MS:
+        detalle = ', '.join(f'{tipo}:{destino}.{operacion} {s * 1000:.0f}ms'
+                            for tipo, destino, operacion, s, _, _ in traza.spans[:20])
+        print(f"🐢 {metodo} {ruta} {estado} en {segundos * 1000:.0f} ms "
+              f"({llamadas} llamadas a Supabase: {detalle})")
+    elif LOG_LLAMADAS:
+        print(f"📊 {metodo} {ruta} {estado} en {segundos * 1000:.0f} ms, {llamadas} llamadas a Supabase")
+
+    alertas = alertas_llamadas(metodo, ruta, traza)
+    if not CABECERAS_DIAGNOSTICO:
+        return []
+    cabeceras = [('Server-Timing', traza.server_timing(segundos)),
+                 ('X-Upstream-Llamadas', str(llamadas))]
+    if alertas:
+        cabeceras.append(('X-Upstream-Alertas', '; '.join(alertas)))
+    return cabeceras
+
+
+@contextmanager
+def contar_llamadas():
+    """
+    Traza de todas las llamadas a Supabase del bloque, incluidas las de las
+    peticiones que se hagan dentro con el cliente de pruebas de Flask o httpx:
+
+        with contar_llamadas() as traza:
+            cliente.post('/reportes', json=datos)
+        comprobar_llamadas(traza, maximo=3)
+    """
+    traza, token = iniciar_traza()
+    try:
+        yield traza
+    finally:
+        cerrar_traza(token)
+
+
+def comprobar_llamadas(traza, maximo=None, umbral_repetidas=UMBRAL_REPETIDAS):
+    """AssertionError si la traza supera `maximo` llamadas o repite una forma de consulta"""
+    problemas = []
+    if maximo is not None and traza.llamadas() > maximo:
+        problemas.append(f'{traza.llamadas()} llamadas a Supabase (máximo {maximo})')
+    problemas += [f'{forma} repetida {veces} veces' for forma, veces in traza.repetidas(umbral_repetidas)]
+    if problemas:
+        formas = '\n'.join(f'  {span[5]} {span[3] * 1000:.1f}ms' for span in traza.spans)
+        raise AssertionError('; '.join(problemas) + '\n' + formas)
+
+
+class MedicionASGI:
+    """Middleware ASGI equivalente a los hooks de Flask de app.py (para app_async.py)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._rutas = {}
+
+    def _ruta(self, scope):
+        # Plantilla de la ruta (no la URL) para no crear una serie por id o consulta
+        endpoint = scope.get('endpoint')
+        if endpoint not in self._rutas:
+            rutas = getattr(scope.get('app'), 'routes', [])
+            self._rutas[endpoint] = next(
+                (r.path for r in rutas if endpoint is not None and getattr(r, 'endpoint', None) is endpoint),
+                'desconocida'
+            )
+        return self._rutas[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not INSTRUMENTACION:
+            await self.app(scope, receive, send)
+            return
+
+        traza, token = iniciar_traza()
+        respondida = False
+
+        async def enviar(mensaje):
+            nonlocal respondida
+            if mensaje['type'] == 'http.response.start':
+                respondida = True
+                cabeceras = registrar_peticion(scope['method'], self._ruta(scope), mensaje['status'], traza)
+                mensaje['headers'] = list(mensaje.get('headers', [])) + [
+                    (nombre.lower().encode(), valor.encode()) for nombre, valor in cabeceras
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            if not respondida:
+                registrar_peticion(scope['method'], self._ruta(scope), 500, traza)
+            raise
+        finally:
+            cerrar_traza(token)
+
+
+# ============================================
+# CLIENTE DE SUPABASE INSTRUMENTADO
+# ============================================
+
+def _medir(funcion, tipo, destino, operacion, forma=None):
+    """Ejecutar `funcion` y registrar su duración (espera la corrutina si la devuelve)"""
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion()
+    except Exception:
+        registrar_span(tipo, destino, operacion, time.perf_counter() - inicio, True, forma)
+        raise
+    if inspect.isawaitable(resultado):
+        return _medir_async(resultado, inicio, tipo, destino, operacion, forma)
+    registrar_span(tipo, destino, operacion, time.perf_counter() - inicio, False, forma)
+    return resultado
+
+
+async def _medir_async(corrutina, inicio, tipo, destino, operacion, forma):
+    try:
+        resultado = await corrutina
+    except Exception:
+        registrar_span(tipo, destino, operacion, time.perf_counter() - inicio, True, forma)
+        raise
+    registrar_span(tipo, destino, operacion, time.perf_counter() - inicio, False, forma)
+    return resultado
+
+
+class ConsultaInstrumentada:
+    """Envuelve un constructor de PostgREST y mide su execute()"""
+
+    def __init__(self, consulta, tipo, destino, operacion, pasos=()):
+        self._consulta = consulta
+        self._tipo = tipo
+        self._destino = destino
+        self._operacion = operacion
+        # Métodos encadenados (con la columna en los filtros): la forma de la consulta
+        self._pasos = pasos
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._consulta, nombre)
+        operacion = nombre if nombre in OPERACIONES_TABLA else self._operacion
+        if not callable(atributo):
+            return self._envolver(atributo, operacion, self._pasos)
+
+        def llamar(*args, **kwargs):
+            paso = nombre
+            if nombre in FILTROS_FORMA and args and isinstance(args[0], str):
+                paso = f'{nombre}:{args[0]}'
+            pasos = self._pasos if nombre in OPERACIONES_TABLA else self._pasos + (paso,)
+            return self._envolver(atributo(*args, **kwargs), operacion, pasos)
+        return llamar
+
+    def _envolver(self, resultado, operacion, pasos):
+        if hasattr(resultado, 'execute'):
+            return ConsultaInstrumentada(resultado, self._tipo, self._destino, operacion, pasos)
+        return resultado
+
+    def forma(self):
+        """p. ej. 'tabla:reportes.select(eq:id,limit)' (sin los valores)"""
+        return f"{self._tipo}:{self._destino}.{self._operacion}({','.join(self._pasos)})"
+
+    def execute(self, *args, **kwargs):
+        return _medir(lambda: self._consulta.execute(*args, **kwargs),
+                      self._tipo, self._destino, self._operacion, self.forma())
+
+
+class BucketInstrumentado:
+    def __init__(self, bucket, nombre):
+        self._bucket = bucket
+        self._nombre = nombre
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._bucket, nombre)
+        if nombre not in OPERACIONES_STORAGE:
+            return atributo
+        return lambda *args, **kwargs: _medir(lambda: atributo(*args, **kwargs),
+                                              'storage', self._nombre, nombre)
+
+
+class StorageInstrumentado:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket):
+        return BucketInstrumentado(self._storage.from_(bucket), bucket)
+
+    def __getattr__(self, nombre):
+        return getattr(self._storage, nombre)
+
+
+class ClienteInstrumentado:
+    """
+    Cliente de Supabase (síncrono, asíncrono o backend local) que registra
+    cada viaje: tablas por operación, RPC por nombre y Storage por bucket
+    """
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def table(self, nombre):
+        return ConsultaInstrumentada(self._cliente.table(nombre), 'tabla', nombre, 'select')
+
+    def from_(self, nombre):
+        return self.table(nombre)
+
+    def rpc(self, nombre, *args, **kwargs):
+        return ConsultaInstrumentada(self._cliente.rpc(nombre, *args, **kwargs), 'rpc', nombre, 'rpc')
+
+    @property
+    def storage(self):
+        return StorageInstrumentado(self._cliente.storage)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cliente, nombre)
+
+
+def instrumentar_cliente(cliente):
+    """Cliente instrumentado si INSTRUMENTACION=1; si no, el mismo cliente"""
+    return ClienteInstrumentado(cliente) if INSTRUMENTACION else cliente
+
+
+# ============================================
+# GRAPHQL
+# ============================================
+
+def medir_resolver(resolve, obj, info, **kwargs):
+    """
+    Middleware de ariadne: mide los campos raíz (los demás pasan sin coste)
+
+    Sirve para Flask y para ASGI: si el resolver devuelve una corrutina se
+    mide hasta que termina, sin convertir en asíncronos los demás campos.
+    """
+    if info.path.prev is not None:
+        return resolve(obj, info, **kwargs)
+    campo = f'{info.parent_type.name}.{info.field_name}'
+    inicio = time.perf_counter()
+    try:
+        resultado = resolve(obj, info, **kwargs)
+    except Exception:
+        _registrar_resolver(campo, inicio, error=True)
+        raise
+    if inspect.isawaitable(resultado):
+        return _medir_resolver_async(resultado, campo, inicio)
+    _registrar_resolver(campo, inicio)
+    return resultado
+
+
+async def _medir_resolver_async(corrutina, campo, inicio):
+    try:
+        resultado = await corrutina
+    except Exception:
+        _registrar_resolver(campo, inicio, error=True)
+        raise
+    _registrar_resolver(campo, inicio)
+    return resultado
+
+
+def _registrar_resolver(campo, inicio, error=False):
+    metricas.observar('mingafix_graphql_resolver_segundos', time.perf_counter() - inicio, campo)
+    if error:
+        metricas.incrementar('mingafix_graphql_resolver_errores_total', campo)
+
+
+MIDDLEWARE_GRAPHQL = [medir_resolver] if INSTRUMENTACION else None
@@ -0,0 +1,232 @@
+"""
+Limitador de peticiones
+Algoritmos de cubo de fichas, registro deslizante y contador deslizante
+sobre un almacén acotado con expiración O(1) amortizada y seguro entre hilos.
+
+El almacén es intercambiable (ver AlmacenLimites): en memoria del proceso
+o compartido entre workers (limitador_compartido.py).
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+Decision = namedtuple('Decision', ['permitido', 'limite', 'restante', 'reinicio', 'retry_after', 'usados'])
+
+
+class AlmacenLimites:
+    """
+    Interfaz de almacenamiento de límites
+
+    Una implementación recibe la clave (usuario:endpoint) y debe leer el
+    estado, aplicar el algoritmo y guardar el resultado de forma atómica
+    para todos los procesos que compartan el almacén. Un almacén tipo Redis
+    lo haría con un script Lua por clave que devuelva los campos de Decision.
+
+    Política común cuando no queda sitio: se expulsa la clave usada hace más
+    tiempo y la nueva se admite. Nunca se rechaza una clave por falta de
+    sitio, porque el X-User-ID lo elige el cliente y bastaría con inventar
+    claves para dejar fuera a todos los usuarios nuevos. La clave expulsada
+    vuelve a empezar de cero, así que la capacidad debe cubrir holgadamente
+    los usuarios activos en una ventana.
+    """
+
+    def consumir(self, clave, ahora=None):
+        """Registrar una petición para `clave` y devolver una Decision"""
+        raise NotImplementedError
+
+    def tamano(self):
+        """Número de claves con estado vigente"""
+        raise NotImplementedError
+
+
+class Limitador(AlmacenLimites):
+    """
+    Almacén en memoria del proceso y base de los algoritmos
+
+    El estado por clave vive en un OrderedDict ordenado por último uso.
+
+    Todas las claves comparten la misma ventana, de modo que la clave menos
+    usada recientemente es también la primera en caducar: el OrderedDict hace
+    de rueda de expiración (se consume por el frente) y de LRU cuando se
+    alcanza max_claves. Cada petición cuesta O(1) amortizado.
+
+    Con max_claves claves vigentes se expulsa la menos usada recientemente
+    (ver la política común en AlmacenLimites).
+    """
+
+    # Ventanas de inactividad tras las que el estado equivale a uno nuevo
+    factor_expiracion = 1
+
+    def __init__(self, max_requests, time_window, max_claves=10000):
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.max_claves = max_claves
+        self._lock = threading.Lock()
+        self._estados = OrderedDict()
+
+    def consumir(self, clave, ahora=None):
+        """Registrar una petición para `clave` y decidir si se permite"""
+        ahora = ahora if ahora is not None else time.time()
+        with self._lock:
+            self._expirar(ahora)
+
+            estado = self._estados.get(clave)
+            if estado is None:
+                if len(self._estados) >= self.max_claves:
+                    self._estados.popitem(last=False)
+                estado = self._nuevo_estado(ahora)
+                self._estados[clave] = estado
+            else:
+                self._estados.move_to_end(clave)
+
+            decision = self._decidir(estado, ahora)
+            estado['ultimo_uso'] = ahora
+            return decision
+
+    def _expirar(self, ahora):
+        while self._estados:
+            clave, estado = next(iter(self._estados.items()))
+            if ahora - estado['ultimo_uso'] <= self.time_window * self.factor_expiracion:
+                break
+            self._estados.popitem(last=False)
+
+    def tamano(self):
+        """Número de claves con estado vigente"""
+        with self._lock:
+            self._expirar(time.time())
+            return len(self._estados)
+
+    def _nuevo_estado(self, ahora):
+        raise NotImplementedError
+
+    def _decidir(self, estado, ahora):
+        raise NotImplementedError
+
+
+class CuboFichas(Limitador):
+    """Cubo de `max_requests` fichas que se rellena a max_requests/time_window por segundo"""
+
+    def _nuevo_estado(self, ahora):
+        return {'fichas': float(self.max_requests), 'actualizado': ahora, 'ultimo_uso': ahora}
+
+    def _decidir(self, estado, ahora):
+        tasa = self.max_requests / self.time_window
+        estado['fichas'] = min(
+            float(self.max_requests),
+            estado['fichas'] + (ahora - estado['actualizado']) * tasa
+        )
+        estado['actualizado'] = ahora
+
+        permitido = estado['fichas'] >= 1
+        if permitido:
+            estado['fichas'] -= 1
+
+        faltan = self.max_requests - estado['fichas']
+        return Decision(
+            permitido=permitido,
+            limite=self.max_requests,
+            restante=int(estado['fichas']),
+            reinicio=ahora + faltan / tasa,
+            retry_after=0 if permitido else (1 - estado['fichas']) / tasa,
+            usados=int(faltan)
+        )
+
+
+class RegistroDeslizante(Limitador):
+    """Registro exacto de las marcas de tiempo dentro de la ventana (máximo max_requests por clave)"""
+
+    def _nuevo_estado(self, ahora):
+        return {'marcas': deque(), 'ultimo_uso': ahora}
+
+    def _decidir(self, estado, ahora):
+        marcas = estado['marcas']
+        while marcas and ahora - marcas[0] >= self.time_window:
+            marcas.popleft()
+
+        permitido = len(marcas) < self.max_requests
+        if permitido:
+            marcas.append(ahora)
+
+        inicio = marcas[0] if marcas else ahora
+        return Decision(
+            permitido=permitido,
+            limite=self.max_requests,
+            restante=self.max_requests - len(marcas),
+            reinicio=inicio + self.time_window,
+            retry_after=0 if permitido else inicio + self.time_window - ahora,
+            usados=len(marcas) + (0 if permitido else 1)
+        )
+
+
+class ContadorDeslizante(Limitador):
+    """
+    Aproximación de ventana deslizante con dos contadores
+
+    Pondera el conteo de la ventana anterior por la fracción que aún se
+    solapa, lo que evita las ráfagas del doble en el borde de la ventana.
+    """
+
+    # La ventana anterior sigue pesando hasta dos ventanas después
+    factor_expiracion = 2
+
+    def _nuevo_estado(self, ahora):
+        return {
+            'inicio': ahora - (ahora % self.time_window),
+            'actual': 0,
+            'anterior': 0,
+            'ultimo_uso': ahora
+        }
+
+    def _estimar(self, estado, ahora):
+        inicio_ventana = ahora - (ahora % self.time_window)
+        if inicio_ventana != estado['inicio']:
+            salto = inicio_ventana - estado['inicio']
+            estado['anterior'] = estado['actual'] if salto <= self.time_window else 0
+            estado['actual'] = 0
+            estado['inicio'] = inicio_ventana
+
+        solapado = 1 - (ahora - inicio_ventana) / self.time_window
+        return estado['anterior'] * solapado + estado['actual']
+
+    def _decidir(self, estado, ahora):
+        estimado = self._estimar(estado, ahora)
+        permitido = estimado + 1 <= self.max_requests
+        if permitido:
+            estado['actual'] += 1
+            estimado += 1
+
+        fin_ventana = estado['inicio'] + self.time_window
+        return Decision(
+            permitido=permitido,
+            limite=self.max_requests,
+            restante=max(0, int(self.max_requests - estimado)),
+            reinicio=fin_ventana,
+            retry_after=0 if permitido else fin_ventana - ahora,
+            usados=int(estimado) + (0 if permitido else 1)
+        )
+
+
+ALGORITMOS = {
+    'cubo_fichas': CuboFichas,
+    'registro_deslizante': RegistroDeslizante,
+    'contador_deslizante': ContadorDeslizante,
+}
+
+
+ALMACENES = ('memoria', 'compartido')
+
+
+def crear_limitador(algoritmo, max_requests, time_window, max_claves=10000, almacen='memoria'):
+    """Instanciar el limitador por nombre de algoritmo y de almacén"""
+    if algoritmo not in ALGORITMOS:
+        raise ValueError(f"Algoritmo de rate limiting desconocido: {algoritmo}. "
+                         f"Usar: {', '.join(ALGORITMOS)}")
+    if almacen not in ALMACENES:
+        raise ValueError(f"Almacén de rate limiting desconocido: {almacen}. "
+                         f"Usar: {', '.join(ALMACENES)}")
+
+    if almacen == 'compartido':
+        from limitador_compartido import LimitadorCompartido
+        return LimitadorCompartido(algoritmo, max_requests, time_window)
+    return ALGORITMOS[algoritmo](max_requests, time_window, max_claves=max_claves)
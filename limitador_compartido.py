@@ -0,0 +1,190 @@
+"""
+Almacén de rate limiting compartido entre procesos
+Segmento mmap en /dev/shm (o el directorio temporal) con una tabla hash de
+tamaño fijo. Cada grupo de ranuras se protege con un bloqueo de rango
+fcntl, así que todos los workers de gunicorn del mismo host ven los mismos
+contadores sin depender de un servicio externo.
+
+El grupo de una clave sale de un hash con clave secreta propia del
+segmento: quien elige los X-User-ID no puede fabricar claves que caigan en
+el grupo de otro usuario para expulsarlo.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from limitador import ALGORITMOS, AlmacenLimites
+
+# Cabecera: firma + versión del formato, seguida de la clave secreta del hash
+FIRMA = b'MFXRL002'
+TAM_SECRETO = 16
+TAM_CABECERA = 64
+
+# Ranura: hash de la clave, instante de expiración y tres campos del algoritmo
+FORMATO_RANURA = struct.Struct('<Q4d')
+# Grupos grandes: que uno se llene de claves vigentes exige llenar casi toda la tabla
+RANURAS_POR_GRUPO = 32
+TAM_GRUPO = FORMATO_RANURA.size * RANURAS_POR_GRUPO
+NUM_GRUPOS = 2048
+
+# Campos de estado que cada algoritmo guarda en la ranura
+CAMPOS = {
+    'cubo_fichas': ('fichas', 'actualizado'),
+    'contador_deslizante': ('inicio', 'actual', 'anterior'),
+}
+
+RUTA_POR_DEFECTO = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'mingafix-rate-limit'
+)
+
+_segmentos = {}
+_segmentos_lock = threading.Lock()
+
+
+class Segmento:
+    """Archivo mapeado en memoria compartido por todos los limitadores del proceso"""
+
+    def __init__(self, ruta, num_grupos):
+        self.ruta = ruta
+        self.num_grupos = num_grupos
+        tamano = TAM_CABECERA + num_grupos * TAM_GRUPO
+
+        self.fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, TAM_CABECERA, 0)
+        try:
+            if os.fstat(self.fd).st_size != tamano:
+                os.ftruncate(self.fd, tamano)
+            self.memoria = mmap.mmap(self.fd, tamano, mmap.MAP_SHARED)
+            if self.memoria[:len(FIRMA)] != FIRMA:
+                # Segmento nuevo o de otro formato: empezar vacío con un secreto nuevo
+                self.memoria[:] = b'\x00' * tamano
+                self.memoria[len(FIRMA):len(FIRMA) + TAM_SECRETO] = os.urandom(TAM_SECRETO)
+                self.memoria[:len(FIRMA)] = FIRMA
+            self.secreto = bytes(self.memoria[len(FIRMA):len(FIRMA) + TAM_SECRETO])
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, TAM_CABECERA, 0)
+
+        # Los bloqueos fcntl son por proceso: los hilos necesitan además uno propio
+        self._locks_hilos = [threading.Lock() for _ in range(64)]
+
+    def bloquear(self, grupo):
+        lock_hilo = self._locks_hilos[grupo % len(self._locks_hilos)]
+        lock_hilo.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, TAM_GRUPO, self.offset(grupo))
+        except Exception:
+            lock_hilo.release()
+            raise
+
+    def desbloquear(self, grupo):
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, TAM_GRUPO, self.offset(grupo))
+        finally:
+            self._locks_hilos[grupo % len(self._locks_hilos)].release()
+
+    def offset(self, grupo):
+        return TAM_CABECERA + grupo * TAM_GRUPO
+
+    def hash_clave(self, clave):
+        """Hash con el secreto del segmento, igual en todos los procesos que lo abren"""
+        valor = int.from_bytes(
+            hashlib.blake2b(clave.encode('utf-8'), digest_size=8, key=self.secreto).digest(),
+            'little'
+        )
+        return valor or 1  # 0 marca ranura vacía
+
+
+def obtener_segmento(ruta=None, num_grupos=NUM_GRUPOS):
+    """Segmento compartido para `ruta`, creado una sola vez por proceso"""
+    ruta = ruta or os.getenv('RATE_LIMIT_RUTA_COMPARTIDA', RUTA_POR_DEFECTO)
+    with _segmentos_lock:
+        if ruta not in _segmentos:
+            _segmentos[ruta] = Segmento(ruta, num_grupos)
+        return _segmentos[ruta]
+
+
+class LimitadorCompartido(AlmacenLimites):
+    """
+    Almacén de límites en memoria compartida
+
+    Cada clave cae en un grupo fijo de RANURAS_POR_GRUPO ranuras y ocupa una
+    libre o caducada. Si el grupo está lleno de claves vigentes se reutiliza
+    la que caduca antes, que es la usada hace más tiempo: la misma política
+    que el almacén en memoria (ver AlmacenLimites). La memoria es fija y cada
+    petición toca un solo grupo bajo bloqueo.
+    """
+
+    def __init__(self, algoritmo, max_requests, time_window, segmento=None):
+        if algoritmo not in CAMPOS:
+            raise ValueError(f"El algoritmo {algoritmo} no admite almacén compartido. "
+                             f"Usar: {', '.join(CAMPOS)}")
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.segmento = segmento or obtener_segmento()
+        self._campos = CAMPOS[algoritmo]
+        # Se reutiliza la lógica del algoritmo en memoria sobre un dict temporal
+        self._algoritmo = ALGORITMOS[algoritmo](max_requests, time_window)
+        self._ttl = time_window * self._algoritmo.factor_expiracion
+        # Limitadores con distinta configuración no deben compartir contadores
+        self._prefijo = f'{algoritmo}:{max_requests}:{time_window}:'
+
+    def consumir(self, clave, ahora=None):
+        ahora = ahora if ahora is not None else time.time()
+        hash_clave = self.segmento.hash_clave(self._prefijo + clave)
+        grupo = hash_clave % self.segmento.num_grupos
+        base = self.segmento.offset(grupo)
+        memoria = self.segmento.memoria
+
+        self.segmento.bloquear(grupo)
+        try:
+            ranura = self._buscar_ranura(memoria, base, hash_clave, ahora)
+            offset = base + ranura * FORMATO_RANURA.size
+            h, expira, *valores = FORMATO_RANURA.unpack_from(memoria, offset)
+
+            if h == hash_clave and expira >= ahora:
+                estado = dict(zip(self._campos, valores))
+            else:
+                estado = self._algoritmo._nuevo_estado(ahora)
+
+            decision = self._algoritmo._decidir(estado, ahora)
+
+            valores = [float(estado[campo]) for campo in self._campos]
+            valores += [0.0] * (3 - len(valores))
+            FORMATO_RANURA.pack_into(memoria, offset, hash_clave, ahora + self._ttl, *valores)
+            return decision
+        finally:
+            self.segmento.desbloquear(grupo)
+
+    def _buscar_ranura(self, memoria, base, hash_clave, ahora):
+        """Ranura de la clave, o la primera libre/caducada, o la que caduque antes"""
+        libre = None
+        victima, expira_victima = 0, float('inf')
+        for i in range(RANURAS_POR_GRUPO):
+            h, expira = struct.unpack_from('<Qd', memoria, base + i * FORMATO_RANURA.size)
+            if h == hash_clave:
+                return i
+            if libre is None and (h == 0 or expira < ahora):
+                libre = i
+            if expira < expira_victima:
+                victima, expira_victima = i, expira
+        return libre if libre is not None else victima
+
+    def tamano(self):
+        """Número de ranuras vigentes en todo el segmento (todas las configuraciones)"""
+        ahora = time.time()
+        memoria = self.segmento.memoria
+        vigentes = 0
+        for grupo in range(self.segmento.num_grupos):
+            base = self.segmento.offset(grupo)
+            for i in range(RANURAS_POR_GRUPO):
+                h, expira = struct.unpack_from('<Qd', memoria, base + i * FORMATO_RANURA.size)
+                if h and expira >= ahora:
+                    vigentes += 1
+        return vigentes
@@ -0,0 +1,123 @@
+"""
+Paginación por cursor (keyset) sobre (created_at, id)
+El cursor es opaco para el cliente: codifica la posición de la última fila
+de la página. La página siguiente se pide con `created_at < c OR
+(created_at = c AND id < i)`, que usa el índice y cuesta lo mismo en
+cualquier profundidad (a diferencia de OFFSET).
+
+leer_paginado() y leer_paginado_flujo() recorren por range() las cargas
+internas (índices en memoria) para que el límite max-rows de PostgREST no
+las corte.
+"""
+
+import base64
+import json
+import os
+
+PAGINA_POR_DEFECTO = 50
+MAX_PAGINA = int(os.getenv('REPORTES_MAX_PAGINA', 100))
+# Filas por petición de leer_paginado (no más que max-rows de PostgREST)
+TAM_PAGINA_CARGA = 1000
+
+
+def limitar_pagina(limit):
+    """Tamaño de página dentro de [1, MAX_PAGINA]"""
+    if limit is None:
+        return PAGINA_POR_DEFECTO
+    return max(1, min(int(limit), MAX_PAGINA))
+
+
+def leer_paginado(construir_query, tam_pagina=TAM_PAGINA_CARGA):
+    """
+    Recorrer una consulta por páginas usando range()
+
+    Args:
+        construir_query: función que devuelve un query builder nuevo y ordenado
+        tam_pagina: filas por petición
+
+    Yields:
+        dict: cada fila devuelta por Supabase
+    """
+    inicio = 0
+    while True:
+        response = construir_query()\
+            .range(inicio, inicio + tam_pagina - 1)\
+            .execute()
+        filas = response.data or []
+        yield from filas
+        if len(filas) < tam_pagina:
+            break
+        inicio += tam_pagina
+
+
+def leer_paginado_flujo(consulta, tam_pagina=TAM_PAGINA_CARGA):
+    """
+    Como leer_paginado(), dentro de un flujo (ver flujos.py)
+
+    Args:
+        consulta: función cliente -> query builder nuevo y ordenado
+        tam_pagina: filas por petición
+
+    Returns:
+        list: todas las filas
+    """
+    filas = []
+    inicio = 0
+    while True:
+        response = yield lambda cliente: consulta(cliente)\
+            .range(inicio, inicio + tam_pagina - 1)
+        pagina = response.data or []
+        filas.extend(pagina)
+        if len(pagina) < tam_pagina:
+            return filas
+        inicio += tam_pagina
+
+
+def codificar_cursor(fila):
+    """Cursor opaco que apunta a `fila`"""
+    posicion = json.dumps([fila['created_at'], fila['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(posicion.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Posición (created_at, id) de un cursor
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        created_at, reporte_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(created_at, str) or not isinstance(reporte_id, (int, str)):
+        raise ValueError('Cursor inválido')
+    return created_at, reporte_id
+
+
+def _literal(valor):
+    """Valor entre comillas para filtros or() de PostgREST"""
+    texto = str(valor).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{texto}"'
+
+
+def aplicar_keyset(query_builder, posicion):
+    """Filtrar las filas posteriores a `posicion` en orden (created_at desc, id desc)"""
+    created_at, reporte_id = posicion
+    c = _literal(created_at)
+    i = _literal(reporte_id)
+    return query_builder.or_(f'created_at.lt.{c},and(created_at.eq.{c},id.lt.{i})')
+
+
+def cortar_pagina(filas, limit):
+    """
+    Separar la página de la fila extra pedida para saber si hay más
+
+    Returns:
+        tuple: (filas de la página, cursor siguiente o None)
+    """
+    if len(filas) <= limit:
+        return filas, None
+    pagina = filas[:limit]
+    return pagina, codificar_cursor(pagina[-1])
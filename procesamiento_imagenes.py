@@ -0,0 +1,65 @@
+"""
+Normalización de imágenes antes de guardarlas
+Aplica la orientación EXIF, elimina los metadatos (incluida la ubicación GPS),
+limita las dimensiones, recomprime en JPEG y genera una miniatura.
+
+Pillow es opcional: si no está instalado las fotos se guardan tal cual.
+"""
+
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+CONTENT_TYPE = 'image/jpeg'
+EXTENSION = 'jpg'
+
+
+def disponible():
+    """True si Pillow está instalado"""
+    return Image is not None
+
+
+def _codificar_jpeg(imagen, calidad):
+    salida = io.BytesIO()
+    # Sin el parámetro exif, Pillow no copia metadatos a la nueva imagen
+    imagen.save(salida, format='JPEG', quality=calidad, optimize=True, progressive=True)
+    return salida.getvalue()
+
+
+def normalizar_imagen(contenido, max_lado=1600, calidad=80, lado_miniatura=320):
+    """
+    Procesar una foto subida por el cliente
+
+    Args:
+        contenido: bytes de la imagen original
+        max_lado: dimensión máxima (ancho o alto) de la imagen principal
+        calidad: calidad JPEG de salida
+        lado_miniatura: dimensión máxima de la miniatura
+
+    Returns:
+        tuple | None: (bytes_principal, bytes_miniatura) en JPEG, o None si
+        Pillow no está disponible o el contenido no es una imagen válida
+    """
+    if not disponible():
+        return None
+
+    try:
+        with Image.open(io.BytesIO(contenido)) as original:
+            imagen = ImageOps.exif_transpose(original)
+            if imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+
+            # reducing_gap acelera la reducción de fotos de cámara muy grandes
+            imagen.thumbnail((max_lado, max_lado), Image.LANCZOS, reducing_gap=3.0)
+            principal = _codificar_jpeg(imagen, calidad)
+
+            miniatura = imagen.copy()
+            miniatura.thumbnail((lado_miniatura, lado_miniatura), Image.LANCZOS, reducing_gap=2.0)
+            return principal, _codificar_jpeg(miniatura, calidad)
+    except Exception as e:
+        print(f"⚠️ No se pudo normalizar la imagen: {str(e)}")
+        return None
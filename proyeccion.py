@@ -0,0 +1,75 @@
+"""
+Proyección de columnas según la selección GraphQL
+Traduce los campos pedidos en la consulta a la lista de columnas del
+select() de Supabase, para no traer `ubicacion` ni otras columnas que
+nadie pidió.
+"""
+
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+# Campos del tipo `Reporte` que son columnas de la tabla `reportes`
+COLUMNAS_REPORTE = (
+    'id', 'categoria', 'lat', 'lng', 'descripcion', 'estado', 'prioridad',
+    'usuario_id', 'foto_url', 'foto_estado', 'foto_miniatura_url',
+    'created_at', 'updated_at', 'version', 'votos_positivos', 'votos_negativos'
+)
+
+# Columnas que los resolvers necesitan aunque no se pidan (claves de cargadores, orden)
+DEPENDENCIAS_REPORTE = ('id',)
+
+# En las conexiones paginadas el cursor se construye con (created_at, id)
+DEPENDENCIAS_CURSOR = ('id', 'created_at')
+
+
+def campos_de_seleccion(selection_set, fragments):
+    """FieldNodes de un selection set, expandiendo fragmentos"""
+    if selection_set is None:
+        return
+    for seleccion in selection_set.selections:
+        if isinstance(seleccion, FieldNode):
+            yield seleccion
+        elif isinstance(seleccion, InlineFragmentNode):
+            yield from campos_de_seleccion(seleccion.selection_set, fragments)
+        elif isinstance(seleccion, FragmentSpreadNode):
+            fragmento = fragments.get(seleccion.name.value)
+            if fragmento:
+                yield from campos_de_seleccion(fragmento.selection_set, fragments)
+
+
+def subcampos(field_nodes, fragments, *ruta):
+    """
+    FieldNodes anidados siguiendo `ruta` (p. ej. 'edges', 'node' en una conexión)
+    """
+    nodos = list(field_nodes)
+    for nombre in ruta:
+        nodos = [
+            campo
+            for nodo in nodos
+            for campo in campos_de_seleccion(nodo.selection_set, fragments)
+            if campo.name.value == nombre
+        ]
+    return nodos
+
+
+def columnas_seleccionadas(field_nodes, fragments, columnas=COLUMNAS_REPORTE,
+                           dependencias=DEPENDENCIAS_REPORTE):
+    """
+    Columnas necesarias para responder los subcampos pedidos
+
+    Args:
+        field_nodes: nodos del campo que devuelve el objeto (p. ej. info.field_nodes)
+        fragments: info.fragments
+        columnas: campos del tipo que son columnas de la tabla
+        dependencias: columnas que se incluyen siempre
+
+    Returns:
+        str: lista separada por comas para select()
+    """
+    pedidas = set(dependencias)
+    for nodo in field_nodes:
+        for campo in campos_de_seleccion(nodo.selection_set, fragments):
+            if campo.name.value in columnas:
+                pedidas.add(campo.name.value)
+
+    # Orden estable: misma selección, misma consulta
+    return ', '.join(columna for columna in columnas if columna in pedidas)
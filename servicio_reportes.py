@@ -0,0 +1,1315 @@
+"""
+Lógica de la API de reportes compartida por app.py (Flask) y app_async.py (ASGI)
+ServicioReportes reúne los componentes en memoria de un worker (índices,
+cachés, estadísticas, subida de fotos) y las operaciones de la API. Las
+operaciones son flujos (ver flujos.py): ceden sus consultas a Supabase en
+lugar de ejecutarlas, así que cada app solo lee la petición, ejecuta el
+flujo con su cliente y convierte la Respuesta en la de su framework.
+"""
+
+import os
+import math
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from ariadne import QueryType, MutationType, make_executable_schema
+from graphql import GraphQLError
+
+from agrupador_inserciones import AgrupadorInserciones
+from cargadores import argumentos_hermanos, campos_hermanos, obtener_cargador
+from conexiones import estadisticas_conexiones
+from esquema import type_defs
+from estadisticas import (EstadisticasIncrementales, consulta_estadisticas_agregadas,
+                          leer_estadisticas_agregadas)
+from etags import (calcular_etag, etag_coincide, respuesta_no_modificada,
+                   CAMPOS_VERSION_REPORTE, CAMPOS_REPORTE_CERCANO)
+from exportacion import FORMATOS
+from flujos import Bloqueante
+from geo import haversine_metros, margen_grados
+from indice_duplicados import IndiceDuplicados
+from indice_espacial import IndiceEspacial
+from instrumentacion import metricas as registro_metricas, exportar_valores, MIDDLEWARE_GRAPHQL
+from limitador import crear_limitador
+from paginacion import (limitar_pagina, codificar_cursor, decodificar_cursor, aplicar_keyset,
+                        cortar_pagina, leer_paginado_flujo, MAX_PAGINA)
+from procesamiento_imagenes import normalizar_imagen
+from proyeccion import columnas_seleccionadas, subcampos, COLUMNAS_REPORTE, DEPENDENCIAS_CURSOR
+from cache_respuestas import CacheConsultas
+from subida_fotos import SubidaFotos, leer_con_hash
+from usuarios_cache import CacheUsuarios
+from validacion import validar_entrada_reporte
+
+# 'incremental' (contadores en memoria) o 'agregado' (RPC estadisticas_reportes)
+ESTADISTICAS_MODO = os.getenv('ESTADISTICAS_MODO', 'incremental')
+
+# Segundos en los que un envío similar del mismo usuario cuenta como duplicado
+DUPLICADOS_VENTANA = int(os.getenv('DUPLICADOS_VENTANA_SEGUNDOS', 300))
+
+# Con un solo worker el índice ve todos los envíos y puede sustituir la consulta.
+# Desactivado por defecto porque cada worker solo ve sus propias escrituras:
+# con varios workers (gunicorn -w N o réplicas) un duplicado creado en otro no
+# se detectaría. Sin él, un acierto del índice ya evita la consulta y solo
+# los envíos que no son duplicados la pagan
+DUPLICADOS_SOLO_INDICE = os.getenv('DUPLICADOS_SOLO_INDICE', '0') == '1'
+
+# Listados por filtro con TTL corto (CACHE_REPORTES_TTL=0 la desactiva)
+CACHE_REPORTES_TTL = float(os.getenv('CACHE_REPORTES_TTL', 5))
+
+# Inserciones individuales agrupadas en lotes (AGRUPAR_INSERCIONES_MS=0 las desactiva)
+AGRUPAR_INSERCIONES_MS = float(os.getenv('AGRUPAR_INSERCIONES_MS', 0))
+
+# Máximo de reportes por petición en /reportes/lote y crearReportes
+LOTE_MAX_REPORTES = int(os.getenv('LOTE_MAX_REPORTES', 100))
+
+# Filas por consulta al recorrer la tabla en /reportes/exportar
+EXPORTACION_TAM_PAGINA = int(os.getenv('EXPORTACION_TAM_PAGINA', 1000))
+
+# Algoritmo por defecto: cubo_fichas, registro_deslizante o contador_deslizante
+RATE_LIMIT_ALGORITMO = os.getenv('RATE_LIMIT_ALGORITMO', 'contador_deslizante')
+RATE_LIMIT_MAX_CLAVES = int(os.getenv('RATE_LIMIT_MAX_CLAVES', 10000))
+# 'memoria' (por worker) o 'compartido' (mismo contador para todos los workers del host)
+RATE_LIMIT_ALMACEN = os.getenv('RATE_LIMIT_ALMACEN', 'memoria')
+# Peticiones por ventana de POST /reportes y POST /reportes/lote
+RATE_LIMIT_VENTANA = int(os.getenv('RATE_LIMIT_VENTANA_SEGUNDOS', 60))
+RATE_LIMIT_REPORTES = int(os.getenv('RATE_LIMIT_REPORTES', 30))
+RATE_LIMIT_LOTE = int(os.getenv('RATE_LIMIT_LOTE', 10))
+
+# SQLSTATE de un ON CONFLICT sin restricción única que lo respalde
+SIN_RESTRICCION_UNICA = '42P10'
+
+ESTADOS_VALIDOS = ['pendiente', 'en_proceso', 'resuelto', 'rechazado']
+
+CONEXION_VACIA = {'edges': [], 'pageInfo': {'hasNextPage': False, 'endCursor': None}}
+
+ESTADISTICAS_VACIAS = {
+    'total': 0,
+    'pendientes': 0,
+    'en_proceso': 0,
+    'resueltos': 0,
+    'rechazados': 0,
+    'por_categoria': [],
+    'por_usuario': []
+}
+
+TIPO_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Respuesta REST independiente del framework; cuerpo None = sin cuerpo (304)
+Respuesta = namedtuple('Respuesta', 'cuerpo estado cabeceras', defaults=(200, None))
+
+# Parámetros ya validados de /reportes/exportar
+Exportacion = namedtuple('Exportacion', 'filtros formato gzip cabeceras')
+
+
+def describir_ventana(segundos):
+    """'por minuto', 'por hora', 'cada 90 segundos'..."""
+    nombres = {1: 'por segundo', 60: 'por minuto', 3600: 'por hora', 86400: 'por día'}
+    return nombres.get(segundos, f'cada {segundos} segundos')
+
+
+def describir_duracion(segundos):
+    """'5 minutos', '1 hora', '90 segundos'..."""
+    for unidad, singular, plural in ((3600, 'hora', 'horas'), (60, 'minuto', 'minutos')):
+        if segundos >= unidad and segundos % unidad == 0:
+            cantidad = segundos // unidad
+            return f'{cantidad} {singular if cantidad == 1 else plural}'
+    return f'{segundos} segundo' + ('' if segundos == 1 else 's')
+
+
+def informacion_api(modo=None):
+    """Cuerpo de GET /"""
+    return {
+        'message': 'MINGAFIX API v3.0 - Supabase + GraphQL + Rate Limiting' + (f' ({modo})' if modo else ''),
+        'status': 'online',
+        'database': 'PostgreSQL + PostGIS (Supabase)',
+        'features': {
+            'rate_limiting': f'{RATE_LIMIT_REPORTES} peticiones {describir_ventana(RATE_LIMIT_VENTANA)} por usuario',
+            'duplicate_detection': f'{describir_duracion(DUPLICADOS_VENTANA)} de ventana',
+            'concurrency_control': 'Control de versiones optimista',
+            'geospatial': 'Búsquedas por proximidad con PostGIS'
+        },
+        'endpoints': {
+            'graphql': '/graphql',
+            'rest': {
+                'crear_reporte': 'POST /reportes',
+                'crear_reportes_lote': 'POST /reportes/lote',
+                'obtener_reportes': 'GET /reportes',
+                'exportar_reportes': 'GET /reportes/exportar',
+                'reporte_test': 'POST /reportes/test',
+                'metricas': 'GET /metricas',
+                'metricas_prometheus': 'GET /metrics'
+            }
+        }
+    }
+
+
+def exportar_prometheus(componentes):
+    """Cuerpo de GET /metrics: histogramas y métricas internas de `componentes`"""
+    return registro_metricas.exportar() + ''.join(
+        exportar_valores(f'mingafix_{nombre}', valores)
+        for nombre, valores in componentes.items()
+    )
+
+
+def opciones_graphql(cache, data):
+    """
+    Consulta y opciones de ariadne para el cuerpo de POST /graphql
+
+    Un cuerpo que no es un objeto JSON (p. ej. JSON mal formado, leído como
+    None) se pasa tal cual: ariadne lo rechaza y la app responde 400.
+
+    Returns:
+        tuple: (data, kwargs para graphql/graphql_sync, respuesta de error o None)
+    """
+    opciones = {'middleware': MIDDLEWARE_GRAPHQL}
+    if cache is None:
+        return data, opciones, None
+    data, error = cache.resolver_persistida(data)
+    opciones.update(query_parser=cache.parsear, query_validator=cache.validar)
+    return data, opciones, error
+
+
+def crear_agrupador_inserciones(cliente):
+    """
+    AgrupadorInserciones con la configuración del entorno, o None si está desactivado
+
+    Inserta con el cliente síncrono en sus propios hilos, también en ASGI:
+    allí cada inserción espera su lote en un hilo de asyncio.to_thread.
+    """
+    if AGRUPAR_INSERCIONES_MS <= 0:
+        return None
+    return AgrupadorInserciones(
+        lambda filas: cliente.table('reportes').insert(filas, default_to_null=False).execute().data,
+        ventana_ms=AGRUPAR_INSERCIONES_MS,
+        max_lote=int(os.getenv('AGRUPAR_INSERCIONES_MAX', 50)),
+        hilos=int(os.getenv('AGRUPAR_INSERCIONES_HILOS', 2))
+    )
+
+
+def usuario_del_cuerpo(data):
+    """usuario_id (o userId) de un cuerpo JSON o de formulario"""
+    if not hasattr(data, 'get'):
+        return None
+    return data.get('usuario_id') or data.get('userId')
+
+
+class LimitePorUsuario:
+    """Límite de peticiones por usuario y endpoint de un decorador rate_limit"""
+
+    def __init__(self, max_requests=10, time_window=60, algoritmo=None):
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.limitador = crear_limitador(
+            algoritmo or RATE_LIMIT_ALGORITMO,
+            max_requests,
+            time_window,
+            max_claves=RATE_LIMIT_MAX_CLAVES,
+            almacen=RATE_LIMIT_ALMACEN
+        )
+
+    def comprobar(self, user_id, endpoint):
+        """
+        Consumir una petición de `user_id` en `endpoint`
+
+        Returns:
+            tuple: (decisión del limitador, Respuesta de error o None)
+        """
+        if not user_id:
+            return None, Respuesta({
+                'error': 'Se requiere usuario_id o userId en el body, o X-User-ID en headers',
+                'code': 'USER_ID_REQUIRED'
+            }, 401)
+
+        decision = self.limitador.consumir(f"{user_id}:{endpoint}")
+        if not decision.permitido:
+            return decision, Respuesta({
+                'error': f'Demasiadas peticiones. Máximo {self.max_requests} '
+                         f'{describir_ventana(self.time_window)}',
+                'code': 'RATE_LIMIT_EXCEEDED',
+                'retry_after': int(math.ceil(decision.retry_after)),
+                'requests_made': decision.usados
+            }, 429)
+        return decision, None
+
+    @staticmethod
+    def cabeceras(decision):
+        return {
+            'X-RateLimit-Limit': str(decision.limite),
+            'X-RateLimit-Remaining': str(decision.restante),
+            'X-RateLimit-Reset': str(int(decision.reinicio))
+        }
+
+
+class ServicioReportes:
+    """
+    Componentes en memoria y operaciones de la API de un worker
+
+    Los métodos que devuelven un generador son flujos: se ejecutan con
+    flujos.ejecutar() o flujos.ejecutar_async().
+
+    Args:
+        cliente: cliente síncrono de Supabase para las tareas en segundo
+            plano (reconciliación, índice espacial, subida de fotos)
+        bucket: bucket de Storage de las fotos
+        agrupador_inserciones: AgrupadorInserciones opcional para las
+            inserciones individuales
+    """
+
+    def __init__(self, cliente, bucket, agrupador_inserciones=None):
+        self.estadisticas_reportes = EstadisticasIncrementales(
+            cliente,
+            intervalo_reconciliacion=int(os.getenv('ESTADISTICAS_RECONCILIAR_SEGUNDOS', 300))
+        )
+
+        # Índice espacial opcional para reportesCercanos y /reportes/cercanos
+        self.indice_espacial = IndiceEspacial(
+            cliente,
+            intervalo_refresco=int(os.getenv('INDICE_ESPACIAL_REFRESCO_SEGUNDOS', 300))
+        ) if os.getenv('INDICE_ESPACIAL', '0') == '1' else None
+
+        # Usuarios que ya existen en la tabla `usuarios` (evita consultarla en cada reporte)
+        self.cache_usuarios = CacheUsuarios(
+            max_usuarios=int(os.getenv('CACHE_USUARIOS_MAX', 50000)),
+            capacidad_bloom=int(os.getenv('CACHE_USUARIOS_BLOOM', 0))
+        )
+        # Pasa a False si la base no tiene la restricción única del upsert
+        # (sql/usuarios_usuario_id_unico.sql): se usa SELECT + INSERT
+        self.upsert_usuarios = True
+
+        # Envíos recientes para detectar duplicados sin consultar Supabase
+        self.indice_duplicados = IndiceDuplicados(
+            time_window=DUPLICADOS_VENTANA,
+            radio_metros=float(os.getenv('DUPLICADOS_RADIO_METROS', 111))
+        )
+        self._cargando_duplicados = False
+
+        self.cache_reportes = CacheConsultas(
+            ttl=CACHE_REPORTES_TTL,
+            max_entradas=int(os.getenv('CACHE_REPORTES_MAX', 1000))
+        ) if CACHE_REPORTES_TTL > 0 else None
+
+        self.agrupador_inserciones = agrupador_inserciones
+        if agrupador_inserciones and not agrupador_inserciones.al_abandonar:
+            # Filas que se insertan después de que su petición se rindiera
+            agrupador_inserciones.al_abandonar = self.notificar_reporte_creado
+
+        # Subidas de fotos en su propio pool de hilos, fuera de la petición
+        self.subida_fotos = SubidaFotos(
+            cliente,
+            bucket,
+            max_workers=int(os.getenv('SUBIDA_FOTOS_WORKERS', 4)),
+            max_cola=int(os.getenv('SUBIDA_FOTOS_MAX_COLA', 100)),
+            reintentos=int(os.getenv('SUBIDA_FOTOS_REINTENTOS', 3)),
+            al_completar=self.notificar_reporte_actualizado,
+            normalizar=(lambda contenido: normalizar_imagen(
+                contenido,
+                max_lado=int(os.getenv('IMAGENES_MAX_LADO', 1600)),
+                calidad=int(os.getenv('IMAGENES_CALIDAD', 80)),
+                lado_miniatura=int(os.getenv('IMAGENES_LADO_MINIATURA', 320))
+            )) if os.getenv('IMAGENES_NORMALIZAR', '1') == '1' else None
+        )
+
+    # ----------------------------------------
+    # Índices en memoria
+    # ----------------------------------------
+
+    def notificar_reporte_creado(self, reporte):
+        """Propagar un reporte recién insertado a los índices en memoria"""
+        self.estadisticas_reportes.registrar_creacion(reporte)
+        self.indice_duplicados.registrar(reporte)
+        if self.cache_reportes:
+            self.cache_reportes.invalidar(reporte)
+        if self.indice_espacial:
+            self.indice_espacial.registrar(reporte)
+
+    def notificar_reporte_actualizado(self, reporte, cambia_estado=False):
+        """Propagar un reporte actualizado a los índices en memoria"""
+        self.estadisticas_reportes.registrar_actualizacion(reporte, cambia_estado)
+        if self.indice_espacial:
+            self.indice_espacial.registrar(reporte)
+        if self.cache_reportes:
+            # El UPDATE solo devuelve la fila nueva: invalidar cualquier filtro de estado
+            self.cache_reportes.invalidar(reporte, ignorar=('estado',))
+
+    def metricas(self, **otras):
+        """Métricas internas de los componentes (más las que añade la app)"""
+        return {
+            'cache_usuarios': self.cache_usuarios.metricas(),
+            'subida_fotos': self.subida_fotos.metricas(),
+            'cache_reportes': self.cache_reportes.metricas() if self.cache_reportes else None,
+            'agrupador_inserciones': (self.agrupador_inserciones.metricas()
+                                      if self.agrupador_inserciones else None),
+            'conexiones': estadisticas_conexiones.metricas(),
+            **otras
+        }
+
+    # ----------------------------------------
+    # Fotos
+    # ----------------------------------------
+
+    def preparar_foto(self, archivo):
+        """
+        Leer la foto recibida
+
+        Args:
+            archivo: (nombre original, stream, content_type) o None
+
+        Returns:
+            tuple: (nombre_archivo, bytes, content_type) o None
+        """
+        if not archivo or not archivo[0] or '.' not in archivo[0]:
+            return None
+
+        nombre, stream, content_type = archivo
+        extension = nombre.rsplit('.', 1)[1].lower()
+        # Nombre por contenido: reenvíos de la misma foto reutilizan el objeto guardado
+        contenido, sha256 = yield Bloqueante(leer_con_hash, stream)
+        return f"{sha256}.{extension}", contenido, content_type
+
+    def programar_subida_foto(self, reporte_id, foto):
+        """Subir la foto en segundo plano o, si la cola está llena, en esta petición"""
+        nombre_archivo, contenido, content_type = foto
+        if not self.subida_fotos.encolar(reporte_id, nombre_archivo, contenido, content_type):
+            yield Bloqueante(self.subida_fotos.procesar, reporte_id, nombre_archivo,
+                             contenido, content_type)
+
+    # ----------------------------------------
+    # Consultas y escrituras
+    # ----------------------------------------
+
+    def cargar_indice_duplicados(self):
+        """
+        Con DUPLICADOS_SOLO_INDICE, cargar una vez por worker los envíos de la última ventana
+
+        Así el índice cubre la ventana desde la primera petición del worker en
+        lugar de tras `time_window` segundos. Mientras una petición carga, las
+        demás consultan Supabase como siempre.
+        """
+        if not DUPLICADOS_SOLO_INDICE or self._cargando_duplicados \
+                or self.indice_duplicados.cubre_ventana():
+            return
+
+        self._cargando_duplicados = True
+        try:
+            ventana = self.indice_duplicados.time_window
+            desde = time.time() - ventana
+            cutoff_time = datetime.utcnow() - timedelta(seconds=ventana)
+
+            def consulta(cliente):
+                return cliente.table('reportes')\
+                    .select('id, usuario_id, categoria, lat, lng, created_at')\
+                    .gte('created_at', cutoff_time.isoformat())\
+                    .order('id')
+
+            # Por páginas: max-rows de PostgREST cortaría en silencio una sola consulta
+            # y el índice daría la ventana por cubierta sin tener todos los envíos
+            filas = yield from leer_paginado_flujo(consulta)
+            self.indice_duplicados.cargar(filas, desde)
+        except Exception as e:
+            print(f"Error en cargar_indice_duplicados: {str(e)}")
+        finally:
+            self._cargando_duplicados = False
+
+    def _solo_indice(self, time_window):
+        """True si el índice de duplicados basta para responder sin consultar Supabase"""
+        return DUPLICADOS_SOLO_INDICE and self.indice_duplicados.cubre_ventana() \
+            and time_window <= self.indice_duplicados.time_window
+
+    def verificar_reporte_duplicado(self, usuario_id, categoria, lat, lng, time_window=None):
+        """
+        Verificar si existe un reporte duplicado reciente: (es_duplicado, reporte previo)
+
+        Args:
+            time_window: segundos hacia atrás (por defecto, la ventana del índice)
+        """
+        time_window = time_window or self.indice_duplicados.time_window
+        # Primero el índice en memoria: un acierto no necesita ir a la base de datos
+        yield from self.cargar_indice_duplicados()
+        previo = self.indice_duplicados.buscar(usuario_id, categoria, lat, lng, ventana=time_window)
+        if previo:
+            return True, previo
+
+        if self._solo_indice(time_window):
+            return False, None
+
+        try:
+            cutoff_time = datetime.utcnow() - timedelta(seconds=time_window)
+            radio = self.indice_duplicados.radio_metros
+            dlat, dlng = margen_grados(lat, radio)
+
+            # Buscar reportes recientes del mismo usuario y categoría cerca del punto
+            response = yield lambda cliente: cliente.table('reportes')\
+                .select('id, usuario_id, categoria, lat, lng, created_at')\
+                .eq('usuario_id', usuario_id)\
+                .eq('categoria', categoria)\
+                .gte('created_at', cutoff_time.isoformat())\
+                .gte('lat', lat - dlat)\
+                .lte('lat', lat + dlat)\
+                .gte('lng', lng - dlng)\
+                .lte('lng', lng + dlng)\
+                .limit(10)
+
+            # Verificar si hay alguno dentro del radio en metros
+            for reporte in response.data or []:
+                distancia = haversine_metros(lat, lng, reporte.get('lat', 0), reporte.get('lng', 0))
+                if distancia <= radio:
+                    return True, reporte
+
+            return False, None
+
+        except Exception as e:
+            print(f"Error en verificar_reporte_duplicado: {str(e)}")
+            return False, None
+
+    def buscar_reportes_cercanos(self, lat, lng, radio):
+        """Reportes cercanos desde el índice en memoria o, si está frío, la RPC PostGIS"""
+        if self.indice_espacial:
+            resultados = self.indice_espacial.buscar(lat, lng, radio)
+            if resultados is not None:
+                return resultados
+
+        response = yield lambda cliente: cliente.rpc('buscar_reportes_cercanos', {
+            'p_lat': lat,
+            'p_lng': lng,
+            'p_radio_metros': radio
+        })
+        return response.data or []
+
+    def listar_reportes(self, columnas='*', limit=50, categoria=None, estado=None, usuario_id=None,
+                        despues_de=None):
+        """
+        Reportes más recientes que cumplen los filtros, pasando por la caché de listados
+
+        Orden estable (created_at desc, id desc); `despues_de` es la posición
+        (created_at, id) de un cursor y devuelve solo las filas posteriores.
+        """
+        def consulta(cliente):
+            query_builder = cliente.table('reportes').select(columnas)
+
+            if categoria:
+                query_builder = query_builder.eq('categoria', categoria)
+            if estado:
+                query_builder = query_builder.eq('estado', estado)
+            if usuario_id:
+                query_builder = query_builder.eq('usuario_id', usuario_id)
+            if despues_de:
+                query_builder = aplicar_keyset(query_builder, despues_de)
+
+            return query_builder\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)\
+                .limit(limit)
+
+        def consultar():
+            response = yield consulta
+            return response.data or []
+
+        if not self.cache_reportes:
+            return (yield from consultar())
+
+        return (yield from self.cache_reportes.obtener_flujo({
+            'categoria': categoria or None,
+            'estado': estado or None,
+            'usuario_id': usuario_id or None,
+            'limit': limit,
+            'columnas': columnas,
+            'despues_de': tuple(despues_de) if despues_de else None
+        }, consultar()))
+
+    def paginar_reportes(self, columnas='*', limit=None, cursor=None, **filtros):
+        """
+        Una página de reportes por cursor
+
+        Pide una fila de más para saber si existe página siguiente.
+
+        Returns:
+            tuple: (filas, cursor de la página siguiente o None)
+
+        Raises:
+            ValueError: si el cursor no es válido
+        """
+        limit = limitar_pagina(limit)
+        despues_de = decodificar_cursor(cursor) if cursor else None
+        filas = yield from self.listar_reportes(columnas=columnas, limit=limit + 1,
+                                                despues_de=despues_de, **filtros)
+        return cortar_pagina(filas, limit)
+
+    def asegurar_usuarios_existen(self, usuario_ids):
+        """Crear los usuarios que falten con un solo upsert (de una o varias filas)"""
+        nuevos = [u for u in dict.fromkeys(usuario_ids) if not self.cache_usuarios.contiene(u)]
+        if not nuevos:
+            return
+
+        try:
+            creados = None
+            if self.upsert_usuarios:
+                try:
+                    # Un solo upsert idempotente en lugar de SELECT + INSERT
+                    response = yield lambda cliente: cliente.table('usuarios')\
+                        .upsert([{'usuario_id': u} for u in nuevos], on_conflict='usuario_id',
+                                ignore_duplicates=True)
+                    creados = response.data or []
+                except Exception as e:
+                    if getattr(e, 'code', None) == SIN_RESTRICCION_UNICA:
+                        self.upsert_usuarios = False
+                        print("⚠️ usuarios.usuario_id sin restricción única "
+                              "(sql/usuarios_usuario_id_unico.sql): se usa SELECT + INSERT")
+                    else:
+                        print(f"⚠️ Error en el upsert de usuarios, se reintenta con SELECT + INSERT: {str(e)}")
+
+            if creados is None:
+                creados = yield from self.insertar_usuarios_faltantes(nuevos)
+
+            for usuario_id in nuevos:
+                self.cache_usuarios.agregar(usuario_id)
+            if creados:
+                print(f"✅ {len(creados)} usuarios creados automáticamente")
+        except Exception as e:
+            print(f"⚠️ Error al verificar/crear usuarios: {str(e)}")
+
+    def insertar_usuarios_faltantes(self, usuario_ids):
+        """SELECT de los usuarios que ya existen e INSERT de los demás; devuelve los creados"""
+        response = yield lambda cliente: cliente.table('usuarios')\
+            .select('usuario_id')\
+            .in_('usuario_id', usuario_ids)
+        existentes = {fila['usuario_id'] for fila in response.data or []}
+
+        faltan = [u for u in usuario_ids if u not in existentes]
+        if not faltan:
+            return []
+        response = yield lambda cliente: cliente.table('usuarios')\
+            .insert([{'usuario_id': u} for u in faltan])
+        return response.data or []
+
+    def insertar_reporte(self, reporte_data):
+        """Insertar un reporte (agrupado con otros si está activado); None si falla"""
+        if self.agrupador_inserciones:
+            return (yield Bloqueante(self.agrupador_inserciones.insertar, reporte_data))
+        response = yield lambda cliente: cliente.table('reportes').insert(reporte_data)
+        return response.data[0] if response.data else None
+
+    def buscar_duplicados_lote(self, filas, time_window=None):
+        """
+        Duplicados de varias filas con una sola consulta
+
+        Se comparan contra el índice en memoria, contra los reportes recientes
+        de esos usuarios y categorías en el recuadro que cubre el lote, y
+        contra las filas anteriores del mismo lote.
+
+        Args:
+            time_window: segundos hacia atrás (por defecto, la ventana del índice)
+
+        Returns:
+            list: por cada fila, el reporte previo que la duplica o None
+        """
+        time_window = time_window or self.indice_duplicados.time_window
+        yield from self.cargar_indice_duplicados()
+        previos = [
+            self.indice_duplicados.buscar(f['usuario_id'], f['categoria'], f['lat'], f['lng'],
+                                          ventana=time_window)
+            for f in filas
+        ]
+        pendientes = [f for f, previo in zip(filas, previos) if previo is None]
+        radio = self.indice_duplicados.radio_metros
+
+        # Índice temporal del lote: recientes de la base de datos + filas ya aceptadas
+        lote = IndiceDuplicados(time_window=time_window, radio_metros=radio)
+
+        if pendientes and not self._solo_indice(time_window):
+            try:
+                cutoff_time = datetime.utcnow() - timedelta(seconds=time_window)
+                lats = [f['lat'] for f in pendientes]
+                lngs = [f['lng'] for f in pendientes]
+                dlat, dlng = margen_grados(max(lats, key=abs), radio)
+
+                response = yield lambda cliente: cliente.table('reportes')\
+                    .select('id, usuario_id, categoria, lat, lng, created_at')\
+                    .in_('usuario_id', sorted({f['usuario_id'] for f in pendientes}))\
+                    .in_('categoria', sorted({f['categoria'] for f in pendientes}))\
+                    .gte('created_at', cutoff_time.isoformat())\
+                    .gte('lat', min(lats) - dlat)\
+                    .lte('lat', max(lats) + dlat)\
+                    .gte('lng', min(lngs) - dlng)\
+                    .lte('lng', max(lngs) + dlng)
+
+                for reporte in response.data or []:
+                    lote.registrar(reporte)
+            except Exception as e:
+                print(f"Error en buscar_duplicados_lote: {str(e)}")
+
+        for i, fila in enumerate(filas):
+            if previos[i] is None:
+                previos[i] = lote.buscar(fila['usuario_id'], fila['categoria'], fila['lat'], fila['lng'])
+            if previos[i] is None:
+                lote.registrar(fila)
+        return previos
+
+    def crear_reportes_lote(self, entradas, usuario_id=None):
+        """
+        Crear varios reportes: validación, duplicados, usuarios e inserción en lote
+
+        Args:
+            entradas: lista de dicts con los campos de ReporteInput
+            usuario_id: usuario por defecto para las entradas que no lo traen
+
+        Returns:
+            list: un resultado por entrada, en el mismo orden
+                ({'success', 'message', 'reporte', 'code'})
+        """
+        resultados = [None] * len(entradas)
+        validas = []
+
+        for i, data in enumerate(entradas):
+            fila, error = validar_entrada_reporte(data, usuario_id)
+            if error:
+                code, mensaje = error
+                resultados[i] = {'success': False, 'message': mensaje, 'reporte': None, 'code': code}
+            else:
+                validas.append((i, fila))
+
+        try:
+            # Los usuarios se crean a la vez que se buscan duplicados (a la vez en ASGI):
+            # el usuario de una fila duplicada ya existe por el reporte que duplica
+            previos, _ = yield (
+                self.buscar_duplicados_lote([fila for _, fila in validas]),
+                self.asegurar_usuarios_existen([fila['usuario_id'] for _, fila in validas])
+            )
+        except Exception as e:
+            # Sin comprobación de duplicados no se inserta; los errores de validación se mantienen
+            print(f"Error en crear_reportes_lote: {str(e)}")
+            for i, _ in validas:
+                resultados[i] = {
+                    'success': False,
+                    'message': f'Error al crear reporte: {str(e)}',
+                    'reporte': None,
+                    'code': 'INTERNAL_ERROR'
+                }
+            return resultados
+
+        aceptadas = []
+        for (i, fila), previo in zip(validas, previos):
+            if previo is not None:
+                resultados[i] = {
+                    'success': False,
+                    'message': 'Ya reportaste un incidente similar recientemente',
+                    'reporte': None,
+                    'code': 'DUPLICATE_REPORT'
+                }
+            else:
+                aceptadas.append((i, fila))
+
+        if aceptadas:
+            try:
+                # PostgREST devuelve las filas insertadas en el orden enviado
+                filas = [fila for _, fila in aceptadas]
+                response = yield lambda cliente: cliente.table('reportes').insert(filas)
+                creados = response.data or []
+            except Exception as e:
+                print(f"Error en crear_reportes_lote: {str(e)}")
+                creados = []
+
+            if len(creados) != len(aceptadas):
+                for i, _ in aceptadas:
+                    resultados[i] = {
+                        'success': False,
+                        'message': 'Error al crear reporte',
+                        'reporte': None,
+                        'code': 'INTERNAL_ERROR'
+                    }
+            else:
+                for (i, _), reporte in zip(aceptadas, creados):
+                    resultados[i] = {
+                        'success': True,
+                        'message': 'Reporte creado exitosamente',
+                        'reporte': reporte,
+                        'code': 'SUCCESS'
+                    }
+                    # La fila ya está insertada: un fallo aquí no la convierte en error
+                    try:
+                        self.notificar_reporte_creado(reporte)
+                    except Exception as e:
+                        print(f"⚠️ Error actualizando índices del reporte {reporte.get('id')}: {str(e)}")
+
+        return resultados
+
+    def crear_reporte_individual(self, data, archivo=None):
+        """
+        Validar, comprobar duplicados e insertar un reporte de POST /reportes
+
+        Args:
+            data: cuerpo JSON o formulario (dict)
+            archivo: foto opcional, (nombre original, stream, content_type)
+
+        Returns:
+            tuple: (reporte o None, Respuesta de error o None)
+        """
+        fila, error = validar_entrada_reporte(data)
+        if error:
+            code, mensaje = error
+            status = 401 if code == 'USER_ID_REQUIRED' else 400
+            return None, Respuesta({'error': mensaje, 'code': code}, status)
+
+        # Pasos independientes, a la vez en ASGI. Crear el usuario antes de descartar
+        # el duplicado no escribe de más: un duplicado implica un reporte previo del
+        # mismo usuario, que ya existe. La foto se lee aquí y se sube en segundo
+        # plano tras insertar el reporte
+        (es_duplicado, _), foto, _ = yield (
+            self.verificar_reporte_duplicado(fila['usuario_id'], fila['categoria'],
+                                             fila['lat'], fila['lng']),
+            self.preparar_foto(archivo),
+            self.asegurar_usuarios_existen([fila['usuario_id']])
+        )
+        if es_duplicado:
+            return None, Respuesta({
+                'error': 'Ya reportaste un incidente similar recientemente',
+                'code': 'DUPLICATE_REPORT'
+            }, 409)
+
+        fila['foto_estado'] = 'pendiente' if foto else None
+        reporte = yield from self.insertar_reporte(fila)
+        if not reporte:
+            return None, Respuesta({'error': 'Error al crear reporte'}, 500)
+
+        self.notificar_reporte_creado(reporte)
+        if foto:
+            yield from self.programar_subida_foto(reporte['id'], foto)
+        return reporte, None
+
+    def cargar_reportes_por_id(self, ids, columnas):
+        """Cargar varios reportes con una sola consulta `in` (lote del cargador de reportes)"""
+        # Orden estable: mismas claves y columnas, misma consulta
+        columnas = ', '.join(columna for columna in COLUMNAS_REPORTE if columna in columnas)
+        response = yield lambda cliente: cliente.table('reportes')\
+            .select(columnas)\
+            .in_('id', sorted(ids))
+        return {str(reporte['id']): reporte for reporte in response.data or []}
+
+    def consultar_pagina_exportacion(self, despues_de, tam_pagina, categoria=None, estado=None,
+                                     desde=None, hasta=None):
+        """Una página de la exportación; no pasa por la caché de listados"""
+        def consulta(cliente):
+            query_builder = cliente.table('reportes').select(', '.join(COLUMNAS_REPORTE))
+
+            if categoria:
+                query_builder = query_builder.eq('categoria', categoria)
+            if estado:
+                query_builder = query_builder.eq('estado', estado)
+            if desde:
+                query_builder = query_builder.gte('created_at', desde)
+            if hasta:
+                query_builder = query_builder.lte('created_at', hasta)
+            if despues_de:
+                query_builder = aplicar_keyset(query_builder, despues_de)
+
+            return query_builder\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)\
+                .limit(tam_pagina)
+
+        response = yield consulta
+        return response.data or []
+
+    # ----------------------------------------
+    # REST
+    # ----------------------------------------
+
+    def crear_reporte(self, data, archivo=None):
+        """POST /reportes"""
+        try:
+            reporte, error = yield from self.crear_reporte_individual(data, archivo)
+            if error:
+                return error
+            return Respuesta({
+                'success': True,
+                'message': 'Reporte creado exitosamente',
+                'id': reporte['id'],
+                'data': reporte
+            }, 201)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return Respuesta({'error': str(e)}, 500)
+
+    def crear_reporte_test(self, data, archivo=None):
+        """
+        POST /reportes/test: sin rate limiting ni comprobación de duplicados
+
+        Args:
+            data: campos del formulario (dict)
+            archivo: foto opcional, (nombre original, stream, content_type)
+        """
+        try:
+            categoria = data.get('categoria')
+            lat = data.get('lat')
+            lng = data.get('lng')
+            descripcion = data.get('descripcion', '')
+            usuario_id = data.get('usuario_id') or data.get('userId')
+
+            print(f"🔍 DEBUG: categoria={categoria}, lat={lat}, lng={lng}, usuario={usuario_id}")
+
+            if not usuario_id:
+                return Respuesta({'error': 'Falta usuario_id'}, 400)
+
+            if not categoria or not lat or not lng:
+                return Respuesta({'error': 'Faltan campos requeridos'}, 400)
+
+            foto, _ = yield (self.preparar_foto(archivo), self.asegurar_usuarios_existen([usuario_id]))
+
+            reporte = yield from self.insertar_reporte({
+                'usuario_id': usuario_id,
+                'categoria': categoria,
+                'lat': float(lat),
+                'lng': float(lng),
+                'ubicacion': f'SRID=4326;POINT({lng} {lat})',
+                'descripcion': descripcion,
+                'foto_url': None,
+                'foto_estado': 'pendiente' if foto else None,
+                'estado': 'pendiente',
+                'prioridad': 'media',
+                'version': 1,
+                'votos_positivos': 0,
+                'votos_negativos': 0
+            })
+            if not reporte:
+                return Respuesta({'error': 'Error al crear reporte'}, 500)
+
+            self.notificar_reporte_creado(reporte)
+            print(f"✅ Reporte creado: {reporte['id']}")
+            if foto:
+                yield from self.programar_subida_foto(reporte['id'], foto)
+            return Respuesta({
+                'success': True,
+                'message': '✅ Reporte de prueba creado',
+                'id': reporte['id'],
+                'foto_url': reporte.get('foto_url'),
+                'foto_estado': reporte.get('foto_estado'),
+                'foto_miniatura_url': reporte.get('foto_miniatura_url'),
+                'data': reporte
+            }, 201)
+        except Exception as e:
+            print(f"❌ ERROR: {str(e)}")
+            traceback.print_exc()
+            return Respuesta({'error': str(e)}, 500)
+
+    def crear_reportes_lote_rest(self, data, usuario_cabecera=None):
+        """
+        POST /reportes/lote (sincronización offline)
+
+        Body JSON: {"usuario_id": "...", "reportes": [{categoria, lat, lng, ...}, ...]}
+        Cada reporte puede traer su propio usuario_id.
+        """
+        try:
+            if not isinstance(data, dict):
+                data = {}
+            entradas = data.get('reportes')
+            usuario_id = usuario_del_cuerpo(data) or usuario_cabecera
+
+            if not isinstance(entradas, list) or not entradas:
+                return Respuesta({
+                    'error': 'Se requiere una lista no vacía en "reportes"',
+                    'code': 'MISSING_FIELDS'
+                }, 400)
+
+            if len(entradas) > LOTE_MAX_REPORTES:
+                return Respuesta({
+                    'error': f'Máximo {LOTE_MAX_REPORTES} reportes por lote',
+                    'code': 'BATCH_TOO_LARGE'
+                }, 413)
+
+            resultados = yield from self.crear_reportes_lote(entradas, usuario_id)
+            creados = sum(1 for r in resultados if r['success'])
+
+            return Respuesta({
+                'success': creados > 0,
+                'creados': creados,
+                'rechazados': len(resultados) - creados,
+                'resultados': [
+                    {
+                        'indice': i,
+                        'success': r['success'],
+                        'code': r['code'],
+                        'message': r['message'],
+                        'id': r['reporte']['id'] if r['reporte'] else None,
+                        'data': r['reporte']
+                    }
+                    for i, r in enumerate(resultados)
+                ]
+            })
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return Respuesta({'error': str(e)}, 500)
+
+    def obtener_reportes(self, args, if_none_match=None):
+        """GET /reportes: listado con filtros, paginado por cursor y con ETag"""
+        try:
+            # El tamaño de página se acota en el servidor (REPORTES_MAX_PAGINA)
+            limit = limitar_pagina(int(args.get('limit', 50)))
+            cursor = args.get('cursor')
+            filtros = {
+                'categoria': args.get('categoria'),
+                'estado': args.get('estado'),
+                'usuario_id': args.get('usuario_id')
+            }
+
+            try:
+                if if_none_match:
+                    # Sondeo ligero: solo id y versión; si nada cambió no se piden las filas completas
+                    versiones, siguiente = yield from self.paginar_reportes(
+                        columnas=', '.join(CAMPOS_VERSION_REPORTE),
+                        limit=limit,
+                        cursor=cursor,
+                        **filtros
+                    )
+                    etag = calcular_etag(versiones, CAMPOS_VERSION_REPORTE)
+                    if etag_coincide(if_none_match, etag):
+                        return Respuesta(*respuesta_no_modificada(etag))
+
+                reportes, siguiente = yield from self.paginar_reportes(limit=limit, cursor=cursor,
+                                                                      **filtros)
+            except ValueError:
+                return Respuesta({
+                    'error': 'Cursor inválido',
+                    'code': 'INVALID_CURSOR'
+                }, 400)
+
+            etag = calcular_etag(reportes, CAMPOS_VERSION_REPORTE)
+            if etag_coincide(if_none_match, etag):
+                return Respuesta(*respuesta_no_modificada(etag))
+
+            return Respuesta({
+                'success': True,
+                'count': len(reportes),
+                'data': reportes,
+                'next_cursor': siguiente
+            }, 200, {'ETag': etag, 'Cache-Control': 'no-cache'})
+        except Exception as e:
+            return Respuesta({'error': str(e)}, 500)
+
+    def obtener_reportes_cercanos(self, args, if_none_match=None):
+        """GET /reportes/cercanos"""
+        try:
+            lat = float(args.get('lat'))
+            lng = float(args.get('lng'))
+            radio = int(args.get('radio', 5000))
+
+            cercanos = yield from self.buscar_reportes_cercanos(lat, lng, radio)
+
+            # Comprobar el ETag antes de serializar el cuerpo
+            etag = calcular_etag(cercanos, CAMPOS_REPORTE_CERCANO)
+            if etag_coincide(if_none_match, etag):
+                return Respuesta(*respuesta_no_modificada(etag))
+
+            return Respuesta({
+                'success': True,
+                'count': len(cercanos),
+                'data': cercanos
+            }, 200, {'ETag': etag, 'Cache-Control': 'no-cache'})
+        except Exception as e:
+            return Respuesta({'error': str(e)}, 500)
+
+    def preparar_exportacion(self, args, accept_encoding=''):
+        """
+        Validar los parámetros de GET /reportes/exportar
+
+        Query params: formato (ndjson|csv), categoria, estado, desde, hasta (ISO 8601).
+        Se comprime con gzip si el cliente envía Accept-Encoding: gzip.
+
+        Returns:
+            tuple: (Respuesta de error, None) o (None, Exportacion)
+        """
+        formato = args.get('formato', 'ndjson')
+        if formato not in FORMATOS:
+            return Respuesta({
+                'error': f'Formato no soportado. Usa: {", ".join(FORMATOS)}',
+                'code': 'INVALID_FORMAT'
+            }, 400), None
+
+        filtros = {campo: args.get(campo) for campo in ('categoria', 'estado', 'desde', 'hasta')}
+        for campo in ('desde', 'hasta'):
+            if filtros[campo]:
+                try:
+                    datetime.fromisoformat(filtros[campo])
+                except ValueError:
+                    return Respuesta({
+                        'error': f'Fecha inválida en {campo}, usa ISO 8601',
+                        'code': 'INVALID_DATE'
+                    }, 400), None
+
+        gzip = 'gzip' in (accept_encoding or '')
+        cabeceras = {
+            'Content-Disposition': f'attachment; filename="reportes.{formato}"',
+            'Cache-Control': 'no-store',
+            'Vary': 'Accept-Encoding'
+        }
+        if gzip:
+            cabeceras['Content-Encoding'] = 'gzip'
+        return None, Exportacion(filtros, formato, gzip, cabeceras)
+
+    # ----------------------------------------
+    # GraphQL
+    # ----------------------------------------
+
+    def resolve_reportes(self, info, limit=50, categoria=None, estado=None, usuario_id=None):
+        """Obtener reportes con filtros"""
+        try:
+            return (yield from self.listar_reportes(
+                columnas=columnas_seleccionadas(info.field_nodes, info.fragments),
+                limit=limitar_pagina(limit),
+                categoria=categoria,
+                estado=estado,
+                usuario_id=usuario_id
+            ))
+        except Exception as e:
+            print(f"Error en resolve_reportes: {str(e)}")
+            return []
+
+    def resolve_mis_reportes(self, info, usuario_id):
+        """Obtener reportes de un usuario específico"""
+        try:
+            columnas = columnas_seleccionadas(info.field_nodes, info.fragments)
+            response = yield lambda cliente: cliente.table('reportes')\
+                .select(columnas)\
+                .eq('usuario_id', usuario_id)\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)\
+                .limit(MAX_PAGINA)
+
+            return response.data or []
+        except Exception as e:
+            print(f"Error en resolve_mis_reportes: {str(e)}")
+            return []
+
+    def conexion_reportes(self, info, first, after, **filtros):
+        """Resolver común de las conexiones paginadas por cursor"""
+        nodos = subcampos(info.field_nodes, info.fragments, 'edges', 'node')
+        columnas = columnas_seleccionadas(nodos, info.fragments, dependencias=DEPENDENCIAS_CURSOR)
+        filas, siguiente = yield from self.paginar_reportes(columnas=columnas, limit=first,
+                                                            cursor=after, **filtros)
+        edges = [{'cursor': codificar_cursor(fila), 'node': fila} for fila in filas]
+        return {
+            'edges': edges,
+            'pageInfo': {
+                'hasNextPage': siguiente is not None,
+                'endCursor': edges[-1]['cursor'] if edges else None
+            }
+        }
+
+    def resolve_reportes_paginados(self, info, first=None, after=None, categoria=None, estado=None,
+                                   usuario_id=None):
+        """Reportes con filtros, paginados por cursor"""
+        try:
+            return (yield from self.conexion_reportes(info, first, after, categoria=categoria,
+                                                      estado=estado, usuario_id=usuario_id))
+        except ValueError as e:
+            raise GraphQLError(str(e), extensions={'code': 'INVALID_CURSOR'})
+        except Exception as e:
+            print(f"Error en resolve_reportes_paginados: {str(e)}")
+            return CONEXION_VACIA
+
+    def resolve_mis_reportes_paginados(self, info, usuario_id, first=None, after=None):
+        """Reportes de un usuario, paginados por cursor"""
+        try:
+            return (yield from self.conexion_reportes(info, first, after, usuario_id=usuario_id))
+        except ValueError as e:
+            raise GraphQLError(str(e), extensions={'code': 'INVALID_CURSOR'})
+        except Exception as e:
+            print(f"Error en resolve_mis_reportes_paginados: {str(e)}")
+            return CONEXION_VACIA
+
+    def resolve_reporte(self, info, id):
+        """Obtener un reporte específico"""
+        try:
+            # Los reporte(id: ...) que se resuelven a la vez van en un solo lote. En
+            # Flask se resuelven uno tras otro: se encolan al principio los ids de
+            # los campos hermanos, con la unión de las columnas que selecciona cada uno
+            def encolar_hermanos(cargador):
+                cargador.encolar(
+                    [str(valor) for valor in argumentos_hermanos(info, 'id')],
+                    columnas_seleccionadas(campos_hermanos(info), info.fragments).split(', ')
+                )
+
+            cargador = obtener_cargador(info, 'reportes', self.cargar_reportes_por_id,
+                                        al_crear=encolar_hermanos)
+            columnas = columnas_seleccionadas(info.field_nodes, info.fragments).split(', ')
+            return (yield cargador.cargar(str(id), columnas))
+        except Exception as e:
+            print(f"Error en resolve_reporte: {str(e)}")
+            return None
+
+    def resolve_reportes_cercanos(self, info, lat, lng, radio=5000):
+        """Buscar reportes cercanos usando función PostGIS"""
+        try:
+            return (yield from self.buscar_reportes_cercanos(lat, lng, radio))
+        except Exception as e:
+            print(f"Error en resolve_reportes_cercanos: {str(e)}")
+            return []
+
+    def resolve_estadisticas(self, info):
+        """Obtener estadísticas generales"""
+        try:
+            if ESTADISTICAS_MODO == 'agregado':
+                response = yield consulta_estadisticas_agregadas
+                return leer_estadisticas_agregadas(response.data)
+            # La primera llamada reconcilia con el cliente síncrono (en ASGI, en un hilo)
+            return (yield Bloqueante(self.estadisticas_reportes.obtener))
+        except Exception as e:
+            print(f"Error en resolve_estadisticas: {str(e)}")
+            return dict(ESTADISTICAS_VACIAS)
+
+    def resolve_crear_reporte(self, info, input):
+        """Crear nuevo reporte"""
+        try:
+            fila, error = validar_entrada_reporte(input)
+            if error:
+                code, mensaje = error
+                return {'success': False, 'message': mensaje, 'reporte': None, 'code': code}
+
+            # A la vez en ASGI (ver crear_reporte_individual)
+            (es_duplicado, _), _ = yield (
+                self.verificar_reporte_duplicado(fila['usuario_id'], fila['categoria'],
+                                                 fila['lat'], fila['lng']),
+                self.asegurar_usuarios_existen([fila['usuario_id']])
+            )
+            if es_duplicado:
+                return {
+                    'success': False,
+                    'message': 'Ya reportaste un incidente similar hace menos de '
+                               f'{describir_duracion(self.indice_duplicados.time_window)}',
+                    'reporte': None,
+                    'code': 'DUPLICATE_REPORT'
+                }
+
+            reporte = yield from self.insertar_reporte(fila)
+
+            if reporte:
+                self.notificar_reporte_creado(reporte)
+                return {
+                    'success': True,
+                    'message': 'Reporte creado exitosamente',
+                    'reporte': reporte,
+                    'code': 'SUCCESS'
+                }
+            return {
+                'success': False,
+                'message': 'Error al crear reporte',
+                'reporte': None,
+                'code': 'INTERNAL_ERROR'
+            }
+
+        except Exception as e:
+            print(f"Error en resolve_crear_reporte: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Error al crear reporte: {str(e)}',
+                'reporte': None,
+                'code': 'INTERNAL_ERROR'
+            }
+
+    def resolve_crear_reportes(self, info, input):
+        """Crear varios reportes en una sola inserción"""
+        if len(input) > LOTE_MAX_REPORTES:
+            return {
+                'success': False,
+                'creados': 0,
+                'rechazados': len(input),
+                'resultados': [],
+                'code': 'BATCH_TOO_LARGE'
+            }
+
+        try:
+            resultados = yield from self.crear_reportes_lote(input)
+            creados = sum(1 for r in resultados if r['success'])
+            return {
+                'success': creados > 0,
+                'creados': creados,
+                'rechazados': len(resultados) - creados,
+                'resultados': resultados,
+                'code': 'SUCCESS'
+            }
+
+        except Exception as e:
+            print(f"Error en resolve_crear_reportes: {str(e)}")
+            error = {
+                'success': False,
+                'message': f'Error al crear reporte: {str(e)}',
+                'reporte': None,
+                'code': 'INTERNAL_ERROR'
+            }
+            return {
+                'success': False,
+                'creados': 0,
+                'rechazados': len(input),
+                'resultados': [dict(error) for _ in input],
+                'code': 'INTERNAL_ERROR'
+            }
+
+    def resolve_actualizar_estado(self, info, id, estado, usuario_id):
+        """Actualizar estado de un reporte"""
+        try:
+            if estado not in ESTADOS_VALIDOS:
+                return {
+                    'success': False,
+                    'message': f'Estado inválido. Usar: {", ".join(ESTADOS_VALIDOS)}',
+                    'reporte': None,
+                    'code': 'INVALID_STATE'
+                }
+
+            # Actualizar (el trigger incrementará la versión automáticamente)
+            response = yield lambda cliente: cliente.table('reportes')\
+                .update({'estado': estado, 'updated_by': usuario_id})\
+                .eq('id', id)
+
+            if response.data:
+                self.notificar_reporte_actualizado(response.data[0], cambia_estado=True)
+                return {
+                    'success': True,
+                    'message': 'Estado actualizado exitosamente',
+                    'reporte': response.data[0],
+                    'code': 'SUCCESS'
+                }
+            return {
+                'success': False,
+                'message': 'Reporte no encontrado',
+                'reporte': None,
+                'code': 'NOT_FOUND'
+            }
+
+        except Exception as e:
+            print(f"Error en resolve_actualizar_estado: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Error al actualizar: {str(e)}',
+                'reporte': None,
+                'code': 'INTERNAL_ERROR'
+            }
+
+    def crear_esquema(self, resolver):
+        """
+        Esquema GraphQL ejecutable con los resolvers de este servicio
+
+        Args:
+            resolver: convierte un flujo f(info, **argumentos) en un resolver
+                de ariadne que lo ejecuta con el cliente de la app
+        """
+        query = QueryType()
+        mutation = MutationType()
+
+        for campo, flujo in (
+            ('reportes', self.resolve_reportes),
+            ('misReportes', self.resolve_mis_reportes),
+            ('reportesPaginados', self.resolve_reportes_paginados),
+            ('misReportesPaginados', self.resolve_mis_reportes_paginados),
+            ('reporte', self.resolve_reporte),
+            ('reportesCercanos', self.resolve_reportes_cercanos),
+            ('estadisticas', self.resolve_estadisticas)
+        ):
+            query.set_field(campo, resolver(flujo))
+
+        for campo, flujo in (
+            ('crearReporte', self.resolve_crear_reporte),
+            ('crearReportes', self.resolve_crear_reportes),
+            ('actualizarEstado', self.resolve_actualizar_estado)
+        ):
+            mutation.set_field(campo, resolver(flujo))
+
+        return make_executable_schema(type_defs, query, mutation)
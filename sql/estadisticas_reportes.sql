@@ -0,0 +1,47 @@
+-- Estadísticas de reportes agregadas en la base de datos
+-- Usada por estadisticas.obtener_estadisticas_agregadas (ESTADISTICAS_MODO=agregado)
+-- y por la reconciliación de EstadisticasIncrementales
+-- Devuelve solo filas agregadas: conteo por estado, por categoría y top de usuarios,
+-- y el mayor id contado (para no contar dos veces las escrituras concurrentes;
+-- supone que reportes.id es un entero asignado por una secuencia)
+
+create index if not exists idx_reportes_estado on reportes (estado);
+create index if not exists idx_reportes_categoria on reportes (categoria);
+create index if not exists idx_reportes_usuario_id on reportes (usuario_id);
+
+create or replace function estadisticas_reportes(p_top_usuarios int default 10)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'total', (select count(*) from reportes),
+        'max_id', (select max(id) from reportes),
+        'por_estado', coalesce((
+            select json_agg(json_build_object('estado', estado, 'cantidad', cantidad))
+            from (
+                select estado, count(*) as cantidad
+                from reportes
+                group by estado
+            ) e
+        ), '[]'::json),
+        'por_categoria', coalesce((
+            select json_agg(json_build_object('categoria', categoria, 'cantidad', cantidad))
+            from (
+                select coalesce(categoria, 'otro') as categoria, count(*) as cantidad
+                from reportes
+                group by 1
+            ) c
+        ), '[]'::json),
+        'por_usuario', coalesce((
+            select json_agg(json_build_object('usuario_id', usuario_id, 'cantidad', cantidad))
+            from (
+                select coalesce(usuario_id, 'anonimo') as usuario_id, count(*) as cantidad
+                from reportes
+                group by 1
+                order by cantidad desc
+                limit p_top_usuarios
+            ) u
+        ), '[]'::json)
+    );
+$$;
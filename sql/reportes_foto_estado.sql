@@ -0,0 +1,5 @@
+-- Estado de la subida de la foto de un reporte
+-- null: sin foto, 'pendiente': subiendo en segundo plano, 'subida', 'error'
+
+alter table reportes
+    add column if not exists foto_estado text;
@@ -0,0 +1,4 @@
+-- Miniatura generada al normalizar la foto (procesamiento_imagenes.py)
+
+alter table reportes
+    add column if not exists foto_miniatura_url text;
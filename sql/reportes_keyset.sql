@@ -0,0 +1,11 @@
+-- Índices para la paginación por cursor (paginacion.py)
+-- Orden (created_at desc, id desc), con y sin los filtros de los listados
+
+create index if not exists reportes_created_at_id_idx
+    on reportes (created_at desc, id desc);
+
+create index if not exists reportes_usuario_created_at_id_idx
+    on reportes (usuario_id, created_at desc, id desc);
+
+create index if not exists reportes_categoria_created_at_id_idx
+    on reportes (categoria, created_at desc, id desc);
@@ -0,0 +1,18 @@
+-- Restricción única en usuarios.usuario_id
+-- Necesaria para el upsert idempotente de asegurar_usuarios_existen
+-- (on_conflict=usuario_id, ignore_duplicates); sin ella la app usa SELECT + INSERT
+-- Se puede ejecutar varias veces. Si ya hay usuario_id repetidos falla: eliminarlos antes
+
+do $$
+begin
+    if not exists (
+        select 1
+        from pg_constraint
+        where conrelid = 'usuarios'::regclass
+          and conname = 'usuarios_usuario_id_key'
+    ) then
+        alter table usuarios
+            add constraint usuarios_usuario_id_key unique (usuario_id);
+    end if;
+end
+$$;
@@ -0,0 +1,261 @@
+"""
+Subida de fotos en segundo plano
+El reporte se inserta con foto_estado='pendiente' y la foto se sube a
+Supabase Storage desde un pool acotado de hilos, con reintentos. Al
+terminar se actualizan foto_url y foto_estado en la fila del reporte.
+
+Si se configura `normalizar` (ver procesamiento_imagenes.py) la imagen se
+procesa en el mismo hilo de subida y se guarda también una miniatura en
+foto_miniatura_url.
+
+Los objetos se nombran por el SHA-256 de su contenido: si la misma foto ya
+está en el bucket no se vuelve a procesar ni a subir.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+TAM_BLOQUE = 64 * 1024
+
+
+def leer_con_hash(stream):
+    """
+    Leer un stream por bloques calculando su SHA-256 al vuelo
+
+    Returns:
+        tuple: (bytes, hexdigest)
+    """
+    hasher = hashlib.sha256()
+    partes = []
+    for bloque in iter(lambda: stream.read(TAM_BLOQUE), b''):
+        hasher.update(bloque)
+        partes.append(bloque)
+    return b''.join(partes), hasher.hexdigest()
+
+
+class SubidaFotos:
+    """
+    Pool de subidas con cola acotada
+
+    Si la cola está llena encolar() devuelve False y el llamador decide
+    (normalmente subir en el propio hilo de la petición).
+    """
+
+    def __init__(self, cliente, bucket, max_workers=4, max_cola=100,
+                 reintentos=3, espera_base=0.5, al_completar=None, normalizar=None,
+                 max_conocidos=10000):
+        self.cliente = cliente
+        self.bucket = bucket
+        self.max_cola = max_cola
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.al_completar = al_completar
+        self.normalizar = normalizar
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='subida-fotos')
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._en_curso = 0
+        self._completadas = 0
+        self._fallidas = 0
+        self._reintentos_hechos = 0
+        self._rechazadas = 0
+        self._latencias = deque(maxlen=1000)
+        self._bytes_recibidos = 0
+        self._bytes_guardados = 0
+        self._segundos_procesando = 0.0
+        self._deduplicadas = 0
+        # Objetos que sabemos que ya están en el bucket
+        self.max_conocidos = max_conocidos
+        self._conocidos = OrderedDict()
+
+    def encolar(self, reporte_id, nombre_archivo, contenido, content_type):
+        """Programar la subida; False si la cola está llena"""
+        with self._lock:
+            if self._en_cola >= self.max_cola:
+                self._rechazadas += 1
+                return False
+            self._en_cola += 1
+
+        self._executor.submit(self._trabajo, reporte_id, nombre_archivo,
+                              contenido, content_type, time.time())
+        return True
+
+    def _trabajo(self, reporte_id, nombre_archivo, contenido, content_type, encolado):
+        with self._lock:
+            self._en_cola -= 1
+        self.procesar(reporte_id, nombre_archivo, contenido, content_type, encolado)
+
+    def procesar(self, reporte_id, nombre_archivo, contenido, content_type, encolado=None):
+        """Subir la foto y actualizar el reporte (bloquea hasta terminar)"""
+        encolado = encolado or time.time()
+        with self._lock:
+            self._en_curso += 1
+
+        try:
+            existentes = self._buscar_existentes(nombre_archivo, content_type)
+            if existentes:
+                self._actualizar_reporte(reporte_id, dict(existentes, foto_estado='subida'))
+                with self._lock:
+                    self._deduplicadas += 1
+                    self._completadas += 1
+                    self._latencias.append(time.time() - encolado)
+                return existentes['foto_url']
+
+            variantes = self._preparar_variantes(nombre_archivo, contenido, content_type)
+
+            for intento in range(self.reintentos):
+                try:
+                    datos = {'foto_estado': 'subida'}
+                    for campo, nombre, bytes_variante, tipo in variantes:
+                        datos[campo] = self.subir(nombre, bytes_variante, tipo)
+                        self._recordar(nombre)
+                    self._actualizar_reporte(reporte_id, datos)
+                    with self._lock:
+                        self._completadas += 1
+                        self._latencias.append(time.time() - encolado)
+                    return datos['foto_url']
+                except Exception as e:
+                    print(f"❌ Error subiendo foto del reporte {reporte_id} "
+                          f"(intento {intento + 1}/{self.reintentos}): {str(e)}")
+                    if intento + 1 < self.reintentos:
+                        with self._lock:
+                            self._reintentos_hechos += 1
+                        time.sleep(self.espera_base * (2 ** intento))
+
+            with self._lock:
+                self._fallidas += 1
+            try:
+                self._actualizar_reporte(reporte_id, {'foto_estado': 'error'})
+            except Exception as e:
+                print(f"⚠️ No se pudo marcar la foto del reporte {reporte_id} como fallida: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+
+    def _normaliza(self, content_type):
+        return bool(self.normalizar) and (content_type or '').startswith('image/')
+
+    def _nombres(self, nombre_archivo, normalizada):
+        """
+        (columna, nombre) de los objetos guardados; la foto principal va al final
+
+        Con `normalizada` la foto se guarda como JPEG con miniatura; si no
+        (sin normalizar o porque la normalización falló) se guarda tal cual
+        con su extensión original.
+        """
+        if not normalizada:
+            return [('foto_url', nombre_archivo)]
+        base = nombre_archivo.rsplit('.', 1)[0]
+        return [
+            ('foto_miniatura_url', f'{base}_miniatura.jpg'),
+            ('foto_url', f'{base}.jpg')
+        ]
+
+    def _buscar_existentes(self, nombre_archivo, content_type):
+        """
+        URLs públicas si la foto ya está en el bucket, o None
+
+        Con normalización se prueban primero los nombres normalizados y luego
+        los del original (si la normalización falló al guardarla). Un .jpg
+        original y el normalizado comparten nombre, así que se comprueban
+        todas las variantes, empezando por la principal, que se sube la última.
+        """
+        candidatos = [False]
+        if self._normaliza(content_type):
+            candidatos.insert(0, True)
+
+        storage = self.cliente.storage.from_(self.bucket)
+        for normalizada in candidatos:
+            nombres = self._nombres(nombre_archivo, normalizada)
+            if all(self._existe(nombre) for _, nombre in reversed(nombres)):
+                return {campo: storage.get_public_url(nombre) for campo, nombre in nombres}
+        return None
+
+    def _existe(self, nombre):
+        with self._lock:
+            if nombre in self._conocidos:
+                self._conocidos.move_to_end(nombre)
+                return True
+        try:
+            existe = self.cliente.storage.from_(self.bucket).exists(nombre)
+        except Exception as e:
+            print(f"⚠️ No se pudo comprobar si existe {nombre}: {str(e)}")
+            return False
+        if existe:
+            self._recordar(nombre)
+        return existe
+
+    def _recordar(self, nombre):
+        with self._lock:
+            self._conocidos[nombre] = True
+            self._conocidos.move_to_end(nombre)
+            if len(self._conocidos) > self.max_conocidos:
+                self._conocidos.popitem(last=False)
+
+    def _preparar_variantes(self, nombre_archivo, contenido, content_type):
+        """Lista de (columna, nombre, bytes, content_type) a subir; la principal al final"""
+        procesada = None
+        if self._normaliza(content_type):
+            inicio = time.process_time()
+            procesada = self.normalizar(contenido)
+            with self._lock:
+                self._segundos_procesando += time.process_time() - inicio
+
+        nombres = self._nombres(nombre_archivo, procesada is not None)
+        if procesada is None:
+            variantes = [(campo, nombre, contenido, content_type) for campo, nombre in nombres]
+        else:
+            principal, miniatura = procesada
+            bytes_por_campo = {'foto_miniatura_url': miniatura, 'foto_url': principal}
+            variantes = [(campo, nombre, bytes_por_campo[campo], 'image/jpeg')
+                         for campo, nombre in nombres]
+
+        with self._lock:
+            self._bytes_recibidos += len(contenido)
+            self._bytes_guardados += sum(len(v[2]) for v in variantes)
+        return variantes
+
+    def subir(self, nombre_archivo, contenido, content_type):
+        """Subir a Supabase Storage y devolver la URL pública"""
+        storage = self.cliente.storage.from_(self.bucket)
+        # upsert: el nombre depende solo del contenido, reescribirlo es idempotente
+        storage.upload(nombre_archivo, contenido, {
+            'content-type': content_type,
+            'upsert': 'true'
+        })
+        return storage.get_public_url(nombre_archivo)
+
+    def _actualizar_reporte(self, reporte_id, datos):
+        response = self.cliente.table('reportes')\
+            .update(datos)\
+            .eq('id', reporte_id)\
+            .execute()
+        if response.data and self.al_completar:
+            self.al_completar(response.data[0])
+
+    def metricas(self):
+        """Profundidad de cola, latencia de subida y fallos"""
+        with self._lock:
+            latencias = sorted(self._latencias)
+            return {
+                'en_cola': self._en_cola,
+                'en_curso': self._en_curso,
+                'max_cola': self.max_cola,
+                'completadas': self._completadas,
+                'fallidas': self._fallidas,
+                'reintentos': self._reintentos_hechos,
+                'rechazadas_cola_llena': self._rechazadas,
+                'deduplicadas': self._deduplicadas,
+                'latencia_media_s': sum(latencias) / len(latencias) if latencias else 0.0,
+                'latencia_p95_s': latencias[int(len(latencias) * 0.95)] if latencias else 0.0,
+                'latencia_max_s': latencias[-1] if latencias else 0.0,
+                'bytes_recibidos': self._bytes_recibidos,
+                'bytes_guardados': self._bytes_guardados,
+                'cpu_procesamiento_s': self._segundos_procesando
+            }
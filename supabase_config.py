@@ -1,19 +1,81 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 import os
+import threading
 from dotenv import load_dotenv
 
+from conexiones import crear_http_client, calentar, estadisticas_conexiones
+from instrumentacion import instrumentar_cliente
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 SUPABASE_STORAGE_BUCKET = os.getenv('SUPABASE_STORAGE_BUCKET', 'reportes-fotos')
+# 'supabase' (proyecto real) o 'local' (backend en memoria de backend_local.py, para medir sin red)
+SUPABASE_BACKEND = os.getenv('SUPABASE_BACKEND', 'supabase')
+BACKEND_LOCAL = SUPABASE_BACKEND == 'local'
 
-def initialize_supabase() -> Client:
-    """Inicializar cliente de Supabase"""
+def verificar_configuracion():
+    if BACKEND_LOCAL:
+        return
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("SUPABASE_URL y SUPABASE_KEY deben estar configurados en .env")
-    
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def initialize_supabase(http_client=None) -> Client:
+    """Inicializar cliente de Supabase (con el pool HTTP compartido si se indica)"""
+    verificar_configuracion()
+
+    opciones = ClientOptions(httpx_client=http_client) if http_client else ClientOptions()
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=opciones)
     return supabase
 
-supabase = initialize_supabase()
\ No newline at end of file
+class ClientePorProceso:
+    """
+    Cliente de Supabase que se crea en cada proceso la primera vez que se usa
+
+    Se comporta como un `Client` (delega atributos). Si el módulo se importa
+    antes del fork de gunicorn, cada worker crea su propio cliente y su
+    propio pool de conexiones en lugar de heredar sockets del padre.
+    """
+
+    def __init__(self):
+        self._olvidar()
+
+    def _olvidar(self):
+        self._lock = threading.Lock()
+        self._cliente = None
+        self._pid = None
+        self.http_client = None
+
+    def obtener(self) -> Client:
+        """Cliente real de este proceso"""
+        if self._cliente is None or self._pid != os.getpid():
+            with self._lock:
+                if self._cliente is None or self._pid != os.getpid():
+                    if BACKEND_LOCAL:
+                        from backend_local import crear_cliente_local
+                        cliente = crear_cliente_local(url=SUPABASE_URL or 'http://local')
+                    else:
+                        self.http_client = crear_http_client()
+                        cliente = initialize_supabase(self.http_client)
+                    self._cliente = instrumentar_cliente(cliente)
+                    self._pid = os.getpid()
+        return self._cliente
+
+    def __getattr__(self, nombre):
+        return getattr(self.obtener(), nombre)
+
+def _despues_del_fork():
+    supabase._olvidar()
+    estadisticas_conexiones.reiniciar()
+
+def calentar_conexiones():
+    """Crear el cliente de este proceso y abrir sus conexiones (post_fork de gunicorn)"""
+    supabase.obtener()
+    if BACKEND_LOCAL:
+        return
+    calentar(supabase.http_client, SUPABASE_URL, SUPABASE_KEY)
+
+verificar_configuracion()
+supabase = ClientePorProceso()
+os.register_at_fork(after_in_child=_despues_del_fork)
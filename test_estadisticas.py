@@ -0,0 +1,148 @@
+"""
+Pruebas de las estadísticas incrementales contra el backend local
+Cada caso compara EstadisticasIncrementales con el recuento completo de la
+tabla (formatear_agregados sobre todas las filas), como hace
+benchmarks/comprobar_estadisticas.py.
+
+Uso:
+    python -m pytest -q test_estadisticas.py
+"""
+
+import pytest
+
+from backend_local import BaseLocal, ClienteLocal, sembrar_reportes
+from estadisticas import (
+    TOP_USUARIOS, EstadisticasIncrementales, formatear_agregados, obtener_estadisticas_agregadas
+)
+
+
+def contar(filas, columna, por_defecto=None):
+    conteo = {}
+    for fila in filas:
+        valor = fila.get(columna) or por_defecto
+        conteo[valor] = conteo.get(valor, 0) + 1
+    return conteo
+
+
+def escaneo(base):
+    """Estadísticas recorriendo todas las filas de `reportes`"""
+    filas = base.filas('reportes')
+    usuarios = sorted(contar(filas, 'usuario_id', 'anonimo').items(), key=lambda par: -par[1])
+    return formatear_agregados(
+        len(filas),
+        [{'estado': e, 'cantidad': c} for e, c in contar(filas, 'estado').items()],
+        [{'categoria': cat, 'cantidad': c} for cat, c in contar(filas, 'categoria', 'otro').items()],
+        [{'usuario_id': uid, 'cantidad': c} for uid, c in usuarios]
+    )
+
+
+def normalizar(estadisticas):
+    """Comparable aunque cambie el orden de categorías o de usuarios empatados"""
+    return dict(
+        estadisticas,
+        por_categoria=sorted((f['categoria'], f['cantidad']) for f in estadisticas['por_categoria']),
+        por_usuario=[f['cantidad'] for f in estadisticas['por_usuario']]
+    )
+
+
+@pytest.fixture
+def base():
+    base = BaseLocal()
+    sembrar_reportes(base, 300)
+    return base
+
+
+@pytest.fixture
+def cliente(base):
+    return ClienteLocal(base)
+
+
+@pytest.fixture
+def estadisticas(cliente):
+    return EstadisticasIncrementales(cliente, intervalo_reconciliacion=3600)
+
+
+def insertar(cliente, usuario_id, estado='pendiente', categoria='bache'):
+    return cliente.table('reportes').insert({
+        'usuario_id': usuario_id,
+        'categoria': categoria,
+        'descripcion': 'Reporte de prueba',
+        'lat': -0.2,
+        'lng': -78.5,
+        'estado': estado
+    }).execute().data[0]
+
+
+def cambiar_estado(cliente, reporte_id, estado):
+    return cliente.table('reportes').update({'estado': estado}).eq('id', reporte_id).execute().data[0]
+
+
+def test_formatear_agregados():
+    resultado = formatear_agregados(
+        5,
+        [{'estado': 'pendiente', 'cantidad': 3}, {'estado': 'resuelto', 'cantidad': 2}],
+        [{'categoria': 'bache', 'cantidad': 5}],
+        [{'usuario_id': f'u{i}', 'cantidad': 20 - i} for i in range(TOP_USUARIOS + 5)]
+    )
+    assert resultado['total'] == 5
+    assert (resultado['pendientes'], resultado['en_proceso'],
+            resultado['resueltos'], resultado['rechazados']) == (3, 0, 2, 0)
+    assert resultado['por_categoria'] == [{'categoria': 'bache', 'cantidad': 5}]
+    assert len(resultado['por_usuario']) == TOP_USUARIOS
+    assert resultado['por_usuario'][0] == {'usuario_id': 'u0', 'cantidad': 20}
+
+
+def test_agregado_coincide_con_escaneo(base, cliente):
+    assert normalizar(obtener_estadisticas_agregadas(cliente)) == normalizar(escaneo(base))
+
+
+def test_carga_en_frio(base, estadisticas):
+    assert normalizar(estadisticas.obtener()) == normalizar(escaneo(base))
+
+
+def test_escrituras_de_este_worker(base, cliente, estadisticas):
+    estadisticas.obtener()
+    for i in range(20):
+        reporte = insertar(cliente, f'nuevo-{i % 3}', categoria=('bache', None)[i % 2])
+        estadisticas.registrar_creacion(reporte)
+        if i % 4 == 0:
+            estadisticas.registrar_actualizacion(cambiar_estado(cliente, reporte['id'], 'resuelto'),
+                                                 cambia_estado=True)
+
+    assert normalizar(estadisticas.obtener()) == normalizar(escaneo(base))
+    assert not estadisticas._desfasado
+
+
+def test_cambio_de_estado_desconocido_reconcilia(base, cliente, estadisticas):
+    estadisticas.obtener()
+    fila = base.filas('reportes')[0]
+    nuevo = 'rechazado' if fila['estado'] != 'rechazado' else 'pendiente'
+    estadisticas.registrar_actualizacion(cambiar_estado(cliente, fila['id'], nuevo), cambia_estado=True)
+
+    # Este worker no conoce el estado anterior: reconciliar antes de responder
+    assert estadisticas._desfasado
+    estadisticas.reconciliar()
+    assert normalizar(estadisticas.obtener()) == normalizar(escaneo(base))
+
+
+def test_escrituras_de_otro_worker_tras_reconciliar(base, cliente, estadisticas):
+    estadisticas.obtener()
+    for i in range(10):
+        insertar(cliente, 'otro-worker', estado='en_proceso')
+
+    assert normalizar(estadisticas.obtener()) != normalizar(escaneo(base))
+    estadisticas.reconciliar()
+    assert normalizar(estadisticas.obtener()) == normalizar(escaneo(base))
+
+
+def test_usuario_fuera_del_top_entra_tras_reconciliar(base, cliente, estadisticas):
+    estadisticas.obtener()
+    primero = estadisticas.obtener()['por_usuario'][0]['cantidad']
+    for _ in range(primero + 1):
+        estadisticas.registrar_creacion(insertar(cliente, 'usuario-0'))
+
+    if estadisticas._desfasado:
+        estadisticas.reconciliar()
+    resultado = estadisticas.obtener()
+    assert normalizar(resultado) == normalizar(escaneo(base))
+    assert resultado['por_usuario'][0]['usuario_id'] == 'usuario-0'
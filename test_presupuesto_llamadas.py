@@ -0,0 +1,93 @@
+"""
+Pruebas del número de llamadas a Supabase contra el backend local
+Con contar_llamadas() y comprobar_llamadas() de instrumentacion.py:
+
+  - el recuento de viajes y la detección de consultas repetidas (N+1) del
+    cliente instrumentado
+  - el presupuesto de cada endpoint, con los mismos casos que
+    benchmarks/presupuesto_llamadas.py (requiere Flask, ariadne y supabase)
+
+Uso:
+    python -m pytest -q test_presupuesto_llamadas.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+# Fija SUPABASE_BACKEND=local y las demás variables antes de importar app.py
+from presupuesto_llamadas import CASOS
+
+from backend_local import BaseLocal, ClienteLocal, sembrar_reportes
+from instrumentacion import ClienteInstrumentado, contar_llamadas, comprobar_llamadas
+
+
+@pytest.fixture
+def cliente():
+    base = BaseLocal()
+    sembrar_reportes(base, 50)
+    return ClienteInstrumentado(ClienteLocal(base))
+
+
+def test_cuenta_cada_viaje(cliente):
+    with contar_llamadas() as traza:
+        cliente.table('reportes').select('id').eq('estado', 'pendiente').execute()
+        cliente.rpc('estadisticas_reportes', {'p_top_usuarios': 10}).execute()
+        # Construir una consulta sin ejecutarla no es un viaje
+        cliente.table('reportes').select('id').limit(5)
+
+    assert traza.llamadas() == 2
+    assert [span[5] for span in traza.spans] == [
+        'tabla:reportes.select(eq:estado)',
+        'rpc:estadisticas_reportes.rpc()'
+    ]
+    comprobar_llamadas(traza, maximo=2)
+    with pytest.raises(AssertionError, match='2 llamadas a Supabase'):
+        comprobar_llamadas(traza, maximo=1)
+
+
+def test_detecta_consultas_repetidas(cliente):
+    with contar_llamadas() as traza:
+        for reporte_id in range(1, 5):
+            cliente.table('reportes').select('id, estado').eq('id', reporte_id).limit(1).execute()
+
+    assert traza.repetidas(3) == [('tabla:reportes.select(eq:id,limit)', 4)]
+    with pytest.raises(AssertionError, match='repetida 4 veces'):
+        comprobar_llamadas(traza, umbral_repetidas=3)
+
+    # La misma información en un solo viaje
+    with contar_llamadas() as traza:
+        cliente.table('reportes').select('id, estado').in_('id', [1, 2, 3, 4]).execute()
+    comprobar_llamadas(traza, maximo=1, umbral_repetidas=3)
+
+
+def test_traza_anidada_suma_en_la_de_fuera(cliente):
+    with contar_llamadas() as fuera:
+        cliente.table('usuarios').select('usuario_id').execute()
+        with contar_llamadas() as dentro:
+            cliente.table('reportes').select('id').execute()
+
+    assert dentro.llamadas() == 1
+    assert fuera.llamadas() == 2
+
+
+@pytest.fixture(scope='module')
+def cliente_app():
+    pytest.importorskip('flask')
+    pytest.importorskip('ariadne')
+    pytest.importorskip('supabase')
+    import app as app_module
+    return app_module.app.test_client()
+
+
+# En orden: 'POST /reportes duplicado' repite el envío del caso anterior
+@pytest.mark.parametrize('nombre,maximo,peticion', CASOS, ids=[caso[0] for caso in CASOS])
+def test_presupuesto_por_endpoint(cliente_app, nombre, maximo, peticion):
+    with contar_llamadas() as traza:
+        respuesta = peticion(cliente_app)
+
+    assert respuesta.status_code < 500, nombre
+    comprobar_llamadas(traza, maximo=maximo)
@@ -0,0 +1,93 @@
+"""
+Caché de usuarios conocidos
+LRU acotado de usuario_id que ya existen en la tabla `usuarios`, con un
+filtro de Bloom opcional para recordar muchos más usuarios en poca memoria.
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+
+class FiltroBloom:
+    """Filtro de Bloom de tamaño fijo: sin falsos negativos, falsos positivos acotados"""
+
+    def __init__(self, capacidad, tasa_falsos_positivos=0.001):
+        bits = -capacidad * math.log(tasa_falsos_positivos) / (math.log(2) ** 2)
+        self.num_bits = max(8, int(bits))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _posiciones(self, valor):
+        digest = hashlib.blake2b(valor.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def agregar(self, valor):
+        for posicion in self._posiciones(valor):
+            self._bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, valor):
+        return all(
+            self._bits[posicion >> 3] & (1 << (posicion & 7))
+            for posicion in self._posiciones(valor)
+        )
+
+
+class CacheUsuarios:
+    """
+    Usuarios que sabemos que existen
+
+    El filtro de Bloom es opcional porque un falso positivo haría saltarse
+    el upsert de un usuario nuevo; con tasa 0.001 ocurre una vez cada mil
+    usuarios desconocidos que ya hayan salido del LRU.
+    """
+
+    def __init__(self, max_usuarios=50000, capacidad_bloom=0, tasa_falsos_positivos=0.001):
+        self.max_usuarios = max_usuarios
+        self._lock = threading.Lock()
+        self._usuarios = OrderedDict()
+        self._bloom = FiltroBloom(capacidad_bloom, tasa_falsos_positivos) \
+            if capacidad_bloom else None
+        self.aciertos = 0
+        self.aciertos_bloom = 0
+        self.fallos = 0
+
+    def contiene(self, usuario_id):
+        """True si el usuario ya se sabe existente (cuenta acierto o fallo)"""
+        with self._lock:
+            if usuario_id in self._usuarios:
+                self._usuarios.move_to_end(usuario_id)
+                self.aciertos += 1
+                return True
+            if self._bloom is not None and usuario_id in self._bloom:
+                self.aciertos_bloom += 1
+                return True
+            self.fallos += 1
+            return False
+
+    def agregar(self, usuario_id):
+        """Marcar el usuario como existente"""
+        with self._lock:
+            self._usuarios[usuario_id] = True
+            self._usuarios.move_to_end(usuario_id)
+            if len(self._usuarios) > self.max_usuarios:
+                self._usuarios.popitem(last=False)
+            if self._bloom is not None:
+                self._bloom.agregar(usuario_id)
+
+    def metricas(self):
+        """Contadores de aciertos y fallos"""
+        with self._lock:
+            consultas = self.aciertos + self.aciertos_bloom + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'aciertos_bloom': self.aciertos_bloom,
+                'fallos': self.fallos,
+                'ratio_aciertos': (self.aciertos + self.aciertos_bloom) / consultas if consultas else 0.0,
+                'tamano': len(self._usuarios),
+                'max_usuarios': self.max_usuarios,
+                'bloom': self._bloom is not None
+            }
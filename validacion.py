@@ -0,0 +1,47 @@
+"""
+Validación de los reportes que recibe la API
+La usan POST /reportes, POST /reportes/lote y las mutaciones crearReporte y
+crearReportes, en app.py y en app_async.py.
+"""
+
+
+def validar_entrada_reporte(data, usuario_id=None):
+    """
+    Validar y normalizar un reporte recibido por la API
+
+    Returns:
+        tuple: (fila para insertar, None) o (None, (code, mensaje))
+    """
+    if not isinstance(data, dict):
+        return None, ('INVALID_ITEM', 'Cada reporte debe ser un objeto')
+    
+    usuario_id = data.get('usuario_id') or data.get('userId') or usuario_id
+    categoria = data.get('categoria')
+    
+    if not usuario_id:
+        return None, ('USER_ID_REQUIRED', 'Se requiere usuario_id')
+    if not categoria or data.get('lat') is None or data.get('lng') is None:
+        return None, ('MISSING_FIELDS', 'Faltan campos requeridos: categoria, lat, lng')
+    
+    try:
+        lat = float(data.get('lat'))
+        lng = float(data.get('lng'))
+    except (TypeError, ValueError):
+        return None, ('INVALID_COORDINATES', 'Coordenadas no numéricas')
+    if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        return None, ('INVALID_COORDINATES', 'Coordenadas fuera de rango')
+    
+    return {
+        'usuario_id': usuario_id,
+        'categoria': categoria,
+        'lat': lat,
+        'lng': lng,
+        'ubicacion': f'SRID=4326;POINT({lng} {lat})',
+        'descripcion': data.get('descripcion', ''),
+        'foto_url': data.get('fotoUrl'),
+        'estado': 'pendiente',
+        'prioridad': data.get('prioridad') or 'media',
+        'version': 1,
+        'votos_positivos': 0,
+        'votos_negativos': 0
+    }, None